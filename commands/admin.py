@@ -1,6 +1,6 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 from utils.utils import (
     is_admin,
     salon_est_autorise,
@@ -11,52 +11,75 @@ from utils.utils import (
     definir_option_config,
     load_reaction_role_mapping,
     save_reaction_role_mapping,
-    charger_config,
-    sauvegarder_config,
+    definir_options_config,
     log_erreur,
     charger_permissions,
-    sauvegarder_permissions
+    sauvegarder_permissions,
+    statistiques_cache_config
 )
-import json
-import os
-import asyncio
+from utils.planificateur_rest import INTERACTIF, MODERATION, planificateur, planifier, route_messages, route_roles, route_salons
+import time
 from datetime import datetime
-
-
-RESOURCES_PATH = "/data/ressources.json"
-
-def load_resources() -> list[dict]:
-    if not os.path.exists(RESOURCES_PATH):
-        return []
-    with open(RESOURCES_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def save_resources(resources: list[dict]) -> None:
-    os.makedirs(os.path.dirname(RESOURCES_PATH), exist_ok=True)
-    with open(RESOURCES_PATH, "w", encoding="utf-8") as f:
-        json.dump(resources, f, indent=4, ensure_ascii=False)
+from commands.utilisateur import load_resources, save_resources
+from utils.catalogue_commandes import catalogue
+from utils import roles_en_masse, mode_examen, demantelement
+from utils.taches_planifiees import taches
+from utils.registre_vues import registre
+from utils.synchro_commandes import synchroniser
+from utils import instrumentation
+from utils.provisionnement import ModeleEspace, SalonModele, VOCAL, overwrites_prives, provisionner
 
 
 
 class AdminCommands(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.reaction_role_messages = load_reaction_role_mapping()
+
+    async def cog_load(self):
+        await roles_en_masse.marquer_interrompus()
+        # Paramètres des boutons persistants, en mémoire avant le premier clic
+        await registre.charger()
+        self.balayage_loop.start()
+        # Tâches différées persistantes (rattrape celles échues pendant un arrêt)
+        taches.demarrer(self.bot)
+
+    def cog_unload(self):
+        self.balayage_loop.cancel()
+        taches.arreter()
+
+    @tasks.loop(minutes=30)
+    async def balayage_loop(self):
+        # Termine les fermetures d'espaces privés restées incomplètes
+        try:
+            stats = await demantelement.balayer(self.bot)
+            if stats["resolus"] or stats["restants"]:
+                print(f"[DEMANTELEMENT] Balayage : {stats}")
+        except Exception as e:
+            print(f"[DEMANTELEMENT] Erreur de balayage : {e}")
+        # Oublie les boutons des espaces fermés à la main
+        try:
+            retires = await registre.balayer(self.bot)
+            if retires:
+                print(f"[VUES] {retires} entrée(s) retirée(s), {len(registre)} restante(s)")
+        except Exception as e:
+            print(f"[VUES] Erreur de balayage : {e}")
+
+    @balayage_loop.before_loop
+    async def avant_balayage(self):
+        await self.bot.wait_until_ready()
 
     @app_commands.command(name="definir_salon", description="Définir le salon autorisé pour une commande.")
     @app_commands.default_permissions(administrator=True)
     async def definir_salon(self, interaction: discord.Interaction, nom_commande: str, salon: discord.TextChannel):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Vous devez être administrateur.", ephemeral=True)
-        definir_salon_autorise(nom_commande, salon.id)
+        await definir_salon_autorise(nom_commande, salon.id)
         await interaction.response.send_message(f"✅ Salon défini pour `{nom_commande}` : {salon.mention}", ephemeral=True)
 
     @definir_salon.autocomplete("nom_commande")
     async def autocomplete_command_names(self, interaction: discord.Interaction, current: str):
         try:
-            all_commands = [cmd.name for cmd in self.bot.tree.get_commands()]
-            suggestions = [app_commands.Choice(name=cmd, value=cmd) for cmd in all_commands if current.lower() in cmd.lower()]
-            return suggestions[:25]
+            return catalogue.choix(current)
         except Exception as e:
             await log_erreur(self.bot, interaction.guild, f"autocomplete_command_names\n{e}")
             return []
@@ -79,14 +102,33 @@ class AdminCommands(commands.Cog):
         await interaction.response.send_message(f"✅ Option `{option}` définie à `{valeur}`", ephemeral=True)
 
 
+    @app_commands.command(name="definir_configs", description="Définir plusieurs options de configuration en une seule fois.")
+    @app_commands.describe(options="Paires cle=valeur séparées par des ';' (ex : role_aide=123; sortie_channel=456)")
+    @app_commands.default_permissions(administrator=True)
+    async def definir_configs(self, interaction: discord.Interaction, options: str):
+        if not await is_admin(interaction.user):
+            return await interaction.response.send_message("❌ Vous devez être administrateur.", ephemeral=True)
+        valeurs = {}
+        for paire in options.replace("\n", ";").split(";"):
+            if not paire.strip():
+                continue
+            cle, sep, valeur = paire.partition("=")
+            if not sep or not cle.strip():
+                return await interaction.response.send_message(f"❌ Paire invalide : `{paire.strip()}`", ephemeral=True)
+            valeurs[cle.strip()] = valeur.strip()
+        if not valeurs:
+            return await interaction.response.send_message("❌ Aucune option fournie.", ephemeral=True)
+        definir_options_config(valeurs)
+        resume = "\n".join(f"• `{cle}` = `{valeur}`" for cle, valeur in valeurs.items())
+        await interaction.response.send_message(f"✅ {len(valeurs)} option(s) définie(s) :\n{resume}", ephemeral=True)
+
+
     @app_commands.command(name="definir_log_erreurs", description="Définit le salon de logs d’erreurs techniques.")
     @app_commands.default_permissions(administrator=True)
     async def definir_log_erreurs(self, interaction: discord.Interaction, salon: discord.TextChannel):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        config = charger_config()
-        config["log_erreurs_channel"] = str(salon.id)
-        sauvegarder_config(config)
+        definir_option_config("log_erreurs_channel", str(salon.id))
         await interaction.response.send_message(f"✅ Salon de logs défini : {salon.mention}", ephemeral=True)
 
 
@@ -133,7 +175,10 @@ class AdminCommands(commands.Cog):
                 interaction.guild.default_role: discord.PermissionOverwrite(read_messages=False),
                 role: discord.PermissionOverwrite(read_messages=True)
             }
-            category = await interaction.guild.create_category(name=nom_de_categorie, overwrites=overwrites)
+            category = await planifier(
+                route_salons(interaction.guild.id),
+                lambda: interaction.guild.create_category(name=nom_de_categorie, overwrites=overwrites), INTERACTIF
+            )
             await interaction.response.send_message(
                 f"✅ Catégorie privée **{category.name}** créée avec accès pour {role.mention}.",
                 ephemeral=True
@@ -152,17 +197,18 @@ class AdminCommands(commands.Cog):
     async def creer_salon(self, interaction: discord.Interaction, nom_salon: str, type_salon: str, categorie: discord.CategoryChannel):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Vous devez être administrateur.", ephemeral=True)
+        creations = {"texte": interaction.guild.create_text_channel, "vocal": interaction.guild.create_voice_channel}
+        creer = creations.get(type_salon.lower())
+        if creer is None:
+            return await interaction.response.send_message("❌ Type de salon invalide. Choisis 'texte' ou 'vocal'.", ephemeral=True)
+        # La création passe par le planificateur (priorité modération) : on accuse réception d'abord
+        await interaction.response.defer(ephemeral=True)
         try:
-            if type_salon.lower() == "texte":
-                await interaction.guild.create_text_channel(nom_salon, category=categorie)
-            elif type_salon.lower() == "vocal":
-                await interaction.guild.create_voice_channel(nom_salon, category=categorie)
-            else:
-                return await interaction.response.send_message("❌ Type de salon invalide. Choisis 'texte' ou 'vocal'.", ephemeral=True)
-            await interaction.response.send_message(f"✅ Salon `{nom_salon}` créé dans la catégorie `{categorie.name}`.", ephemeral=True)
+            await planifier(route_salons(interaction.guild.id), lambda: creer(nom_salon, category=categorie), MODERATION)
+            await interaction.followup.send(f"✅ Salon `{nom_salon}` créé dans la catégorie `{categorie.name}`.", ephemeral=True)
         except Exception as e:
             await log_erreur(self.bot, interaction.guild, f"creer_salon: {e}")
-            await interaction.response.send_message("❌ Erreur lors de la création du salon.", ephemeral=True)
+            await interaction.followup.send("❌ Erreur lors de la création du salon.", ephemeral=True)
 
 
     @app_commands.command(name="definir_role_aide", description="Définit le rôle ping pour aider les étudiants.")
@@ -189,7 +235,7 @@ class AdminCommands(commands.Cog):
             async def on_submit(self_inner, modal_interaction: discord.Interaction):
                 try:
                     await modal_interaction.response.defer(ephemeral=True)
-                    await channel.send(self_inner.contenu.value)
+                    await planifier(route_messages(channel.id), lambda: channel.send(self_inner.contenu.value), INTERACTIF)
                     await modal_interaction.followup.send("✅ Message envoyé !", ephemeral=True)
                 except Exception as e:
                     await log_erreur(self.bot, interaction.guild, f"envoyer_message (on_submit)\n{e}")
@@ -202,9 +248,7 @@ class AdminCommands(commands.Cog):
     async def definir_journal_burnout(self, interaction: discord.Interaction, salon: discord.TextChannel):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        config = charger_config()
-        config["journal_burnout_channel"] = str(salon.id)
-        sauvegarder_config(config)
+        definir_option_config("journal_burnout_channel", str(salon.id))
         await interaction.response.send_message(f"✅ Le salon pour les signalements de burnout a été défini : {salon.mention}", ephemeral=True)
 
 
@@ -213,56 +257,53 @@ class AdminCommands(commands.Cog):
     async def definir_role_utilisateur(self, interaction: discord.Interaction, role: discord.Role):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        config = charger_config()
-        config["role_acces_utilisateur"] = str(role.id)
-        sauvegarder_config(config)
+        definir_option_config("role_acces_utilisateur", str(role.id))
         await interaction.response.send_message(f"✅ Rôle d'accès utilisateur défini : {role.mention}", ephemeral=True)
 
 
     @app_commands.command(name="definir_permission", description="Définit la permission d'accès pour une commande admin.")
     @app_commands.default_permissions(administrator=True)
     async def definir_permission(self, interaction: discord.Interaction, commande: str, role: discord.Role):
-        permissions = charger_permissions()
+        permissions = await charger_permissions()
         current = permissions.get(commande, [])
         if str(role.id) not in current:
             current.append(str(role.id))
         permissions[commande] = current
-        sauvegarder_permissions(permissions)
+        await sauvegarder_permissions(permissions)
         await interaction.response.send_message(f"✅ Permission définie pour la commande `{commande}` avec le rôle {role.mention}.", ephemeral=True)
 
 
     @definir_permission.autocomplete("commande")
     async def autocomplete_command_permission(self, interaction: discord.Interaction, current: str):
-        commands_list = [
-            "definir_salon", "definir_redirection", "definir_config", "definir_log_erreurs",
-            "creer_role", "creer_categorie", "creer_salon", "definir_role_aide",
-            "envoyer_message", "definir_journal_burnout", "definir_permission",
-            "lister_commandes_admin", "creer_reaction_role", "clear_messages", "definir_annonce",
-            "creer_promo", "assigner_eleve", "signaler_inactif", "creer_binome", "statistiques_serveur",
-            "generer_rapport_hebdo", "lock_salon", "purger_role",
-            "activer_mode_examen", "desactiver_mode_examen", "maintenance_on", "maintenance_off",
-            "forcer_validation"
-        ]
-        suggestions = [app_commands.Choice(name=cmd, value=cmd) for cmd in commands_list if current.lower() in cmd.lower()]
-        return suggestions[:25]
+        return catalogue.choix(current)
 
     @app_commands.command(name="lister_commandes_admin", description="Liste les commandes admin et leurs permissions actuelles.")
     @app_commands.default_permissions(administrator=True)
     async def lister_commandes_admin(self, interaction: discord.Interaction):
-        permissions = charger_permissions()
+        permissions = await charger_permissions()
         embed = discord.Embed(title="Commandes Admin", color=discord.Color.blue())
-        if not permissions:
-            embed.description = "Aucune permission définie."
-        else:
-            for cmd, roles in permissions.items():
-                role_mentions = []
-                for role_id in roles:
-                    role = interaction.guild.get_role(int(role_id))
-                    if role:
-                        role_mentions.append(role.mention)
-                embed.add_field(name=cmd, value=", ".join(role_mentions) if role_mentions else "Aucun rôle", inline=False)
+        for cog, cmds in catalogue.par_cog(admin_seulement=True).items():
+            lignes = []
+            for cmd in cmds:
+                roles = [interaction.guild.get_role(int(r)) for r in permissions.get(cmd.chemin, [])]
+                mentions = ", ".join(r.mention for r in roles if r)
+                lignes.append(f"`/{cmd.chemin}`" + (f" — {mentions}" if mentions else ""))
+            # Un champ d'embed est limité à 1024 caractères
+            bloc, suite = [], False
+            for ligne in lignes:
+                if len("\n".join(bloc + [ligne])) > 1024:
+                    embed.add_field(name=f"{cog} (suite)" if suite else cog, value="\n".join(bloc), inline=False)
+                    bloc, suite = [], True
+                bloc.append(ligne)
+            if bloc and len(embed.fields) < 25:
+                embed.add_field(name=f"{cog} (suite)" if suite else cog, value="\n".join(bloc), inline=False)
+        inconnues = [c for c in permissions if c not in catalogue.commandes]
+        if inconnues:
+            embed.set_footer(text="Permissions sur des commandes inconnues : " + ", ".join(inconnues))
+        if not embed.fields:
+            embed.description = "Aucune commande admin dans le catalogue."
         await interaction.response.send_message(embed=embed, ephemeral=True)
-  
+
 
     @app_commands.command(name="creer_reaction_role", description="Crée ou ajoute un reaction role (simple et fiable)")
     @app_commands.default_permissions(administrator=True)
@@ -278,18 +319,20 @@ class AdminCommands(commands.Cog):
 
         if message_id:
             # Ajout à un message existant
+            await interaction.response.defer(ephemeral=True)
             try:
-                msg = await canal.fetch_message(int(message_id))
-                await msg.add_reaction(emoji)
+                route = route_messages(canal.id)
+                msg = await planifier(route, lambda: canal.fetch_message(int(message_id)), INTERACTIF)
+                await planifier(route, lambda: msg.add_reaction(emoji), INTERACTIF)
 
-                mapping = load_reaction_role_mapping()
+                mapping = await load_reaction_role_mapping()
                 mapping.setdefault(str(msg.id), []).append({"emoji": emoji, "role_id": role.id})
-                save_reaction_role_mapping(mapping)
+                await save_reaction_role_mapping(mapping)
 
-                return await interaction.response.send_message("✅ Reaction role ajouté au message existant !", ephemeral=True)
+                return await interaction.followup.send("✅ Reaction role ajouté au message existant !", ephemeral=True)
             except Exception as e:
                 await log_erreur(self.bot, interaction.guild, f"Ajout RR à message existant : {e}")
-                return await interaction.response.send_message("❌ Erreur lors de l'ajout du reaction role.", ephemeral=True)
+                return await interaction.followup.send("❌ Erreur lors de l'ajout du reaction role.", ephemeral=True)
 
         # Sinon, création via modal
         class ReactionRoleModal(discord.ui.Modal, title="Message du Reaction Role"):
@@ -301,18 +344,20 @@ class AdminCommands(commands.Cog):
             )
 
             async def on_submit(self_inner, modal_interaction: discord.Interaction):
+                await modal_interaction.response.defer(ephemeral=True)
                 try:
-                    msg = await canal.send(self_inner.contenu.value)
-                    await msg.add_reaction(emoji)
+                    route = route_messages(canal.id)
+                    msg = await planifier(route, lambda: canal.send(self_inner.contenu.value), INTERACTIF)
+                    await planifier(route, lambda: msg.add_reaction(emoji), INTERACTIF)
 
-                    mapping = load_reaction_role_mapping()
+                    mapping = await load_reaction_role_mapping()
                     mapping[str(msg.id)] = [{"emoji": emoji, "role_id": role.id}]
-                    save_reaction_role_mapping(mapping)
+                    await save_reaction_role_mapping(mapping)
 
-                    await modal_interaction.response.send_message("✅ Reaction role créé avec succès !", ephemeral=True)
+                    await modal_interaction.followup.send("✅ Reaction role créé avec succès !", ephemeral=True)
                 except Exception as e:
                     await log_erreur(self.bot, interaction.guild, f"Modal RR creation : {e}")
-                    await modal_interaction.response.send_message("❌ Erreur lors de la création du reaction role.", ephemeral=True)
+                    await modal_interaction.followup.send("❌ Erreur lors de la création du reaction role.", ephemeral=True)
 
         await interaction.response.send_modal(ReactionRoleModal())
 
@@ -334,9 +379,7 @@ class AdminCommands(commands.Cog):
     async def definir_annonce(self, interaction: discord.Interaction, salon: discord.TextChannel):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        config = charger_config()
-        config["annonce_channel"] = str(salon.id)
-        sauvegarder_config(config)
+        definir_option_config("annonce_channel", str(salon.id))
         await interaction.response.send_message(f"✅ Le canal d'annonces a été défini : {salon.mention}", ephemeral=True)
 
 
@@ -345,18 +388,23 @@ class AdminCommands(commands.Cog):
     async def creer_promo(self, interaction: discord.Interaction, nom_promo: str):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
         promo_role_name = f"Promo {nom_promo}"
+        existant = discord.utils.get(interaction.guild.roles, name=promo_role_name)
         promo_role = await get_or_create_role(interaction.guild, promo_role_name)
-        overwrites = {
-            interaction.guild.default_role: discord.PermissionOverwrite(read_messages=False),
-            promo_role: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-        }
-        category_name = f"Promo {nom_promo}"
-        category = await interaction.guild.create_category(category_name, overwrites=overwrites)
-        await interaction.guild.create_text_channel("annonces", category=category)
-        await interaction.guild.create_text_channel("discussion", category=category)
-        await interaction.guild.create_text_channel("ressources", category=category)
-        await interaction.response.send_message(f"✅ Promo '{nom_promo}' créée avec rôle et catégorie privée.", ephemeral=True)
+        try:
+            await provisionner(interaction.guild, ModeleEspace(
+                categorie=f"Promo {nom_promo}",
+                overwrites=overwrites_prives(interaction.guild, promo_role),
+                salons=[SalonModele("annonces"), SalonModele("discussion"), SalonModele("ressources")],
+            ), raison=f"creer_promo par {interaction.user}")
+        except Exception as e:
+            # L'espace partiel est déjà retiré par provisionner ; le rôle créé ici part aussi
+            if existant is None:
+                await demantelement.demanteler(roles=[promo_role], contexte="creer_promo annulé")
+            await interaction.followup.send("❌ Erreur lors de la création de la promo.", ephemeral=True)
+            return await log_erreur(self.bot, interaction.guild, f"Erreur dans /creer_promo : {e}")
+        await interaction.followup.send(f"✅ Promo '{nom_promo}' créée avec rôle et catégorie privée.", ephemeral=True)
 
 
     @app_commands.command(name="assigner_eleve", description="Assigne un élève à une promo en lui attribuant le rôle correspondant.")
@@ -368,9 +416,10 @@ class AdminCommands(commands.Cog):
         promo_role = discord.utils.get(interaction.guild.roles, name=promo_role_name)
         if not promo_role:
             return await interaction.response.send_message("❌ Le rôle de promo n'existe pas. Créez la promo d'abord.", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
         if promo_role not in utilisateur.roles:
-            await utilisateur.add_roles(promo_role)
-        await interaction.response.send_message(f"✅ {utilisateur.mention} a été ajouté(e) à la promo {nom_promo}.", ephemeral=True)
+            await planifier(route_roles(interaction.guild.id), lambda: utilisateur.add_roles(promo_role), MODERATION)
+        await interaction.followup.send(f"✅ {utilisateur.mention} a été ajouté(e) à la promo {nom_promo}.", ephemeral=True)
 
 
     @app_commands.command(name="signaler_inactif", description="Signale un élève inactif en lui attribuant le rôle 'Inactif'.")
@@ -378,12 +427,13 @@ class AdminCommands(commands.Cog):
     async def signaler_inactif(self, interaction: discord.Interaction, utilisateur: discord.Member):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
         role_inactif = discord.utils.get(interaction.guild.roles, name="Inactif")
         if not role_inactif:
             role_inactif = await get_or_create_role(interaction.guild, "Inactif")
         if role_inactif not in utilisateur.roles:
-            await utilisateur.add_roles(role_inactif)
-        await interaction.response.send_message(f"✅ {utilisateur.mention} a été signalé(e) comme inactif(ve).", ephemeral=True)
+            await planifier(route_roles(interaction.guild.id), lambda: utilisateur.add_roles(role_inactif), MODERATION)
+        await interaction.followup.send(f"✅ {utilisateur.mention} a été signalé(e) comme inactif(ve).", ephemeral=True)
 
 
     @app_commands.command(name="creer_binome", description="Crée une catégorie privée partagée pour deux élèves.")
@@ -391,16 +441,17 @@ class AdminCommands(commands.Cog):
     async def creer_binome(self, interaction: discord.Interaction, utilisateur1: discord.Member, utilisateur2: discord.Member):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        overwrites = {
-            interaction.guild.default_role: discord.PermissionOverwrite(read_messages=False),
-            utilisateur1: discord.PermissionOverwrite(read_messages=True, send_messages=True),
-            utilisateur2: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-        }
-        category_name = f"Binome-{utilisateur1.display_name}-{utilisateur2.display_name}"
-        category = await interaction.guild.create_category(category_name, overwrites=overwrites)
-        await interaction.guild.create_text_channel("discussion", category=category)
-        await interaction.guild.create_voice_channel("voix", category=category)
-        await interaction.response.send_message(f"✅ Catégorie créée pour {utilisateur1.mention} et {utilisateur2.mention}.", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        try:
+            await provisionner(interaction.guild, ModeleEspace(
+                categorie=f"Binome-{utilisateur1.display_name}-{utilisateur2.display_name}",
+                overwrites=overwrites_prives(interaction.guild, utilisateur1, utilisateur2),
+                salons=[SalonModele("discussion"), SalonModele("voix", VOCAL)],
+            ), raison=f"creer_binome par {interaction.user}")
+        except Exception as e:
+            await interaction.followup.send("❌ Erreur lors de la création de la catégorie du binôme.", ephemeral=True)
+            return await log_erreur(self.bot, interaction.guild, f"Erreur dans /creer_binome : {e}")
+        await interaction.followup.send(f"✅ Catégorie créée pour {utilisateur1.mention} et {utilisateur2.mention}.", ephemeral=True)
 
 
     @app_commands.command(name="statistiques_serveur", description="Affiche quelques statistiques du serveur.")
@@ -419,6 +470,80 @@ class AdminCommands(commands.Cog):
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
+    @app_commands.command(name="statistiques_cache_config", description="Affiche les compteurs du cache de configuration.")
+    @app_commands.default_permissions(administrator=True)
+    async def statistiques_cache_config(self, interaction: discord.Interaction):
+        if not await is_admin(interaction.user):
+            return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
+        stats = statistiques_cache_config()
+        embed = discord.Embed(title="Cache de configuration", color=discord.Color.gold())
+        embed.add_field(name="Hits", value=str(stats["hits"]), inline=True)
+        embed.add_field(name="Misses (lectures disque)", value=str(stats["misses"]), inline=True)
+        embed.add_field(name="Invalidations", value=str(stats["invalidations"]), inline=True)
+        embed.add_field(name="Ratio de hits", value=f"{stats['ratio_hits']:.2%}", inline=True)
+        embed.add_field(name="Modifications", value=str(stats["modifications"]), inline=True)
+        embed.add_field(name="Écritures disque", value=str(stats["ecritures"]), inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+    @app_commands.command(name="statistiques_rest", description="Affiche l'état du planificateur des appels REST.")
+    @app_commands.default_permissions(administrator=True)
+    async def statistiques_rest(self, interaction: discord.Interaction):
+        if not await is_admin(interaction.user):
+            return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
+        stats = planificateur.statistiques()
+        embed = discord.Embed(title="Planificateur REST", color=discord.Color.gold())
+        for classe, compteurs in stats["par_classe"].items():
+            embed.add_field(
+                name=classe,
+                value=(f"En file : {stats['en_file'][classe]}\nEn vol : {stats['en_vol'][classe]}\n"
+                       f"Exécutés : {compteurs['executes']}\nLimités (429) : {compteurs['limites']}\n"
+                       f"Échecs : {compteurs['echecs']}"),
+                inline=True
+            )
+        embed.set_footer(text=f"Routes en pause : {stats['routes_en_pause']}")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+    @app_commands.command(name="diagnostic", description="Latences des commandes et des listeners depuis le démarrage.")
+    @app_commands.default_permissions(administrator=True)
+    async def diagnostic(self, interaction: discord.Interaction):
+        if not await is_admin(interaction.user):
+            return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
+        manques, total = instrumentation.accuses_manques()
+        embed = discord.Embed(
+            title="Diagnostic des latences",
+            description=f"Réponses en plus de 3 s ou absentes : **{manques}/{total}** commandes.",
+            color=discord.Color.gold()
+        )
+        for titre, type in (("Commandes les plus lentes", "commande"), ("Listeners les plus lents", "listener")):
+            valeur = ""
+            for ligne in instrumentation.lignes_diagnostic(type):
+                if len(valeur) + len(ligne) + 1 > 1024:
+                    break
+                valeur += ligne + "\n"
+            embed.add_field(name=titre, value=valeur or "Aucune mesure.", inline=False)
+        embed.set_footer(text="p95 = borne du seuil d'histogramme ; détail complet : GET /latences")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+    @app_commands.command(name="forcer_sync", description="Force la synchronisation des commandes slash.")
+    @app_commands.default_permissions(administrator=True)
+    async def forcer_sync(self, interaction: discord.Interaction):
+        if not await is_admin(interaction.user):
+            return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        try:
+            resultat = await synchroniser(self.bot, forcer=True)
+        except discord.HTTPException as e:
+            return await interaction.followup.send(f"❌ Échec de la synchronisation : {e}", ephemeral=True)
+        await interaction.followup.send(
+            f"✅ {resultat['synchronisees']} commandes synchronisées ({resultat['cible']}) "
+            f"en {resultat['duree_ms']} ms. Empreinte : `{resultat['empreinte']}`.",
+            ephemeral=True
+        )
+
+
     @app_commands.command(name="generer_rapport_hebdo", description="Génère un rapport hebdomadaire sur le serveur.")
     @app_commands.default_permissions(administrator=True)
     async def generer_rapport_hebdo(self, interaction: discord.Interaction):
@@ -443,47 +568,115 @@ class AdminCommands(commands.Cog):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
         overwrite = salon.overwrites_for(interaction.guild.default_role)
+        # Un verrou déjà en place garde la valeur d'origine à restaurer
+        tache_id = f"deverrouiller_salon:{salon.id}"
+        precedente = next((t for t in taches.en_attente() if t["id"] == tache_id), None)
+        send_messages_avant = precedente["params"]["send_messages_avant"] if precedente else overwrite.send_messages
         overwrite.send_messages = False
-        await salon.set_permissions(interaction.guild.default_role, overwrite=overwrite)
-        await interaction.response.send_message(f"🔒 Salon {salon.mention} verrouillé pour {duree} minutes.", ephemeral=True)
-        await asyncio.sleep(duree * 60)
-        overwrite.send_messages = None
-        await salon.set_permissions(interaction.guild.default_role, overwrite=overwrite)
-        await interaction.followup.send(f"🔓 Salon {salon.mention} déverrouillé.", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        await planifier(
+            route_salons(interaction.guild.id),
+            lambda: salon.set_permissions(interaction.guild.default_role, overwrite=overwrite), MODERATION
+        )
+        await taches.planifier_dans(
+            "deverrouiller_salon", duree * 60,
+            {"channel_id": salon.id, "send_messages_avant": send_messages_avant},
+            tache_id=tache_id
+        )
+        await interaction.followup.send(
+            f"🔒 Salon {salon.mention} verrouillé pour {duree} minutes "
+            f"(déverrouillage <t:{int(time.time()) + duree * 60}:R>).", ephemeral=True
+        )
+
 
+    # ───── Travaux de rôles en masse ─────────────────────────
+    async def _lancer_travail_roles(self, interaction: discord.Interaction, role: discord.Role, action: str, membres: list[int]):
+        etat = roles_en_masse.nouvel_etat(interaction.guild.id, role.id, action, membres, interaction.user.id)
+        message = await interaction.followup.send(roles_en_masse.texte_progression(etat, role), ephemeral=True, wait=True)
+        roles_en_masse.lancer(interaction.guild, etat, message)
 
     @app_commands.command(name="purger_role", description="Retire un rôle de tous les membres du serveur.")
     @app_commands.default_permissions(administrator=True)
     async def purger_role(self, interaction: discord.Interaction, role: discord.Role):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        compteur = 0
-        for member in role.members:
-            await member.remove_roles(role)
-            compteur += 1
-        await interaction.response.send_message(f"✅ Le rôle {role.mention} a été retiré de {compteur} membres.", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        await self._lancer_travail_roles(interaction, role, "retirer", [m.id for m in role.members])
+
+
+    @app_commands.command(name="attribuer_role_masse", description="Ajoute un rôle à tous les membres (ou aux membres d'un autre rôle).")
+    @app_commands.describe(role="Rôle à ajouter", membres_du_role="Ne cibler que les membres de ce rôle (optionnel)")
+    @app_commands.default_permissions(administrator=True)
+    async def attribuer_role_masse(self, interaction: discord.Interaction, role: discord.Role, membres_du_role: discord.Role = None):
+        if not await is_admin(interaction.user):
+            return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        cibles = membres_du_role.members if membres_du_role else interaction.guild.members
+        membres = [m.id for m in cibles if not m.bot and role not in m.roles]
+        await self._lancer_travail_roles(interaction, role, "ajouter", membres)
+
+
+    async def autocomplete_travail_roles(self, interaction: discord.Interaction, current: str):
+        travaux = await roles_en_masse.charger_travaux()
+        return [
+            app_commands.Choice(name=f"{t['id']} — {roles_en_masse.ACTIONS[t['action']]} ({t['statut']})", value=t["id"])
+            for t in sorted(travaux.values(), key=lambda t: t["cree_a"], reverse=True)
+            if t["guild_id"] == interaction.guild_id and t["id"].startswith(current)
+        ][:25]
+
+    @app_commands.command(name="annuler_travail_roles", description="Arrête un travail de rôles en cours (il pourra être repris).")
+    @app_commands.autocomplete(travail_id=autocomplete_travail_roles)
+    @app_commands.default_permissions(administrator=True)
+    async def annuler_travail_roles(self, interaction: discord.Interaction, travail_id: str):
+        if not await is_admin(interaction.user):
+            return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
+        travail = roles_en_masse.travail_actif(travail_id)
+        if travail is None or travail.guild.id != interaction.guild_id:
+            return await interaction.response.send_message("❌ Aucun travail en cours avec cet identifiant.", ephemeral=True)
+        travail.annuler()
+        await interaction.response.send_message(f"🛑 Annulation du travail `{travail_id}` demandée.", ephemeral=True)
+
+
+    @app_commands.command(name="reprendre_travail_roles", description="Reprend un travail de rôles annulé ou interrompu.")
+    @app_commands.autocomplete(travail_id=autocomplete_travail_roles)
+    @app_commands.default_permissions(administrator=True)
+    async def reprendre_travail_roles(self, interaction: discord.Interaction, travail_id: str):
+        if not await is_admin(interaction.user):
+            return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
+        etat = await roles_en_masse.charger_travail(travail_id)
+        if etat is None or etat["guild_id"] != interaction.guild_id:
+            return await interaction.response.send_message("❌ Travail introuvable.", ephemeral=True)
+        if roles_en_masse.travail_actif(travail_id) or etat["statut"] not in (roles_en_masse.ANNULE, roles_en_masse.INTERROMPU):
+            return await interaction.response.send_message(f"ℹ️ Le travail `{travail_id}` n'est pas à reprendre ({etat['statut']}).", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        message = await interaction.followup.send(roles_en_masse.texte_progression(etat), ephemeral=True, wait=True)
+        roles_en_masse.lancer(interaction.guild, etat, message)
 
 
     @app_commands.command(name="activer_mode_examen", description="Active le mode examen en cachant certains salons.")
+    @app_commands.describe(salons="Salons à garder visibles (ids ou noms, séparés par des virgules)")
     @app_commands.default_permissions(administrator=True)
     async def activer_mode_examen(self, interaction: discord.Interaction, salons: str):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        salons_a_garder = [s.strip() for s in salons.split(",")]
-        for channel in interaction.guild.text_channels:
-            if str(channel.id) not in salons_a_garder and channel.name not in salons_a_garder:
-                await channel.set_permissions(interaction.guild.default_role, read_messages=False)
-        await interaction.response.send_message("✅ Mode examen activé.", ephemeral=True)
-   
+        salons_a_garder = [s.strip() for s in salons.split(",") if s.strip()]
+        await interaction.response.defer(ephemeral=True)
+        message = await interaction.followup.send("⏳ Sauvegarde des permissions des salons…", ephemeral=True, wait=True)
+        try:
+            await mode_examen.activer(interaction.guild, salons_a_garder, message)
+        except RuntimeError as e:
+            await message.edit(content=f"❌ {e}")
+
 
     @app_commands.command(name="desactiver_mode_examen", description="Désactive le mode examen et rétablit l'accès aux salons.")
     @app_commands.default_permissions(administrator=True)
     async def desactiver_mode_examen(self, interaction: discord.Interaction):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        for channel in interaction.guild.text_channels:
-            await channel.set_permissions(interaction.guild.default_role, read_messages=True)
-        await interaction.response.send_message("✅ Mode examen désactivé.", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        message = await interaction.followup.send("⏳ Restauration des permissions des salons…", ephemeral=True, wait=True)
+        if await mode_examen.desactiver(interaction.guild, message) is None:
+            await message.edit(content="ℹ️ Le mode examen n'est pas actif.")
 
 
     @app_commands.command(name="maintenance_on", description="Active le mode maintenance sur le serveur.")
@@ -491,9 +684,7 @@ class AdminCommands(commands.Cog):
     async def maintenance_on(self, interaction: discord.Interaction):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        config = charger_config()
-        config["maintenance"] = True
-        sauvegarder_config(config)
+        definir_option_config("maintenance", True)
         await interaction.response.send_message("✅ Mode maintenance activé. Seuls les admins pourront utiliser le bot.", ephemeral=True)
  
 
@@ -502,9 +693,7 @@ class AdminCommands(commands.Cog):
     async def maintenance_off(self, interaction: discord.Interaction):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        config = charger_config()
-        config["maintenance"] = False
-        sauvegarder_config(config)
+        definir_option_config("maintenance", False)
         await interaction.response.send_message("✅ Mode maintenance désactivé.", ephemeral=True)
 
 
@@ -531,11 +720,12 @@ class AdminCommands(commands.Cog):
         async def accepter(self, interaction: discord.Interaction, button: discord.ui.Button):
             role_non_verifie = discord.utils.get(interaction.guild.roles, name="Non vérifié")
             role_membre = discord.utils.get(interaction.guild.roles, name="Membre")
+            route = route_roles(interaction.guild.id)
             try:
                 if role_non_verifie and role_non_verifie in self.utilisateur.roles:
-                    await self.utilisateur.remove_roles(role_non_verifie)
+                    await planifier(route, lambda: self.utilisateur.remove_roles(role_non_verifie), INTERACTIF)
                 if role_membre and role_membre not in self.utilisateur.roles:
-                    await self.utilisateur.add_roles(role_membre)
+                    await planifier(route, lambda: self.utilisateur.add_roles(role_membre), INTERACTIF)
                 await interaction.response.send_message("✅ Validation réussie. Bienvenue !", ephemeral=True)
             except Exception as e:
                 await interaction.response.send_message("❌ Erreur lors de la validation.", ephemeral=True)
@@ -548,9 +738,7 @@ class AdminCommands(commands.Cog):
     async def definir_salon_sortie(self, interaction: discord.Interaction, salon: discord.TextChannel):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        config = charger_config()
-        config["sortie_channel"] = str(salon.id)
-        sauvegarder_config(config)
+        definir_option_config("sortie_channel", str(salon.id))
         await interaction.response.send_message(f"✅ Salon des sorties défini : {salon.mention}", ephemeral=True)
 
 
@@ -560,9 +748,7 @@ class AdminCommands(commands.Cog):
     async def definir_role_sortie(self, interaction: discord.Interaction, role: discord.Role):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        config = charger_config()
-        config["role_sortie"] = str(role.id)
-        sauvegarder_config(config)
+        definir_option_config("role_sortie", str(role.id))
         await interaction.response.send_message(f"✅ Rôle pour les sorties défini : {role.mention}", ephemeral=True)
     
     # ───── Définir le rôle staff sortie qui peut fermer les sorties ─────
@@ -572,9 +758,7 @@ class AdminCommands(commands.Cog):
     async def definir_role_staff_sortie(self, interaction: discord.Interaction, role: discord.Role):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        config = charger_config()
-        config["role_staff_sortie"] = str(role.id)
-        sauvegarder_config(config)
+        definir_option_config("role_staff_sortie", str(role.id))
         await interaction.response.send_message(f"✅ Rôle staff pour les sorties défini : {role.mention}", ephemeral=True)
     
     # ───── Voir ressources ───────────────────────────────────────────────
@@ -584,7 +768,7 @@ class AdminCommands(commands.Cog):
     )
     @app_commands.default_permissions(administrator=True)
     async def voir_ressources(self, interaction: discord.Interaction):
-        ressources = load_resources()
+        ressources = await load_resources()
         if not ressources:
             return await interaction.response.send_message(
                 "ℹ️ Aucune ressource enregistrée.", ephemeral=True
@@ -614,9 +798,9 @@ class AdminCommands(commands.Cog):
         name: str,
         url: str
     ):
-        ressources = load_resources()
+        ressources = await load_resources()
         ressources.append({"name": name, "url": url})
-        save_resources(ressources)
+        await save_resources(ressources)
         await interaction.response.send_message(
             f"✅ Ressource ajoutée : **{name}**", ephemeral=True
         )
@@ -635,13 +819,13 @@ class AdminCommands(commands.Cog):
         interaction: discord.Interaction,
         index: int
     ):
-        ressources = load_resources()
+        ressources = await load_resources()
         if index < 0 or index >= len(ressources):
             return await interaction.response.send_message(
                 "❌ Index invalide.", ephemeral=True
             )
         removed = ressources.pop(index)
-        save_resources(ressources)
+        await save_resources(ressources)
         await interaction.response.send_message(
             f"✅ Ressource supprimée : **{removed['name']}**", ephemeral=True
         )
@@ -1,25 +1,11 @@
+import asyncio
 import discord
 from discord import app_commands
-from discord.ext import commands
-import json
-import os
-from datetime import datetime, timedelta
+from discord.ext import commands, tasks
+from datetime import date, datetime
+from utils import humeurs
 from utils.utils import is_verified_user, is_admin, salon_est_autorise, log_erreur
 
-# → tout ici passe en /data
-DATA_PATH = "/data/checkin_humeurs.json"
-
-def charger_donnees():
-    if not os.path.exists(DATA_PATH):
-        return {}
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def sauvegarder_donnees(data):
-    os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
-    with open(DATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
-
 class CheckinModal(discord.ui.Modal, title="Check-in Humeur (0 à 10)"):
     humeur = discord.ui.TextInput(
         label="Quelle est ton humeur aujourd’hui ?",
@@ -30,8 +16,6 @@ class CheckinModal(discord.ui.Modal, title="Check-in Humeur (0 à 10)"):
 
     async def on_submit(self, interaction: discord.Interaction):
         try:
-            data = charger_donnees()
-            user_id = str(interaction.user.id)
             try:
                 score = int(self.humeur.value.strip())
                 if not 0 <= score <= 10:
@@ -41,9 +25,7 @@ class CheckinModal(discord.ui.Modal, title="Check-in Humeur (0 à 10)"):
                     "❌ Merci d'entrer un nombre entre 0 et 10.", ephemeral=True
                 )
 
-            entry = {"date": datetime.utcnow().isoformat(), "score": score}
-            data.setdefault(user_id, []).append(entry)
-            sauvegarder_donnees(data)
+            await humeurs.enregistrer_humeur_async(interaction.user.id, score)
             await interaction.response.send_message("✅ Humeur enregistrée !", ephemeral=True)
         except Exception as e:
             await log_erreur(interaction.client, interaction.guild, f"CheckinModal: {e}")
@@ -53,6 +35,22 @@ class Checkin(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        # Agrégats glissants construits une fois depuis le stockage (borné par la rétention),
+        # avant toute compaction : celle-ci convertit l'historique que charger() lit
+        await asyncio.to_thread(humeurs.agregats.charger)
+        self.compaction_loop.start()
+
+    def cog_unload(self):
+        self.compaction_loop.cancel()
+
+    @tasks.loop(hours=6)
+    async def compaction_loop(self):
+        try:
+            stats = await asyncio.to_thread(humeurs.compacter)
+            print(f"[CHECKIN] Compaction : {stats}")
+        except Exception as e:
+            print(f"[CHECKIN] Erreur de compaction : {e}")
 
     @app_commands.command(name="checkin", description="Note ton humeur du jour (0 à 10)")
     async def checkin(self, interaction: discord.Interaction):
@@ -60,7 +58,7 @@ class Checkin(commands.Cog):
             return await interaction.response.send_message(
                 "❌ Réservé aux membres vérifiés.", ephemeral=True
             )
-        if not salon_est_autorise("checkin", interaction.channel_id, interaction.user):
+        if not await salon_est_autorise("checkin", interaction.channel_id, interaction.user):
             return await interaction.response.send_message(
                 "❌ Commande non autorisée ici.", ephemeral=True
             )
@@ -71,36 +69,53 @@ class Checkin(commands.Cog):
         name="humeur_utilisateur",
         description="Voir l’historique d’humeur d’un utilisateur (staff uniquement)"
     )
-    async def humeur_utilisateur(self, interaction: discord.Interaction, membre: discord.Member):
+    @app_commands.describe(
+        jours="Fenêtre supplémentaire en jours (ex: 90)",
+        debut="Début d'une période personnalisée (AAAA-MM-JJ)",
+        fin="Fin de la période personnalisée (AAAA-MM-JJ, aujourd'hui par défaut)"
+    )
+    async def humeur_utilisateur(
+        self,
+        interaction: discord.Interaction,
+        membre: discord.Member,
+        jours: app_commands.Range[int, 1, humeurs.CAPACITE_JOURS] = None,
+        debut: str = None,
+        fin: str = None
+    ):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message(
                 "❌ Réservé aux admins.", ephemeral=True
             )
-        data = charger_donnees()
-        user_id = str(membre.id)
-        if user_id not in data:
+        dernier = humeurs.agregats.dernier(membre.id)
+        if dernier is None:
             return await interaction.response.send_message(
                 "ℹ️ Aucun check-in trouvé pour cet utilisateur.", ephemeral=True
             )
 
-        now = datetime.utcnow()
-        valeurs = data[user_id]
-
-        def moyenne_sur(days):
-            limite = now - timedelta(days=days)
-            scores = [e["score"] for e in valeurs if datetime.fromisoformat(e["date"]) >= limite]
-            return round(sum(scores)/len(scores), 2) if scores else "Aucune donnée"
-
-        moyenne_jour = valeurs[-1]["score"]
-        mj_7 = moyenne_sur(7)
-        mj_30 = moyenne_sur(30)
+        def afficher(moyenne):
+            return str(moyenne) if moyenne is not None else "Aucune donnée"
 
         embed = discord.Embed(
             title=f"Humeur de {membre.display_name}", color=discord.Color.orange()
         )
-        embed.add_field(name="📅 Aujourd'hui", value=str(moyenne_jour), inline=True)
-        embed.add_field(name="📆 Moyenne 7 jours", value=str(mj_7), inline=True)
-        embed.add_field(name="📅 Moyenne 30 jours", value=str(mj_30), inline=True)
+        embed.add_field(name="📅 Aujourd'hui", value=str(dernier[1]), inline=True)
+        embed.add_field(name="📆 Moyenne 7 jours", value=afficher(humeurs.moyenne_sur(membre.id, 7)), inline=True)
+        embed.add_field(name="📅 Moyenne 30 jours", value=afficher(humeurs.moyenne_sur(membre.id, 30)), inline=True)
+        if jours:
+            embed.add_field(name=f"🗓️ Moyenne {jours} jours", value=afficher(humeurs.moyenne_sur(membre.id, jours)), inline=True)
+        if debut:
+            try:
+                date_debut = date.fromisoformat(debut)
+                date_fin = date.fromisoformat(fin) if fin else datetime.utcnow().date()
+            except ValueError:
+                return await interaction.response.send_message(
+                    "❌ Dates invalides, format attendu : AAAA-MM-JJ.", ephemeral=True
+                )
+            embed.add_field(
+                name=f"🗓️ Du {date_debut} au {date_fin}",
+                value=afficher(humeurs.moyenne_periode(membre.id, date_debut, date_fin)),
+                inline=True
+            )
         embed.set_footer(text="Source : /checkin")
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
@@ -1,46 +1,34 @@
 import discord
 from discord.ext import commands
-import json
-import os
-from utils.utils import log_erreur, charger_config
-
-WHITELIST_PATH = "/data/whitelist.json"
-
-def charger_whitelist():
-    if not os.path.exists(WHITELIST_PATH):
-        return []
-    with open(WHITELIST_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def sauvegarder_whitelist(whitelist):
-    os.makedirs(os.path.dirname(WHITELIST_PATH), exist_ok=True)
-    with open(WHITELIST_PATH, "w", encoding="utf-8") as f:
-        json.dump(whitelist, f, indent=4)
+from utils.utils import log_erreur, charger_config, charger_whitelist
+from utils.index_whitelist import index_whitelist
+from utils.planificateur_rest import ARRIERE_PLAN, MODERATION, planifier, route_roles
 
 class WhitelistEvents(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        if not index_whitelist.est_charge:
+            index_whitelist.reconstruire(await charger_whitelist())
+
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
         try:
-            whitelist = charger_whitelist()
-            whitelist_ids = [entry.get("user_id") for entry in whitelist]
-
             config = charger_config()
             role_membre = member.guild.get_role(int(config.get("role_membre_id", 0)))
             role_non_verifie = member.guild.get_role(int(config.get("role_non_verifie_id", 0)))
 
-            if member.id in whitelist_ids:
+            if index_whitelist.contient(member.id):
                 if role_membre:
-                    await member.add_roles(role_membre)
+                    await planifier(route_roles(member.guild.id), lambda: member.add_roles(role_membre), MODERATION)
                     try:
-                        await member.send("✅ Tu as été automatiquement intégré au serveur. Bienvenue !")
+                        await planifier("dm", lambda: member.send("✅ Tu as été automatiquement intégré au serveur. Bienvenue !"), ARRIERE_PLAN)
                     except:
                         pass
             else:
                 if role_non_verifie:
-                    await member.add_roles(role_non_verifie)
+                    await planifier(route_roles(member.guild.id), lambda: member.add_roles(role_non_verifie), MODERATION)
 
         except Exception as e:
             await log_erreur(self.bot, member.guild, f"on_member_join : {e}")
@@ -8,6 +8,11 @@ from utils.utils import (
     salon_est_autorise,
     is_verified_user
 )
+from utils import sorties
+from utils.demantelement import demanteler
+from utils.registre_vues import registre, vue_persistante
+from utils.planificateur_rest import INTERACTIF, planifier, route_messages
+from utils.provisionnement import ModeleEspace, SalonModele, VOCAL, overwrites_prives, provisionner, supprimer_espace
 
 async def check_verified(interaction: discord.Interaction) -> bool:
     if await is_verified_user(interaction.user):
@@ -41,112 +46,150 @@ class SortieModal(discord.ui.Modal, title="Proposer une sortie / activité"):
             if not salon_pub or not role:
                 return await interaction.response.send_message("❌ Configuration invalide.", ephemeral=True)
 
-            # Ping visible et récupération du message ping
-            ping_msg = await salon_pub.send(role.mention)
+            await interaction.response.defer(ephemeral=True)
 
-            # Création de la catégorie privée
+            # L'espace privé d'abord, l'annonce ensuite : un ping ne pointe jamais vers rien
             slug = self.jour.value.replace(' ', '-')
-            cat_name = f"sortie-{slug} - 1"
-            overwrites = {
-                guild.default_role: discord.PermissionOverwrite(read_messages=False),
-                self.auteur: discord.PermissionOverwrite(read_messages=True, send_messages=True),
-                guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-            }
-            if role_staff:
-                overwrites[role_staff] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
-
-            category = await guild.create_category(cat_name, overwrites=overwrites)
-            txt = await guild.create_text_channel("discussion-sortie", category=category)
-            await guild.create_voice_channel("vocal-sortie", category=category)
-
-            # Envoi du message public embed + participation
-            desc = (
-                f"**Date :** {self.jour.value}\n"
-                f"**Lieu :** {self.lieu.value}\n"
-                f"**Activité :** {self.activite.value}"
-            ) + (f"\n\n{self.details.value}" if self.details.value else "")
-            embed = discord.Embed(title="📢 Nouvelle sortie proposée !", description=desc, color=discord.Color.green())
-            embed.set_footer(text=f"Proposée par {self.auteur.display_name}")
-            join_view = ParticiperSortieView(category)
-            public_msg = await salon_pub.send(embed=embed, view=join_view)
-
-            # Vue de gestion dans le salon privé (quitter + fermer), avec références messages à supprimer
-            gestion_view = SortieGestionView(category, self.auteur, role_staff, public_msg, ping_msg)
-            await txt.send(f"🔔 {self.auteur.mention}, ta sortie est ici !", view=gestion_view)
-
-            await interaction.response.send_message("✅ Sortie proposée !", ephemeral=True)
+            espace = await provisionner(guild, ModeleEspace(
+                categorie=f"sortie-{slug} - 1",
+                overwrites=overwrites_prives(guild, self.auteur, guild.me, role_staff),
+                salons=[SalonModele("discussion-sortie"), SalonModele("vocal-sortie", VOCAL)],
+            ))
+            category, txt = espace.categorie, espace["discussion-sortie"]
+            ping_msg = public_msg = None
+            try:
+                await sorties.creer(category, f"sortie-{slug}", self.auteur.id)
+
+                # Ping + message public embed avec participation
+                desc = (
+                    f"**Date :** {self.jour.value}\n"
+                    f"**Lieu :** {self.lieu.value}\n"
+                    f"**Activité :** {self.activite.value}"
+                ) + (f"\n\n{self.details.value}" if self.details.value else "")
+                embed = discord.Embed(title="📢 Nouvelle sortie proposée !", description=desc, color=discord.Color.green())
+                embed.set_footer(text=f"Proposée par {self.auteur.display_name}")
+                route = route_messages(salon_pub.id)
+                ping_msg = await planifier(route, lambda: salon_pub.send(role.mention), INTERACTIF)
+                public_msg = await planifier(
+                    route, lambda: salon_pub.send(embed=embed, view=registre.gabarit(ParticiperSortieView)), INTERACTIF
+                )
+                await registre.enregistrer(public_msg, ParticiperSortieView, {"category_id": category.id}, category_id=category.id)
+
+                # Vue de gestion dans le salon privé (quitter + fermer), avec références messages à supprimer
+                gestion_msg = await planifier(
+                    route_messages(txt.id),
+                    lambda: txt.send(f"🔔 {self.auteur.mention}, ta sortie est ici !", view=registre.gabarit(SortieGestionView)),
+                    INTERACTIF
+                )
+                await registre.enregistrer(gestion_msg, SortieGestionView, {
+                    "category_id": category.id,
+                    "auteur_id": self.auteur.id,
+                    "staff_role_id": role_staff.id if role_staff else None,
+                    "messages": [[m.channel.id, m.id] for m in (public_msg, ping_msg)],
+                }, category_id=category.id)
+            except Exception:
+                # Sortie inutilisable : on retire l'espace et ce qui a déjà été annoncé
+                await supprimer_espace(espace)
+                await demanteler(messages=[ping_msg, public_msg], contexte="proposer_sortie annulée")
+                await registre.oublier_categorie(category.id)
+                await sorties.supprimer(category.id)
+                raise
+
+            await interaction.followup.send("✅ Sortie proposée !", ephemeral=True)
         except Exception as e:
-            await interaction.response.send_message("❌ Erreur lors de la proposition.", ephemeral=True)
+            if interaction.response.is_done():
+                await interaction.followup.send("❌ Erreur lors de la proposition.", ephemeral=True)
+            else:
+                await interaction.response.send_message("❌ Erreur lors de la proposition.", ephemeral=True)
             await log_erreur(self.bot, interaction.guild, f"SortieModal: {e}")
 
+async def _categorie(interaction: discord.Interaction, params: dict) -> discord.CategoryChannel | None:
+    category = interaction.guild.get_channel(params["category_id"])
+    if category is None:
+        await interaction.response.send_message("⚠️ Cette sortie n'existe plus.", ephemeral=True)
+    return category
+
+@vue_persistante("sortie_participer")
 class ParticiperSortieView(discord.ui.View):
-    def __init__(self, category: discord.CategoryChannel):
+    def __init__(self):
         super().__init__(timeout=None)
-        self.category = category
 
-    @discord.ui.button(label="Je suis chaud(e) 🔥", style=discord.ButtonStyle.success)
+    @discord.ui.button(label="Je suis chaud(e) 🔥", style=discord.ButtonStyle.success, custom_id="sortie_rejoindre")
     async def rejoindre(self, interaction: discord.Interaction, button: discord.ui.Button):
-        user = interaction.user
-        # Donner accès aux salons privés
-        for ch in self.category.channels:
-            await ch.set_permissions(user, read_messages=True, send_messages=True)
-        # Incrémenter le compteur dans le nom de la catégorie
-        base, count_str = self.category.name.rsplit(' - ', 1)
-        new_count = int(count_str) + 1
-        await self.category.edit(name=f"{base} - {new_count}")
-        await interaction.response.send_message("✅ Tu as rejoint la sortie !", ephemeral=True)
-
+        params = await registre.params_interaction(interaction, ParticiperSortieView)
+        category = params and await _categorie(interaction, params)
+        if category is None:
+            return
+        # Accès via la catégorie ; compteur et renommage gérés par utils.sorties.
+        # Différé : sur une sortie très demandée, les clics attendent leur tour sous le verrou
+        await interaction.response.defer(ephemeral=True)
+        if not await sorties.rejoindre(category, interaction.user):
+            return await interaction.followup.send("ℹ️ Tu participes déjà à cette sortie.", ephemeral=True)
+        await interaction.followup.send("✅ Tu as rejoint la sortie !", ephemeral=True)
+
+@vue_persistante("sortie_gestion")
 class SortieGestionView(discord.ui.View):
-    def __init__(self, category, auteur, staff_role=None, public_msg: discord.Message = None, ping_msg: discord.Message = None):
+    def __init__(self):
         super().__init__(timeout=None)
-        self.category = category
-        self.auteur = auteur
-        self.staff_role = staff_role
-        self.public_msg = public_msg
-        self.ping_msg = ping_msg
 
-    @discord.ui.button(label="Finalement je ne serai pas là ❌", style=discord.ButtonStyle.danger)
+    @discord.ui.button(label="Finalement je ne serai pas là ❌", style=discord.ButtonStyle.danger, custom_id="sortie_quitter")
     async def quitter(self, interaction: discord.Interaction, button: discord.ui.Button):
+        params = await registre.params_interaction(interaction, SortieGestionView)
+        category = params and await _categorie(interaction, params)
+        if category is None:
+            return
         user = interaction.user
-        if user.id == self.auteur.id:
+        if user.id == params["auteur_id"]:
             return await interaction.response.send_message(
                 "❌ Tu ne peux pas quitter ta propre sortie.", ephemeral=True
             )
-        # Retirer accès
-        for ch in self.category.channels:
-            await ch.set_permissions(user, overwrite=None)
-        # Décrémenter le compteur
-        base, count_str = self.category.name.rsplit(' - ', 1)
-        new_count = int(count_str) - 1
-        await self.category.edit(name=f"{base} - {new_count}")
-        await interaction.response.send_message("🚫 Tu as quitté la sortie.", ephemeral=True)
-
-    @discord.ui.button(label="Sortie passée ✅", style=discord.ButtonStyle.danger)
+        await interaction.response.defer(ephemeral=True)
+        if not await sorties.quitter(category, user):
+            return await interaction.followup.send("ℹ️ Tu ne participais pas à cette sortie.", ephemeral=True)
+        await interaction.followup.send("🚫 Tu as quitté la sortie.", ephemeral=True)
+
+    @discord.ui.button(label="Sortie passée ✅", style=discord.ButtonStyle.danger, custom_id="sortie_fermer")
     async def fermer(self, interaction: discord.Interaction, button: discord.ui.Button):
+        params = await registre.params_interaction(interaction, SortieGestionView)
+        category = params and await _categorie(interaction, params)
+        if category is None:
+            return
         user = interaction.user
-        allowed = user.id == self.auteur.id or (self.staff_role and self.staff_role in user.roles)
+        staff_role = interaction.guild.get_role(params["staff_role_id"]) if params["staff_role_id"] else None
+        allowed = user.id == params["auteur_id"] or (staff_role and staff_role in user.roles)
         if not allowed:
             return await interaction.response.send_message(
                 "❌ Seul l’auteur ou le staff peut fermer.", ephemeral=True
             )
+        await interaction.response.defer(ephemeral=True)
+        # Salons, catégorie, message public et ping
+        messages = []
+        for channel_id, message_id in params["messages"]:
+            salon = interaction.guild.get_channel(channel_id)
+            if salon is not None:
+                messages.append(salon.get_partial_message(message_id))
+        resultat = await demanteler(category, messages=messages, contexte="SortieGestionView")
+        await sorties.supprimer(category.id)
+        await registre.oublier_categorie(category.id)
+        if resultat["echecs"]:
+            await log_erreur(interaction.client, interaction.guild,
+                             f"SortieGestionView : {resultat['echecs']} suppression(s) reportée(s) au prochain balayage")
         try:
-            # Supprimer salons et catégorie
-            for ch in list(self.category.channels):
-                await ch.delete()
-            await self.category.delete()
-            # Supprimer le message public et le ping
-            if self.public_msg:
-                await self.public_msg.delete()
-            if self.ping_msg:
-                await self.ping_msg.delete()
-            await interaction.response.send_message("✅ Sortie fermée.", ephemeral=True)
-        except Exception as e:
-            await log_erreur(interaction.client, interaction.guild, f"SortieGestionView: {e}")
-            await interaction.response.send_message("❌ Erreur lors de la fermeture.", ephemeral=True)
+            await interaction.followup.send("✅ Sortie fermée.", ephemeral=True)
+        except discord.HTTPException:
+            pass
 
 class LoisirCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        registre.installer(bot, ParticiperSortieView, SortieGestionView)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        # Sortie fermée à la main (catégorie supprimée sans le bouton) : on oublie son état
+        if isinstance(channel, discord.CategoryChannel) and await sorties.charger(channel.id) is not None:
+            await sorties.supprimer(channel.id)
+            await registre.oublier_categorie(channel.id)
 
     async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
         if isinstance(error, app_commands.CheckFailure):
@@ -158,7 +201,7 @@ class LoisirCommands(commands.Cog):
     @app_commands.command(name="proposer_sortie", description="Propose une sortie sociale ou une activité.")
     @app_commands.check(check_verified)
     async def proposer_sortie(self, interaction: discord.Interaction):
-        if not salon_est_autorise("proposer_sortie", interaction.channel_id, interaction.user):
+        if not await salon_est_autorise("proposer_sortie", interaction.channel_id, interaction.user):
             return await interaction.response.send_message("❌ Non autorisé.", ephemeral=True)
         try:
             await interaction.response.send_modal(SortieModal(self.bot, interaction.user))
@@ -1,24 +1,37 @@
-import os
-import json
 import discord
 from discord import app_commands
 from discord.ext import commands
+from utils import stockage
+from utils.recherche import IndexTextes
 from utils.utils import is_admin, salon_est_autorise, log_erreur
 
-# → Chemins vers les JSON
-MISSIONS_PATH = "/data/missions_du_jour.json"
-CONSEILS_PATH = "/data/conseils_methodo.json"
+# → Chemins vers les JSON (identifiants des datasets missions / conseils)
+MISSIONS_PATH = stockage.chemin_dataset("missions")
+CONSEILS_PATH = stockage.chemin_dataset("conseils")
 
-def charger_liste(path: str) -> list[str]:
-    if not os.path.exists(path):
-        return []
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+async def charger_liste(path: str) -> list[str]:
+    return await stockage.charger_async(stockage.dataset_pour_chemin(path))
 
-def sauvegarder_liste(path: str, data: list[str]) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+async def sauvegarder_liste(path: str, data: list[str]) -> None:
+    await stockage.sauvegarder_async(stockage.dataset_pour_chemin(path), data)
+    _index_listes.pop(path, None)
+
+# Index de recherche en mémoire pour l'autocomplétion (une requête par frappe) :
+# construit au premier besoin, invalidé à chaque sauvegarde de la liste.
+_index_listes: dict[str, IndexTextes] = {}
+
+async def index_liste(path: str) -> IndexTextes:
+    index = _index_listes.get(path)
+    if index is None:
+        index = _index_listes[path] = IndexTextes(await charger_liste(path))
+    return index
+
+async def choix_autocomplete(path: str, current: str) -> list[app_commands.Choice[str]]:
+    index = await index_liste(path)
+    return [
+        app_commands.Choice(name=t if len(t) < 100 else t[:97]+"...", value=t)
+        for t in index.rechercher(current, limite=25)
+    ]
 
 class AjouterElementModal(discord.ui.Modal):
     def __init__(self, bot, path, label, titre, element_type):
@@ -31,9 +44,9 @@ class AjouterElementModal(discord.ui.Modal):
 
     async def on_submit(self, interaction: discord.Interaction):
         try:
-            items = charger_liste(self.path)
+            items = await charger_liste(self.path)
             items.append(self.contenu.value)
-            sauvegarder_liste(self.path, items)
+            await sauvegarder_liste(self.path, items)
             await interaction.response.send_message(f"✅ {self.element_type} ajoutée !", ephemeral=True)
         except Exception as e:
             await log_erreur(self.bot, interaction.guild, f"AjouterElementModal: {e}")
@@ -55,9 +68,9 @@ class ModifierElementModal(discord.ui.Modal):
 
     async def on_submit(self, interaction: discord.Interaction):
         try:
-            items = charger_liste(self.path)
+            items = await charger_liste(self.path)
             items[self.index] = self.contenu.value
-            sauvegarder_liste(self.path, items)
+            await sauvegarder_liste(self.path, items)
             await interaction.response.send_message(f"✅ {self.element_type} modifié !", ephemeral=True)
         except Exception as e:
             await log_erreur(self.bot, interaction.guild, f"ModifierElementModal: {e}")
@@ -71,7 +84,7 @@ class Missions(commands.Cog):
         if not await is_admin(interaction.user):
             await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
             return False
-        if not salon_est_autorise(cmd, interaction.channel_id, interaction.user):
+        if not await salon_est_autorise(cmd, interaction.channel_id, interaction.user):
             await interaction.response.send_message("❌ Commande non autorisée ici.", ephemeral=True)
             return False
         return True
@@ -93,7 +106,7 @@ class Missions(commands.Cog):
     async def modifier_mission(self, interaction: discord.Interaction, mission: str):
         if not await self.check_admin_salon(interaction, "modifier_mission"):
             return
-        data = charger_liste(MISSIONS_PATH)
+        data = await charger_liste(MISSIONS_PATH)
         try:
             index = data.index(mission)
         except ValueError:
@@ -105,12 +118,7 @@ class Missions(commands.Cog):
 
     @modifier_mission.autocomplete("mission")
     async def modifier_mission_autocomplete(self, interaction: discord.Interaction, current: str):
-        data = charger_liste(MISSIONS_PATH)
-        return [
-            app_commands.Choice(name=m if len(m) < 100 else m[:97]+"...", value=m)
-            for m in data
-            if current.lower() in m.lower()
-        ][:25]
+        return await choix_autocomplete(MISSIONS_PATH, current)
 
     @app_commands.command(name="supprimer_mission", description="Supprime une mission du jour.")
     @app_commands.default_permissions(kick_members=True)
@@ -118,28 +126,23 @@ class Missions(commands.Cog):
     async def supprimer_mission(self, interaction: discord.Interaction, mission: str):
         if not await self.check_admin_salon(interaction, "supprimer_mission"):
             return
-        data = charger_liste(MISSIONS_PATH)
+        data = await charger_liste(MISSIONS_PATH)
         if mission not in data:
             return await interaction.response.send_message("❌ Mission introuvable.", ephemeral=True)
         data.remove(mission)
-        sauvegarder_liste(MISSIONS_PATH, data)
+        await sauvegarder_liste(MISSIONS_PATH, data)
         await interaction.response.send_message(f"✅ Mission supprimée : **{mission}**", ephemeral=True)
 
     @supprimer_mission.autocomplete("mission")
     async def supprimer_mission_autocomplete(self, interaction: discord.Interaction, current: str):
-        data = charger_liste(MISSIONS_PATH)
-        return [
-            app_commands.Choice(name=m if len(m) < 100 else m[:97]+"...", value=m)
-            for m in data
-            if current.lower() in m.lower()
-        ][:25]
+        return await choix_autocomplete(MISSIONS_PATH, current)
 
     @app_commands.command(name="voir_missions", description="Liste les missions actuelles.")
     @app_commands.default_permissions(kick_members=True)
     async def voir_missions(self, interaction: discord.Interaction):
         if not await self.check_admin_salon(interaction, "voir_missions"):
             return
-        data = charger_liste(MISSIONS_PATH)
+        data = await charger_liste(MISSIONS_PATH)
         if not data:
             return await interaction.response.send_message("ℹ️ Aucune mission définie.", ephemeral=True)
         texte = "\n".join(f"• {m}" for m in data)
@@ -162,7 +165,7 @@ class Missions(commands.Cog):
     async def modifier_conseil(self, interaction: discord.Interaction, conseil: str):
         if not await self.check_admin_salon(interaction, "modifier_conseil"):
             return
-        data = charger_liste(CONSEILS_PATH)
+        data = await charger_liste(CONSEILS_PATH)
         try:
             index = data.index(conseil)
         except ValueError:
@@ -174,12 +177,7 @@ class Missions(commands.Cog):
 
     @modifier_conseil.autocomplete("conseil")
     async def modifier_conseil_autocomplete(self, interaction: discord.Interaction, current: str):
-        data = charger_liste(CONSEILS_PATH)
-        return [
-            app_commands.Choice(name=c if len(c) < 100 else c[:97]+"...", value=c)
-            for c in data
-            if current.lower() in c.lower()
-        ][:25]
+        return await choix_autocomplete(CONSEILS_PATH, current)
 
     @app_commands.command(name="supprimer_conseil", description="Supprime un conseil méthodo.")
     @app_commands.default_permissions(kick_members=True)
@@ -187,21 +185,16 @@ class Missions(commands.Cog):
     async def supprimer_conseil(self, interaction: discord.Interaction, conseil: str):
         if not await self.check_admin_salon(interaction, "supprimer_conseil"):
             return
-        data = charger_liste(CONSEILS_PATH)
+        data = await charger_liste(CONSEILS_PATH)
         if conseil not in data:
             return await interaction.response.send_message("❌ Conseil introuvable.", ephemeral=True)
         data.remove(conseil)
-        sauvegarder_liste(CONSEILS_PATH, data)
+        await sauvegarder_liste(CONSEILS_PATH, data)
         await interaction.response.send_message(f"✅ Conseil supprimé : **{conseil}**", ephemeral=True)
 
     @supprimer_conseil.autocomplete("conseil")
     async def supprimer_conseil_autocomplete(self, interaction: discord.Interaction, current: str):
-        data = charger_liste(CONSEILS_PATH)
-        return [
-            app_commands.Choice(name=c if len(c) < 100 else c[:97]+"...", value=c)
-            for c in data
-            if current.lower() in c.lower()
-        ][:25]
+        return await choix_autocomplete(CONSEILS_PATH, current)
 
 async def setup(bot):
     await bot.add_cog(Missions(bot))
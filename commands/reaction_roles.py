@@ -1,10 +1,30 @@
+import asyncio
 import discord
 from discord.ext import commands
-from utils.utils import load_reaction_role_mapping, log_erreur
+from utils.planificateur_rest import INTERACTIF, planifier, route_roles
+from utils.utils import roles_pour_reaction, reconstruire_index_reaction_roles, load_reaction_role_mapping, log_erreur
+
+# Repli REST borné quand le membre n'est pas dans le cache
+FETCH_MEMBRE_CONCURRENCE = 2
+FETCH_MEMBRE_TIMEOUT = 5
 
 class ReactionRoleEvents(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self._fetch_membre = asyncio.Semaphore(FETCH_MEMBRE_CONCURRENCE)
+
+    async def cog_load(self):
+        reconstruire_index_reaction_roles(await load_reaction_role_mapping())
+
+    async def _membre(self, guild: discord.Guild, user_id: int) -> discord.Member | None:
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+        async with self._fetch_membre:
+            try:
+                return await asyncio.wait_for(guild.fetch_member(user_id), FETCH_MEMBRE_TIMEOUT)
+            except (discord.NotFound, asyncio.TimeoutError):
+                return None
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload):
@@ -12,19 +32,15 @@ class ReactionRoleEvents(commands.Cog):
             if payload.member is None or payload.member.bot:
                 return
 
-            mapping = load_reaction_role_mapping()
-            role_infos = mapping.get(str(payload.message_id))
-            if not role_infos:
+            role_ids = roles_pour_reaction(payload.message_id, payload.emoji)
+            if not role_ids:
                 return
 
-            for entry in role_infos:
-                if entry["emoji"] == str(payload.emoji):
-                    guild = self.bot.get_guild(payload.guild_id)
-                    role = guild.get_role(int(entry["role_id"]))
-                    if role:
-                        member = payload.member
-                        if role not in member.roles:
-                            await member.add_roles(role)
+            guild = self.bot.get_guild(payload.guild_id)
+            member = payload.member
+            manquants = [r for r in map(guild.get_role, role_ids) if r and r not in member.roles]
+            if manquants:
+                await planifier(route_roles(guild.id), lambda: member.add_roles(*manquants), INTERACTIF)
         except Exception as e:
             guild = self.bot.get_guild(payload.guild_id)
             await log_erreur(self.bot, guild, f"Erreur on_raw_reaction_add : {e}")
@@ -32,20 +48,18 @@ class ReactionRoleEvents(commands.Cog):
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload):
         try:
-            mapping = load_reaction_role_mapping()
-            role_infos = mapping.get(str(payload.message_id))
-            if not role_infos:
+            role_ids = roles_pour_reaction(payload.message_id, payload.emoji)
+            if not role_ids:
                 return
 
-            for entry in role_infos:
-                if entry["emoji"] == str(payload.emoji):
-                    guild = self.bot.get_guild(payload.guild_id)
-                    role = guild.get_role(int(entry["role_id"]))
-                    if not role:
-                        continue
-                    member = await guild.fetch_member(payload.user_id)  # Correction ici
-                    if role in member.roles:
-                        await member.remove_roles(role)
+            guild = self.bot.get_guild(payload.guild_id)
+            roles = [r for r in map(guild.get_role, role_ids) if r]
+            if not roles:
+                return
+            member = await self._membre(guild, payload.user_id)
+            presents = [r for r in roles if member and r in member.roles]
+            if presents:
+                await planifier(route_roles(guild.id), lambda: member.remove_roles(*presents), INTERACTIF)
         except Exception as e:
             guild = self.bot.get_guild(payload.guild_id)
             await log_erreur(self.bot, guild, f"Erreur on_raw_reaction_remove : {e}")
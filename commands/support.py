@@ -3,7 +3,11 @@ from discord import app_commands
 from discord.ext import commands, tasks
 import datetime
 import random
-from utils.utils import charger_config, sauvegarder_config, log_erreur, is_verified_user, is_admin
+from utils.utils import charger_config, definir_option_config, log_erreur, is_verified_user, is_admin
+from utils.demantelement import demanteler
+from utils.registre_vues import registre, vue_persistante
+from utils.planificateur_rest import INTERACTIF, planifier, route_messages
+from utils.provisionnement import MessageInitial, ModeleEspace, SalonModele, VOCAL, overwrites_prives, provisionner
 
 # Vérification pour les commandes support
 async def check_verified(interaction: discord.Interaction) -> bool:
@@ -60,7 +64,7 @@ class JournalBurnoutModal(discord.ui.Modal, title="Journal Burn-Out"):
             embed.set_footer(text="Signalé pour suivi")
 
             # Envoi dans le salon configuré
-            await channel.send(embed=embed)
+            await planifier(route_messages(channel.id), lambda: channel.send(embed=embed), INTERACTIF)
             await interaction.response.send_message(
                 "✅ Ton signalement a été envoyé. Le staff pourra te contacter bientôt.", ephemeral=True
             )
@@ -119,9 +123,13 @@ class BesoinParlerModal(discord.ui.Modal, title="Besoin d'en parler"):
             )
 
             content = role_ping.mention if role_ping else None
-            view = CreationSalonPriveView(requester=interaction.user, demande_title=self.besoin.value)
-
-            await channel.send(content=content, embed=embed, view=view)
+            message = await planifier(
+                route_messages(channel.id),
+                lambda: channel.send(content=content, embed=embed, view=registre.gabarit(CreationSalonPriveView)), INTERACTIF
+            )
+            await registre.enregistrer(message, CreationSalonPriveView, {
+                "requester_id": interaction.user.id, "demande_title": self.besoin.value
+            })
             await interaction.response.send_message(
                 "✅ Ton besoin a été transmis aux intervenants. Prends soin de toi.", ephemeral=True
             )
@@ -131,16 +139,23 @@ class BesoinParlerModal(discord.ui.Modal, title="Besoin d'en parler"):
                 "❌ Une erreur est survenue lors de l'envoi de ta demande.", ephemeral=True
             )
 
-# Vue pour créer un salon privé (inchangé)
+# Vue pour créer un salon privé
+@vue_persistante("support_creation")
 class CreationSalonPriveView(discord.ui.View):
-    def __init__(self, requester: discord.Member, demande_title: str):
+    def __init__(self):
         super().__init__(timeout=None)
-        self.requester = requester
-        self.demande_title = demande_title
 
-    @discord.ui.button(label="Créer un salon privé", style=discord.ButtonStyle.primary)
+    @discord.ui.button(label="Créer un salon privé", style=discord.ButtonStyle.primary, custom_id="support_creer_salon")
     async def creer_salon_prive(self, interaction: discord.Interaction, button: discord.ui.Button):
+        params = await registre.params_interaction(interaction, CreationSalonPriveView)
+        if params is None:
+            return
         guild = interaction.guild
+        requester = guild.get_member(params["requester_id"])
+        if requester is None:
+            return await interaction.response.send_message(
+                "❌ L'auteur de la demande n'est plus sur le serveur.", ephemeral=True
+            )
         config = charger_config()
 
         # Rôle intervenant (existant) et nouveau rôle "aideur_cours"
@@ -162,77 +177,74 @@ class CreationSalonPriveView(discord.ui.View):
             )
 
         try:
-            # Création de la catégorie avec permissions
-            category_name = f"{self.requester.display_name} - {self.demande_title}"
-            overwrites = {
-                guild.default_role: discord.PermissionOverwrite(read_messages=False),
-                self.requester: discord.PermissionOverwrite(read_messages=True, send_messages=True),
-                role_intervenant: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-            }
-            if role_aideur:
-                overwrites[role_aideur] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
-
-            category = await guild.create_category(name=category_name, overwrites=overwrites)
-            text_channel = await guild.create_text_channel("discussion", category=category)
-            await guild.create_voice_channel("support-voice", category=category)
+            await interaction.response.defer(ephemeral=True)
 
             # Prépare le message : ping du rôle aideur puis mention du demandeur
             clarif_message = ""
             if role_aideur:
                 clarif_message += f"{role_aideur.mention}  "
             clarif_message += (
-                f"{self.requester.mention}, ce salon a été créé spécialement pour toi. "
+                f"{requester.mention}, ce salon a été créé spécialement pour toi. "
                 "N'hésite pas à détailler un peu plus ton besoin si nécessaire !"
             )
 
-            # Envoi dans le salon texte avec la vue de suppression
-            suppression_view = SuppressionSalonView(category=category, role_intervenant=role_intervenant)
-            await text_channel.send(clarif_message, view=suppression_view)
+            # Catégorie + salons, puis le message avec la vue de suppression dans le salon texte
+            espace = await provisionner(guild, ModeleEspace(
+                categorie=f"{requester.display_name} - {params['demande_title']}",
+                overwrites=overwrites_prives(guild, requester, role_intervenant, role_aideur),
+                salons=[SalonModele("discussion"), SalonModele("support-voice", VOCAL)],
+                messages=[MessageInitial("discussion", clarif_message, vue=registre.gabarit(SuppressionSalonView))],
+            ))
+            category = espace.categorie
+            await registre.enregistrer(espace.messages[0], SuppressionSalonView, {
+                "category_id": category.id, "role_intervenant_id": role_intervenant.id
+            }, category_id=category.id)
 
-            await interaction.response.send_message(
+            await interaction.followup.send(
                 "✅ Salon privé créé avec succès.", ephemeral=True
             )
 
         except Exception as e:
             await log_erreur(interaction.client, guild, f"Erreur création salon privé: {e}")
-            await interaction.response.send_message(
+            await interaction.followup.send(
                 "❌ Une erreur est survenue lors de la création du salon privé.", ephemeral=True
             )
 
 
-# Vue pour supprimer la catégorie privée (inchangé)
+# Vue pour supprimer la catégorie privée
+@vue_persistante("support_suppression")
 class SuppressionSalonView(discord.ui.View):
-    def __init__(self, category: discord.CategoryChannel, role_intervenant: discord.Role):
+    def __init__(self):
         super().__init__(timeout=None)
-        self.category = category
-        self.role_intervenant = role_intervenant
 
-    @discord.ui.button(label="Problème réglé", style=discord.ButtonStyle.success)
+    @discord.ui.button(label="Problème réglé", style=discord.ButtonStyle.success, custom_id="support_supprimer_salon")
     async def supprimer_salon(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if self.role_intervenant not in interaction.user.roles:
+        params = await registre.params_interaction(interaction, SuppressionSalonView)
+        if params is None:
+            return
+        if not any(r.id == params["role_intervenant_id"] for r in interaction.user.roles):
             return await interaction.response.send_message(
                 "❌ Vous n'êtes pas autorisé à fermer cet espace.", ephemeral=True
             )
+        category = interaction.guild.get_channel(params["category_id"])
+        await interaction.response.defer(ephemeral=True)
+        resultat = await demanteler(category, contexte="SuppressionSalonView")
+        await registre.oublier_categorie(params["category_id"])
+        if resultat["echecs"]:
+            await log_erreur(interaction.client, interaction.guild,
+                             f"Fermeture espace privé : {resultat['echecs']} suppression(s) reportée(s) au prochain balayage")
         try:
-            await interaction.response.defer(ephemeral=True)
-            for channel in list(self.category.channels):
-                try:
-                    await channel.delete()
-                except Exception as e:
-                    await log_erreur(interaction.client, interaction.guild, f"Erreur suppression salon {channel.name}: {e}")
-            await self.category.delete()
             await interaction.followup.send(
                 "✅ L'espace privé a été fermé avec succès.", ephemeral=True
             )
-        except Exception as e:
-            await interaction.response.send_message(
-                f"❌ Erreur lors de la fermeture de l'espace: {e}", ephemeral=True
-            )
+        except discord.HTTPException:
+            pass
 
 # Cog regroupant les commandes support
 class SupportCommands(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        registre.installer(bot, CreationSalonPriveView, SuppressionSalonView)
 
     async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
         if isinstance(error, app_commands.CheckFailure):
@@ -270,9 +282,7 @@ class SupportCommands(commands.Cog):
     async def definir_salon_besoin(self, interaction: discord.Interaction, salon: discord.TextChannel):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        config = charger_config()
-        config["salon_besoin_d_en_parler"] = str(salon.id)
-        sauvegarder_config(config)
+        definir_option_config("salon_besoin_d_en_parler", str(salon.id))
         await interaction.response.send_message(
             f"✅ Salon pour 'besoin d'en parler' défini : {salon.mention}", ephemeral=True
         )
@@ -282,9 +292,7 @@ class SupportCommands(commands.Cog):
     async def definir_role_besoin(self, interaction: discord.Interaction, role: discord.Role):
         if not await is_admin(interaction.user):
             return await interaction.response.send_message("❌ Réservé aux administrateurs.", ephemeral=True)
-        config = charger_config()
-        config["role_besoin_d_en_parler"] = str(role.id)
-        sauvegarder_config(config)
+        definir_option_config("role_besoin_d_en_parler", str(role.id))
         await interaction.response.send_message(
             f"✅ Rôle pour 'besoin d'en parler' défini : {role.mention}", ephemeral=True
         )
@@ -303,9 +311,7 @@ class SupportCommands(commands.Cog):
                 "❌ Réservé aux administrateurs.", ephemeral=True
             )
 
-        cfg = charger_config()
-        cfg["role_aideur_cours"] = str(role.id)
-        sauvegarder_config(cfg)
+        definir_option_config("role_aideur_cours", str(role.id))
         await interaction.response.send_message(
             f"✅ Rôle **aideur cours** défini : {role.mention}",
             ephemeral=True
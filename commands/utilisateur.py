@@ -2,26 +2,24 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import random
-import json
-import os
+from utils import stockage
 from utils.utils import salon_est_autorise, get_or_create_role, charger_config, log_erreur, is_verified_user
+from utils.demantelement import demanteler
+from utils.registre_vues import registre, vue_persistante
+from utils.planificateur_rest import INTERACTIF, planifier, route_messages, route_roles
+from utils.provisionnement import MessageInitial, ModeleEspace, SalonModele, VOCAL, overwrites_prives, provisionner, supprimer_espace
 from commands.missions import charger_liste, MISSIONS_PATH, CONSEILS_PATH
 
 
-RESOURCES_PATH = "/data/ressources.json"
+RESOURCES_PATH = stockage.chemin_dataset("ressources")
 
-def load_resources() -> list[dict]:
+async def load_resources() -> list[dict]:
     """Retourne la liste des ressources [{name, url}, …]."""
-    if not os.path.exists(RESOURCES_PATH):
-        return []
-    with open(RESOURCES_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return await stockage.charger_async("ressources")
 
-def save_resources(resources: list[dict]) -> None:
+async def save_resources(resources: list[dict]) -> None:
     """Sauvegarde la liste des ressources."""
-    os.makedirs(os.path.dirname(RESOURCES_PATH), exist_ok=True)
-    with open(RESOURCES_PATH, "w", encoding="utf-8") as f:
-        json.dump(resources, f, indent=4, ensure_ascii=False)
+    await stockage.sauvegarder_async("ressources", resources)
 
 
 async def check_verified(interaction: discord.Interaction) -> bool:
@@ -32,6 +30,7 @@ async def check_verified(interaction: discord.Interaction) -> bool:
 class UtilisateurCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        registre.installer(bot, CoursAideView)
         
 
     async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
@@ -45,7 +44,7 @@ class UtilisateurCommands(commands.Cog):
             raise error
 
     async def check_salon(self, interaction: discord.Interaction, command_name: str) -> bool:
-        result = salon_est_autorise(command_name, interaction.channel_id, interaction.user)
+        result = await salon_est_autorise(command_name, interaction.channel_id, interaction.user)
         if result is False:
             await interaction.response.send_message("❌ Commande non autorisée dans ce salon.", ephemeral=True)
             return False
@@ -62,7 +61,7 @@ class UtilisateurCommands(commands.Cog):
         try:
             embed = discord.Embed(title="Nouvelle question méthodo", description=question, color=discord.Color.blurple())
             embed.set_footer(text=f"Posée par {interaction.user.display_name}")
-            await interaction.channel.send(embed=embed)
+            await planifier(route_messages(interaction.channel.id), lambda: interaction.channel.send(embed=embed), INTERACTIF)
             await interaction.followup.send("✅ Ta question a été envoyée !", ephemeral=True)
         except Exception as e:
             await log_erreur(self.bot, interaction.guild, f"Erreur dans /conseil_methodo : {e}")
@@ -74,7 +73,7 @@ class UtilisateurCommands(commands.Cog):
         if not await self.check_salon(interaction, "ressources"):
             return
 
-        ressources = load_resources()
+        ressources = await load_resources()
         if not ressources:
             return await interaction.response.send_message(
                 "ℹ️ Il n'y a pas de ressources pour le moment, le staff va s'en charger d'ici peu !", ephemeral=True )
@@ -100,14 +99,13 @@ class UtilisateurCommands(commands.Cog):
     )
     @app_commands.check(check_verified)
     async def mission_du_jour(self, interaction: discord.Interaction):
-        # salon_est_autorise est SYNCHRONE !
-        if not salon_est_autorise("mission_du_jour", interaction.channel_id, interaction.user):
+        if not await salon_est_autorise("mission_du_jour", interaction.channel_id, interaction.user):
             return await interaction.response.send_message(
                 "❌ Commande non autorisée ici.", ephemeral=True
             )
 
         try:
-            missions = charger_liste(MISSIONS_PATH)
+            missions = await charger_liste(MISSIONS_PATH)
             if not missions:
                 return await interaction.response.send_message(
                     "ℹ️ Aucune mission définie par l’admin.", ephemeral=True
@@ -128,13 +126,13 @@ class UtilisateurCommands(commands.Cog):
     )
     @app_commands.check(check_verified)
     async def conseil_aleatoire(self, interaction: discord.Interaction):
-        if not salon_est_autorise("conseil_aleatoire", interaction.channel_id, interaction.user):
+        if not await salon_est_autorise("conseil_aleatoire", interaction.channel_id, interaction.user):
             return await interaction.response.send_message(
                 "❌ Commande non autorisée ici.", ephemeral=True
             )
 
         try:
-            conseils = charger_liste(CONSEILS_PATH)
+            conseils = await charger_liste(CONSEILS_PATH)
             if not conseils:
                 return await interaction.response.send_message(
                     "ℹ️ Aucun conseil défini par l’admin.", ephemeral=True
@@ -186,39 +184,39 @@ class UtilisateurCommands(commands.Cog):
 
                     # Création d'un rôle temporaire unique pour cet espace d'aide
                     temp_role = await get_or_create_role(guild, f"CoursAide-{user.name}-{user.id}")
-                    await user.add_roles(temp_role)
 
                     config = charger_config()
                     role_aide_id = config.get("role_aide")
                     role_aide = guild.get_role(int(role_aide_id)) if role_aide_id else None
 
-                    # Définition des permissions pour la catégorie
-                    overwrites = {
-                        guild.default_role: discord.PermissionOverwrite(read_messages=False),
-                        temp_role: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-                    }
-                    if role_aide:
-                        overwrites[role_aide] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
-
-                    # Création de la catégorie d'aide
-                    category = await guild.create_category(category_name, overwrites=overwrites)
-                    # Création des salons dans la catégorie
-                    discussion_channel = await guild.create_text_channel("discussion", category=category)
-                    voice_channel = await guild.create_voice_channel("support-voice", category=category)
-
-                    # Envoi du message récapitulatif dans le salon "discussion"
+                    # Catégorie + salons + message récapitulatif, puis attribution du rôle
                     message_content = (
                         f"🔔 {role_aide.mention if role_aide else ''} Demande d'aide créée par {user.mention} !\n"
                         f"**Cours :** {self.cours.value}\n**Détails :** {self.details.value}"
                     )
-                    await discussion_channel.send(message_content)
+                    espace = await provisionner(guild, ModeleEspace(
+                        categorie=category_name,
+                        overwrites=overwrites_prives(guild, temp_role, role_aide),
+                        salons=[SalonModele("discussion"), SalonModele("support-voice", VOCAL)],
+                        messages=[MessageInitial("discussion", message_content)],
+                    ))
+                    category = espace.categorie
+                    try:
+                        await planifier(route_roles(guild.id), lambda: user.add_roles(temp_role), INTERACTIF)
+                    except Exception:
+                        # Espace inaccessible au demandeur : on ne laisse pas la demande ouverte
+                        await supprimer_espace(espace)
+                        await demanteler(roles=[temp_role], contexte="cours_aide annulé")
+                        raise
 
                     # Envoi d'un embed récapitulatif avec la vue permettant de supprimer l'espace
                     description = f"**Cours :** {self.cours.value}\n**Détails :** {self.details.value}"
                     embed = discord.Embed(title="Demande d'aide sur un cours", description=description, color=discord.Color.blue())
                     embed.set_footer(text=f"Demandée par {user.display_name}")
-                    view = CoursAideView(user, category, temp_role)
-                    await modal_interaction.followup.send(embed=embed, view=view)
+                    message = await modal_interaction.followup.send(embed=embed, view=registre.gabarit(CoursAideView), wait=True)
+                    await registre.enregistrer(message, CoursAideView, {
+                        "demandeur_id": user.id, "category_id": category.id, "temp_role_id": temp_role.id
+                    }, category_id=category.id)
                 except Exception as e:
                     await modal_interaction.followup.send("❌ Une erreur est survenue lors de la création de l'espace d'aide.", ephemeral=True)
                     await log_erreur(self.bot, guild, f"Erreur dans /cours_aide (on_submit) : {e}")
@@ -229,49 +227,46 @@ class UtilisateurCommands(commands.Cog):
             await log_erreur(self.bot, interaction.guild, f"Erreur lors de l'ouverture du modal /cours_aide : {e}")
             await interaction.followup.send("❌ Erreur lors de l'ouverture du formulaire.", ephemeral=True)
 
+@vue_persistante("cours_aide")
 class CoursAideView(discord.ui.View):
-    def __init__(self, demandeur: discord.Member, category: discord.CategoryChannel, temp_role: discord.Role):
+    def __init__(self):
         super().__init__(timeout=None)
-        self.demandeur = demandeur
-        self.category = category
-        self.temp_role = temp_role
 
     @discord.ui.button(label="J'ai aussi ce problème", style=discord.ButtonStyle.primary, custom_id="btn_probleme")
     async def probleme_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if self.temp_role not in interaction.user.roles:
-            await interaction.user.add_roles(self.temp_role)
+        params = await registre.params_interaction(interaction, CoursAideView)
+        if params is None:
+            return
+        temp_role = interaction.guild.get_role(params["temp_role_id"])
+        if temp_role is None:
+            await interaction.response.send_message("⚠️ Cette demande d'aide n'existe plus.", ephemeral=True)
+        elif temp_role not in interaction.user.roles:
+            await planifier(route_roles(interaction.guild.id), lambda: interaction.user.add_roles(temp_role), INTERACTIF)
             await interaction.response.send_message("✅ Vous avez rejoint cette demande d'aide.", ephemeral=True)
         else:
             await interaction.response.send_message("ℹ️ Vous êtes déjà associé à cette demande.", ephemeral=True)
 
     @discord.ui.button(label="Supprimer la demande", style=discord.ButtonStyle.danger, custom_id="btn_supprimer")
     async def supprimer_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        params = await registre.params_interaction(interaction, CoursAideView)
+        if params is None:
+            return
         # Seul le demandeur peut supprimer l'espace d'aide
-        if interaction.user != self.demandeur:
+        if interaction.user.id != params["demandeur_id"]:
             return await interaction.response.send_message("❌ Seul le demandeur peut supprimer cet espace d'aide.", ephemeral=True)
-        try:
-            await interaction.response.defer(ephemeral=True)
-            # Retirer le rôle temporaire de tous les membres
-            for member in list(self.temp_role.members):
-                await member.remove_roles(self.temp_role)
-            # Supprimer le rôle temporaire
-            await self.temp_role.delete()
-            # Supprimer tous les salons dans la catégorie
-            for channel in self.category.channels:
-                try:
-                    await channel.delete()
-                except Exception as e:
-                    await log_erreur(interaction.client, interaction.guild, f"Erreur lors de la suppression du salon {channel.name}: {e}")
-            # Supprimer la catégorie
-            await self.category.delete()
-            # Supprimer le message de la vue (si possible)
-            try:
-                await interaction.message.delete()
-            except Exception:
-                pass
-            await interaction.followup.send("✅ Votre espace d'aide a été fermé avec succès.", ephemeral=True)
-        except Exception as e:
-            await interaction.response.send_message(f"❌ Erreur lors de la suppression : {e}", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        # Supprimer le rôle temporaire le retire de tous les membres : pas de retrait un par un
+        resultat = await demanteler(
+            interaction.guild.get_channel(params["category_id"]),
+            roles=[interaction.guild.get_role(params["temp_role_id"])],
+            messages=[interaction.message],
+            contexte="CoursAideView"
+        )
+        await registre.oublier_categorie(params["category_id"])
+        if resultat["echecs"]:
+            await log_erreur(interaction.client, interaction.guild,
+                             f"Fermeture espace d'aide : {resultat['echecs']} suppression(s) reportée(s) au prochain balayage")
+        await interaction.followup.send("✅ Votre espace d'aide a été fermé avec succès.", ephemeral=True)
     
 
 async def setup_user_commands(bot):
@@ -3,64 +3,92 @@ import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 import asyncio
-import json
-import os
+import re
+import time
 from datetime import datetime
+from utils import stockage
+from utils.index_whitelist import index_whitelist, index_demandes, horodatage_demande
+from utils.registre_vues import registre, vue_persistante
+from utils.planificateur_rest import ARRIERE_PLAN, INTERACTIF, MODERATION, planifier, route_messages, route_roles
 from utils.utils import (
     is_admin,
     charger_config,
-    sauvegarder_config,
+    definir_option_config,
     log_erreur,
     role_autorise
 )
 
 # --- Paths and locks ---
 # Use absolute '/data' directory for persistence on Render
-DEMANDES_PATH = "/data/demandes_whitelist.json"
-WHITELIST_PATH = "/data/whitelist.json"
+DEMANDES_PATH = stockage.chemin_dataset("demandes_whitelist")
+WHITELIST_PATH = stockage.chemin_dataset("whitelist")
 _demandes_lock = asyncio.Lock()
 _whitelist_lock = asyncio.Lock()
 
-# --- JSON helpers ---
-def _load_json(path: str):
-    if not os.path.exists(path):
-        return []
+# --- Storage helpers (async storage layer, off the event loop) ---
+async def _load_json(path: str):
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return await stockage.charger_async(stockage.dataset_pour_chemin(path))
     except Exception as e:
         print(f"[WHITELIST] Error loading {path}: {e}")
         return []
 
-def _save_json(path: str, data):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
+async def _save_json(path: str, data):
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        await stockage.sauvegarder_async(stockage.dataset_pour_chemin(path), data)
     except Exception as e:
         print(f"[WHITELIST] Error writing {path}: {e}")
 
 async def load_demandes():
     async with _demandes_lock:
-        return await asyncio.get_event_loop().run_in_executor(None, _load_json, DEMANDES_PATH)
+        return await _load_json(DEMANDES_PATH)
 
 async def save_demandes(data):
     async with _demandes_lock:
-        await asyncio.get_event_loop().run_in_executor(None, _save_json, DEMANDES_PATH, data)
+        await _save_json(DEMANDES_PATH, data)
+        index_demandes.reconstruire(data)
+
+async def ajouter_demande(entry: dict):
+    """Dépôt (ou remplacement) d'une seule demande."""
+    async with _demandes_lock:
+        await stockage.ecrire_entree_async("demandes_whitelist", entry["user_id"], entry)
+        index_demandes.ajouter(entry)
+
+async def retirer_demande(user_id: int):
+    async with _demandes_lock:
+        if index_demandes.retirer(user_id) is not None:
+            await stockage.supprimer_entree_async("demandes_whitelist", user_id)
 
 async def load_whitelist():
     async with _whitelist_lock:
-        return await asyncio.get_event_loop().run_in_executor(None, _load_json, WHITELIST_PATH)
+        return await _load_json(WHITELIST_PATH)
 
 async def save_whitelist(data):
     async with _whitelist_lock:
-        await asyncio.get_event_loop().run_in_executor(None, _save_json, WHITELIST_PATH, data)
+        await _save_json(WHITELIST_PATH, data)
+        index_whitelist.reconstruire(data)
+
+async def ajouter_a_whitelist(entry: dict):
+    """Ajout d'une seule entrée (écriture ligne à ligne en SQLite)."""
+    async with _whitelist_lock:
+        await stockage.ecrire_entree_async("whitelist", entry["user_id"], entry)
+        index_whitelist.ajouter(entry)
+
+async def retirer_de_whitelist(user_id: int) -> dict | None:
+    """Suppression d'une seule entrée (écriture ligne à ligne en SQLite)."""
+    async with _whitelist_lock:
+        entry = index_whitelist.entree(user_id)
+        if entry is None:
+            return None
+        await stockage.supprimer_entree_async("whitelist", user_id)
+        index_whitelist.retirer(user_id)
+        return entry
 
 # --- Safe DM ---
 async def safe_send_dm(user: discord.User, content: str):
     try:
         dm = user.dm_channel or await user.create_dm()
-        return await dm.send(content)
+        return await planifier("dm", lambda: dm.send(content), ARRIERE_PLAN)
     except Exception as e:
         await log_erreur(None, None, f"safe_send_dm failed to {user.id}: {e}")
         return None
@@ -81,7 +109,6 @@ class DemandeAccesModal(discord.ui.Modal, title="Demande d'accès au serveur"):
 
     async def on_submit(self, interaction: discord.Interaction):
         user = interaction.user
-        demandes = await load_demandes()
         entry = {
             "user_id": user.id,
             "prenom": self.prenom.value,
@@ -89,8 +116,7 @@ class DemandeAccesModal(discord.ui.Modal, title="Demande d'accès au serveur"):
             "timestamp": datetime.utcnow().isoformat()
         }
         # Replace or append
-        demandes = [d for d in demandes if d.get("user_id") != user.id] + [entry]
-        await save_demandes(demandes)
+        await ajouter_demande(entry)
 
         # Build notification
         cfg = charger_config()
@@ -110,8 +136,14 @@ class DemandeAccesModal(discord.ui.Modal, title="Demande d'accès au serveur"):
         if vid and guild:
             chan = guild.get_channel(int(vid))
             if chan:
-                view = ValidationView(user.id, self.prenom.value, self.nom.value)
-                await chan.send(content=mention, embed=embed, view=view)
+                message = await planifier(
+                    route_messages(chan.id),
+                    lambda: chan.send(content=mention, embed=embed, view=registre.gabarit(ValidationView)),
+                    INTERACTIF
+                )
+                await registre.enregistrer(message, ValidationView, {
+                    "user_id": user.id, "prenom": self.prenom.value, "nom": self.nom.value
+                })
             else:
                 await safe_send_dm(user, "⚠️ Salon validation non trouvé.")
         else:
@@ -120,33 +152,68 @@ class DemandeAccesModal(discord.ui.Modal, title="Demande d'accès au serveur"):
         await interaction.response.send_message("✅ Demande envoyée aux modérateurs.", ephemeral=True)
 
 # --- Validation Buttons View (persistent) ---
+async def roles_verification(guild: discord.Guild):
+    cfg = charger_config()
+    rv = guild.get_role(int(cfg.get("role_non_verifie_id", 0))) or discord.utils.get(guild.roles, name="Non vérifié")
+    rm = guild.get_role(int(cfg.get("role_membre_id", 0))) or discord.utils.get(guild.roles, name="Membre")
+    return rv, rm
+
+def params_depuis_embed(message: discord.Message) -> dict | None:
+    """Demandes publiées avant le registre des vues : l'embed porte l'ID et le nom."""
+    if not message.embeds:
+        return None
+    embed = message.embeds[0]
+    user_id = re.search(r"ID: (\d+)", embed.footer.text or "")
+    prenom = re.search(r"\*\*Prénom\*\* : (.*)", embed.description or "")
+    nom = re.search(r"\*\*Nom\*\* : (.*)", embed.description or "")
+    if not user_id:
+        return None
+    return {"user_id": int(user_id.group(1)),
+            "prenom": prenom.group(1) if prenom else "", "nom": nom.group(1) if nom else ""}
+
+@vue_persistante("validation_whitelist")
 class ValidationView(discord.ui.View):
-    def __init__(self, user_id: int, prenom: str, nom: str):
+    def __init__(self):
         super().__init__(timeout=None)
-        self.user_id = user_id
-        self.prenom = prenom
-        self.nom = nom
 
-    async def _roles(self, guild: discord.Guild):
-        cfg = charger_config()
-        rv = guild.get_role(int(cfg.get("role_non_verifie_id", 0))) or discord.utils.get(guild.roles, name="Non vérifié")
-        rm = guild.get_role(int(cfg.get("role_membre_id", 0))) or discord.utils.get(guild.roles, name="Membre")
-        return rv, rm
+    @staticmethod
+    async def _params(interaction: discord.Interaction) -> dict | None:
+        params = await registre.params(interaction.message.id, ValidationView) or params_depuis_embed(interaction.message)
+        if params is None:
+            await interaction.followup.send("⚠️ Demande introuvable.", ephemeral=True)
+        return params
+
+    @staticmethod
+    async def _clore(interaction: discord.Interaction, couleur: discord.Color, statut: str):
+        msg = interaction.message
+        embed = msg.embeds[0]
+        embed.color = couleur
+        embed.add_field(name="Statut", value=statut, inline=False)
+        await planifier(
+            route_messages(msg.channel.id),
+            lambda: msg.edit(content=msg.content, embed=embed, view=registre.gabarit(ValidationView, desactiver=True)),
+            MODERATION
+        )
+        await registre.oublier(msg.id)
 
     @discord.ui.button(label="✅ Accepter", style=discord.ButtonStyle.success, custom_id="validation_accept")
     async def accepter(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
+        params = await self._params(interaction)
+        if params is None:
+            return
         guild = interaction.guild
-        member = guild.get_member(self.user_id)
+        member = guild.get_member(params["user_id"])
         if not member:
             return await interaction.followup.send("❌ Utilisateur introuvable.", ephemeral=True)
 
-        rv, rm = await self._roles(guild)
+        rv, rm = await roles_verification(guild)
         try:
+            route = route_roles(guild.id)
             if rv in member.roles:
-                await member.remove_roles(rv)
+                await planifier(route, lambda: member.remove_roles(rv), MODERATION)
             if rm:
-                await member.add_roles(rm)
+                await planifier(route, lambda: member.add_roles(rm), MODERATION)
         except Exception as e:
             await log_erreur(None, guild, f"Role management failed: {e}")
 
@@ -155,60 +222,100 @@ class ValidationView(discord.ui.View):
         await safe_send_dm(member, msg_val)
 
         # Save whitelist
-        wl = await load_whitelist()
-        if not any(e.get("user_id") == member.id for e in wl):
-            wl.append({
+        if not index_whitelist.contient(member.id):
+            await ajouter_a_whitelist({
                 "user_id": member.id,
-                "prenom": self.prenom,
-                "nom": self.nom,
+                "prenom": params["prenom"],
+                "nom": params["nom"],
                 "validated": datetime.utcnow().isoformat()
             })
-            await save_whitelist(wl)
 
         # Remove demande
-        demandes = await load_demandes()
-        demandes = [d for d in demandes if d.get("user_id") != member.id]
-        await save_demandes(demandes)
+        await retirer_demande(member.id)
 
         # Edit embed
-        msg = interaction.message
-        embed = msg.embeds[0]
-        embed.color = discord.Color.green()
-        embed.add_field(name="Statut", value=f"✅ Accepté par {interaction.user.mention}", inline=False)
-        for item in self.children:
-            item.disabled = True
-        await msg.edit(content=msg.content, embed=embed, view=self)
+        await self._clore(interaction, discord.Color.green(), f"✅ Accepté par {interaction.user.mention}")
         await interaction.followup.send("✅ Utilisateur accepté.", ephemeral=True)
 
     @discord.ui.button(label="❌ Refuser", style=discord.ButtonStyle.danger, custom_id="validation_decline")
     async def refuser(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
-        user = interaction.client.get_user(self.user_id)
+        params = await self._params(interaction)
+        if params is None:
+            return
+        user = interaction.client.get_user(params["user_id"])
         if user:
             await safe_send_dm(user, "❌ Ta demande a été refusée.")
 
-        demandes = await load_demandes()
-        demandes = [d for d in demandes if d.get("user_id") != self.user_id]
-        await save_demandes(demandes)
+        await retirer_demande(params["user_id"])
 
-        msg = interaction.message
-        embed = msg.embeds[0]
-        embed.color = discord.Color.red()
-        embed.add_field(name="Statut", value=f"❌ Refusé par {interaction.user.mention}", inline=False)
-        for item in self.children:
-            item.disabled = True
-        await msg.edit(content=msg.content, embed=embed, view=self)
+        await self._clore(interaction, discord.Color.red(), f"❌ Refusé par {interaction.user.mention}")
         await interaction.followup.send("⛔ Utilisateur refusé.", ephemeral=True)
 
+# --- Reminder digest ---
+# Limites Discord : 4096 caractères par description, 10 embeds et 6000 caractères par message
+DIGEST_DESCRIPTION_MAX = 4096
+DIGEST_EMBEDS_PAR_MESSAGE = 10
+DIGEST_CARACTERES_PAR_MESSAGE = 6000
+
+def duree_attente(secondes: float) -> str:
+    minutes = int(secondes // 60)
+    jours, minutes = divmod(minutes, 1440)
+    heures, minutes = divmod(minutes, 60)
+    if jours:
+        return f"{jours} j {heures} h"
+    if heures:
+        return f"{heures} h {minutes} min"
+    return f"{minutes} min"
+
+def construire_digest(demandes: list, maintenant: float = None) -> list[list[discord.Embed]]:
+    """Demandes (plus anciennes d'abord) → liste de messages, chacun une liste d'embeds."""
+    maintenant = maintenant if maintenant is not None else time.time()
+    lignes = []
+    for d in demandes:
+        depuis = horodatage_demande(d)
+        attente = duree_attente(maintenant - depuis) if depuis else "durée inconnue"
+        lignes.append(f"• <@{d['user_id']}> — {d.get('prenom', '')} {d.get('nom', '')} · en attente depuis **{attente}**")
+
+    descriptions, courante = [], ""
+    for ligne in lignes:
+        if courante and len(courante) + len(ligne) + 1 > DIGEST_DESCRIPTION_MAX:
+            descriptions.append(courante)
+            courante = ""
+        courante = f"{courante}\n{ligne}" if courante else ligne
+    descriptions.append(courante)
+
+    titre = f"⏰ {len(demandes)} demande(s) d'accès en attente"
+    messages, embeds, taille = [], [], 0
+    for i, description in enumerate(descriptions):
+        embed = discord.Embed(
+            title=titre if i == 0 else None,
+            description=description,
+            color=discord.Color.orange()
+        )
+        cout = len(description) + (len(titre) if i == 0 else 0)
+        if embeds and (len(embeds) == DIGEST_EMBEDS_PAR_MESSAGE or taille + cout > DIGEST_CARACTERES_PAR_MESSAGE):
+            messages.append(embeds)
+            embeds, taille = [], 0
+        embeds.append(embed)
+        taille += cout
+    messages.append(embeds)
+    return messages
+
 # --- Main Cog ---
 class Whitelist(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         # Register persistent views
         bot.add_view(RequestAccessView())
-        bot.add_view(ValidationView(0, "", ""))
+        registre.installer(bot, ValidationView)
         self.reminder_loop.start()
 
+    async def cog_load(self):
+        if not index_whitelist.est_charge:
+            index_whitelist.reconstruire(await load_whitelist())
+        index_demandes.reconstruire(await load_demandes())
+
     def cog_unload(self):
         self.reminder_loop.cancel()
 
@@ -222,63 +329,49 @@ class Whitelist(commands.Cog):
             description="Clique pour demander l'accès.",
             color=discord.Color.blurple()
         )
-        await salon.send(embed=embed, view=RequestAccessView())
+        await planifier(route_messages(salon.id), lambda: salon.send(embed=embed, view=RequestAccessView()), INTERACTIF)
         await interaction.response.send_message("✅ Bouton publié.", ephemeral=True)
 
     @app_commands.command(name="definir_salon_validation", description="Définir salon validation")
     @app_commands.default_permissions(administrator=True)
     async def definir_salon_validation(self, interaction: discord.Interaction, salon: discord.TextChannel):
-        cfg = charger_config()
-        cfg["journal_validation_channel"] = str(salon.id)
-        sauvegarder_config(cfg)
+        definir_option_config("journal_validation_channel", str(salon.id))
         await interaction.response.send_message(f"✅ Salon validation : {salon.mention}", ephemeral=True)
 
     @app_commands.command(name="definir_salon_rappel", description="Définir salon rappel")
     @app_commands.default_permissions(administrator=True)
     async def definir_salon_rappel(self, interaction: discord.Interaction, salon: discord.TextChannel):
-        cfg = charger_config()
-        cfg["salon_rappel_whitelist"] = str(salon.id)
-        sauvegarder_config(cfg)
+        definir_option_config("salon_rappel_whitelist", str(salon.id))
         await interaction.response.send_message(f"✅ Salon rappel : {salon.mention}", ephemeral=True)
 
     @app_commands.command(name="definir_role_admin", description="Définir rôle admin pour pings")
     @app_commands.default_permissions(administrator=True)
     async def definir_role_admin(self, interaction: discord.Interaction, role: discord.Role):
-        cfg = charger_config()
-        cfg["role_admin_id"] = str(role.id)
-        sauvegarder_config(cfg)
+        definir_option_config("role_admin_id", str(role.id))
         await interaction.response.send_message(f"✅ Rôle admin : {role.mention}", ephemeral=True)
 
     @app_commands.command(name="definir_role_staff", description="Définir rôle staff pour pings")
     @app_commands.default_permissions(administrator=True)
     async def definir_role_staff(self, interaction: discord.Interaction, role: discord.Role):
-        cfg = charger_config()
-        cfg["role_staff_id"] = str(role.id)
-        sauvegarder_config(cfg)
+        definir_option_config("role_staff_id", str(role.id))
         await interaction.response.send_message(f"✅ Rôle staff : {role.mention}", ephemeral=True)
 
     @app_commands.command(name="definir_role_membre", description="Définir rôle des membres validés")
     @app_commands.default_permissions(administrator=True)
     async def definir_role_membre(self, interaction: discord.Interaction, role: discord.Role):
-        cfg = charger_config()
-        cfg["role_membre_id"] = str(role.id)
-        sauvegarder_config(cfg)
+        definir_option_config("role_membre_id", str(role.id))
         await interaction.response.send_message(f"✅ Rôle membre : {role.mention}", ephemeral=True)
 
     @app_commands.command(name="definir_role_non_verifie", description="Définir rôle des non vérifiés")
     @app_commands.default_permissions(administrator=True)
     async def definir_role_non_verifie(self, interaction: discord.Interaction, role: discord.Role):
-        cfg = charger_config()
-        cfg["role_non_verifie_id"] = str(role.id)
-        sauvegarder_config(cfg)
+        definir_option_config("role_non_verifie_id", str(role.id))
         await interaction.response.send_message(f"✅ Rôle non vérifié : {role.mention}", ephemeral=True)
 
     @app_commands.command(name="definir_message_validation", description="Mettre à jour le message envoyé en DM après validation")
     @app_commands.default_permissions(administrator=True)
     async def definir_message_validation(self, interaction: discord.Interaction, message: str):
-        cfg = charger_config()
-        cfg["message_validation"] = message
-        sauvegarder_config(cfg)
+        definir_option_config("message_validation", message)
         await interaction.response.send_message("✅ Message de validation mis à jour.", ephemeral=True)
 
     @app_commands.command(name="verifier_config_whitelist", description="Afficher la configuration actuelle")
@@ -324,10 +417,9 @@ class Whitelist(commands.Cog):
     @app_commands.command(name="rechercher_whitelist", description="Rechercher un membre")
     @app_commands.default_permissions(administrator=True)
     async def rechercher_whitelist(self, interaction: discord.Interaction, query: str):
-        if not (await is_admin(interaction.user) or role_autorise(interaction, "rechercher_whitelist")):
+        if not (await is_admin(interaction.user) or await role_autorise(interaction, "rechercher_whitelist")):
             return await interaction.response.send_message("❌ Pas la permission.", ephemeral=True)
-        wl = await load_whitelist()
-        matches = [e for e in wl if query.lower() in e['prenom'].lower() or query.lower() in e['nom'].lower()]
+        matches = index_whitelist.rechercher(query)
         if not matches:
             return await interaction.response.send_message(f"❌ Aucun résultat pour '{query}'", ephemeral=True)
         desc = "\n".join(f"{e['prenom']} {e['nom']} — <@{e['user_id']}>" for e in matches)
@@ -337,21 +429,21 @@ class Whitelist(commands.Cog):
     @app_commands.command(name="retirer_whitelist", description="Retirer un membre")
     @app_commands.default_permissions(administrator=True)
     async def retirer_whitelist(self, interaction: discord.Interaction, membre: discord.Member):
-        wl = await load_whitelist()
-        entry = next((e for e in wl if e['user_id'] == membre.id), None)
+        # Les rôles passent en MODERATION et peuvent attendre derrière un traitement de masse
+        await interaction.response.defer(ephemeral=True)
+        entry = await retirer_de_whitelist(membre.id)
         if not entry:
-            return await interaction.response.send_message("ℹ️ Non whitelisté.", ephemeral=True)
-        wl.remove(entry)
-        await save_whitelist(wl)
-        rv, rm = await ValidationView(0, "", "")._roles(interaction.guild)
+            return await interaction.followup.send("ℹ️ Non whitelisté.", ephemeral=True)
+        rv, rm = await roles_verification(interaction.guild)
         try:
+            route = route_roles(interaction.guild.id)
             if rm in membre.roles:
-                await membre.remove_roles(rm)
+                await planifier(route, lambda: membre.remove_roles(rm), MODERATION)
             if rv and rv not in membre.roles:
-                await membre.add_roles(rv)
+                await planifier(route, lambda: membre.add_roles(rv), MODERATION)
         except Exception as e:
             await log_erreur(None, interaction.guild, f"Role revert failed: {e}")
-        await interaction.response.send_message(f"✅ {membre.mention} retiré.", ephemeral=True)
+        await interaction.followup.send(f"✅ {membre.mention} retiré.", ephemeral=True)
 
     @tasks.loop(hours=1)
     async def reminder_loop(self):
@@ -362,11 +454,12 @@ class Whitelist(commands.Cog):
         ch = self.bot.get_channel(int(rid))
         if not ch:
             return
-        demandes = await load_demandes()
-        for d in demandes:
-            user = self.bot.get_user(d['user_id'])
-            if user:
-                await ch.send(f"⏰ Rappel : {user.mention} ({d['prenom']} {d['nom']}) en attente.")
+        demandes = index_demandes.en_attente()
+        if not demandes:
+            return
+        # Un seul digest par passage, découpé en aussi peu de messages que possible
+        for embeds in construire_digest(demandes):
+            await planifier(route_messages(ch.id), lambda: ch.send(embeds=embeds), ARRIERE_PLAN)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Whitelist(bot))
@@ -1,18 +1,20 @@
 # main.py
 import discord
-from discord.ext import commands
 import asyncio
 import os
+import sys
 from dotenv import load_dotenv
-from keep_alive import keep_alive
-from utils.utils import charger_config
+from utils.utils import flush_config
+from utils.erreurs import pipeline as pipeline_erreurs, signaler
+from utils.catalogue_commandes import catalogue
+from utils.synchro_commandes import synchroniser
+from utils.demarrage import charger_cogs, prechauffer_datasets, profil
+from utils.sante import ServeurSante
+from utils.instrumentation import BotInstrumente
 
 # ───────────── Création du dossier /data si nécessaire ─────────────
 os.makedirs("/data", exist_ok=True)
 
-# ───────────── Lancement du serveur keep-alive ─────────────
-keep_alive()
-
 # ───────────── Chargement des variables d’environnement ─────────────
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
@@ -23,92 +25,73 @@ intents.message_content = True
 intents.guilds = True
 intents.members = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+# Au-delà de 30 s d'attente, discord.py lève RateLimited au lieu de bloquer :
+# le planificateur REST met alors la route en pause et laisse passer les autres.
+# BotInstrumente mesure la latence de chaque commande et listener (/diagnostic).
+bot = BotInstrumente(command_prefix="!", intents=intents, max_ratelimit_timeout=30)
 
 # ───────────── Gestion globale des erreurs ─────────────
 @bot.event
 async def on_error(event, *args, **kwargs):
-    try:
-        import traceback
-        error_info = traceback.format_exc()
-        print(f"[ERREUR GLOBALE] {error_info}")
-        config = charger_config()
-        log_channel_id = int(config.get("log_erreurs_channel", 0))
-        if not log_channel_id:
-            return
-        for guild in bot.guilds:
-            channel = guild.get_channel(log_channel_id)
-            if channel:
-                embed = discord.Embed(
-                    title="❌ Erreur globale détectée",
-                    description=f"```{error_info[:4000]}```",
-                    color=discord.Color.red()
-                )
-                await channel.send(embed=embed)
-    except Exception as e:
-        print(f"[ERREUR dans on_error] {e}")
+    # Regroupée, limitée en débit et archivée par le pipeline d'erreurs
+    erreur = sys.exc_info()[1]
+    signaler(f"Erreur dans {event} : {erreur!r}", f"evenement:{event}", erreur=erreur)
+
+# ───────────── Connexion / bot prêt ─────────────
+@bot.event
+async def on_connect():
+    profil.marquer("connexion")
 
-# ───────────── Bot prêt ─────────────
 @bot.event
 async def on_ready():
     print(f"✅ Connecté en tant que {bot.user} (ID : {bot.user.id})")
+    if "pret" not in profil.etapes:
+        profil.marquer("pret")
+        print(f"[DEMARRAGE] Connexion t+{profil.etapes.get('connexion')} ms, prêt t+{profil.etapes['pret']} ms")
     try:
-        print("🔄 Synchronisation des commandes slash...")
-        synced = await bot.tree.sync()
-        print(f"✅ {len(synced)} commandes synchronisées avec succès.")
+        # on_ready repasse à chaque reconnexion : la synchro n'a lieu que si l'arbre a changé
+        await synchroniser(bot)
+        catalogue.construire(bot.tree)
     except Exception as e:
         print(f"❌ Erreur lors de la synchronisation des commandes : {e}")
 
 # ───────────── Chargement des Cogs ─────────────
-async def load_cogs():
-    try:
-        print("🔧 Chargement des Cogs en cours...")
-        from commands.admin import setup_admin_commands
-        from commands.utilisateur import setup_user_commands
-        from commands.support import setup_support_commands
-        from commands.events import setup as setup_events
-        from commands import whitelist
-        from commands import loisir
-        from commands import missions
-        from commands import reaction_roles
-        from commands import checkin
-
-        await setup_admin_commands(bot)
-        print("✅ AdminCommands chargé")
-
-        await setup_user_commands(bot)
-        print("✅ UtilisateurCommands chargé")
+# (nom, module, fonction de setup) : chargés en parallèle, un échec n'arrête pas les autres
+COGS = [
+    ("AdminCommands",       "commands.admin",          "setup_admin_commands"),
+    ("UtilisateurCommands", "commands.utilisateur",    "setup_user_commands"),
+    ("SupportCommands",     "commands.support",        "setup_support_commands"),
+    ("Events",              "commands.events",         "setup"),
+    ("Whitelist",           "commands.whitelist",      "setup"),
+    ("LoisirCommands",      "commands.loisir",         "setup"),
+    ("Missions",            "commands.missions",       "setup"),
+    ("ReactionRole",        "commands.reaction_roles", "setup"),
+    ("Checkin",             "commands.checkin",        "setup"),
+]
 
-        await setup_support_commands(bot)
-        print("✅ SupportCommands chargé")
-
-        await setup_events(bot)
-        print("✅ Events chargé")
-
-        await whitelist.setup(bot)
-        print("✅ Whitelist chargé")
-
-        await loisir.setup(bot)
-        print("✅ LoisirCommands chargé")
-
-        await missions.setup(bot)
-        print("✅ Missions chargé")
-
-        await reaction_roles.setup(bot)
-        print("✅ ReactionRole chargé")
-
-        await checkin.setup(bot)
-        print("✅ Checkin chargé")
-    except Exception as e:
-        print(f"❌ Erreur lors du chargement des Cogs : {e}")
-        import traceback
-        traceback.print_exc()
+async def load_cogs():
+    print("🔧 Chargement des Cogs et des données en cours...")
+    await asyncio.gather(charger_cogs(bot, COGS), prechauffer_datasets())
+    catalogue.construire(bot.tree)
+    print(f"✅ Catalogue : {len(catalogue.commandes)} commandes")
+    profil.marquer("cogs")
+    profil.afficher()
 
 
 # ───────────── Lancement du bot ─────────────
 if __name__ == "__main__":
     async def main():
+        # Santé et métriques sur la boucle du bot, disponibles dès le chargement
+        sante = ServeurSante(bot)
+        await sante.demarrer()
+        pipeline_erreurs.demarrer(bot)
         await load_cogs()
-        await bot.start(TOKEN)
+        try:
+            await bot.start(TOKEN)
+        finally:
+            await sante.arreter()
+            await pipeline_erreurs.arreter()
+            # Écrit les modifications de config encore en attente de regroupement
+            flush_config()
 
     asyncio.run(main())
@@ -0,0 +1,59 @@
+# Reprise des suppressions en échec : une entrée ne part qu'une fois sa cible disparue.
+import asyncio
+from unittest import mock
+
+import discord
+import pytest
+
+from utils import demantelement, stockage
+from utils.stockage import StockageJSON
+
+@pytest.fixture(autouse=True)
+def stockage_temporaire(tmp_path, monkeypatch):
+    monkeypatch.setattr(stockage, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(stockage, "_stockage", StockageJSON())
+    monkeypatch.setattr(demantelement, "DELAI_TENTATIVE_S", 0)
+
+class FauxBot:
+    def __init__(self, guildes: dict):
+        self.guildes = guildes
+
+    def get_guild(self, guild_id):
+        return self.guildes.get(guild_id)
+
+    def get_channel(self, channel_id):
+        return None
+
+def _guilde(salon=None):
+    guilde = mock.Mock(unavailable=False, id=9)
+    guilde.get_channel.return_value = salon
+    return guilde
+
+def _balayer(bot):
+    async def scenario():
+        await stockage.ecrire_entree_async(demantelement.DATASET, "salon:1", {"type": "salon", "id": 1, "guild_id": 9})
+        resultat = await demantelement.balayer(bot)
+        return resultat, await stockage.charger_async(demantelement.DATASET)
+    return asyncio.run(scenario())
+
+def test_guilde_hors_cache_entree_conservee():
+    resultat, restantes = _balayer(FauxBot({}))
+    assert resultat == {"resolus": 0, "restants": 1}
+    assert "salon:1" in restantes
+
+def test_salon_disparu_entree_retiree():
+    resultat, restantes = _balayer(FauxBot({9: _guilde()}))
+    assert resultat == {"resolus": 1, "restants": 0}
+    assert restantes == {}
+
+def test_categorie_gardee_tant_qu_un_enfant_resiste():
+    async def echec():
+        raise discord.HTTPException(mock.Mock(status=500, reason="erreur"), "erreur serveur")
+    guilde = _guilde()
+    enfant = mock.Mock(spec=discord.TextChannel, guild=guilde, delete=echec)
+    categorie = mock.Mock(spec=discord.CategoryChannel, guild=guilde, channels=[enfant], delete=mock.AsyncMock())
+    guilde.get_channel.return_value = categorie
+    resultat, restantes = _balayer(FauxBot({9: guilde}))
+    assert resultat == {"resolus": 0, "restants": 1}
+    assert "salon:1" in restantes
+    categorie.delete.assert_not_awaited()
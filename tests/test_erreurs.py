@@ -0,0 +1,38 @@
+# Regroupement des erreurs : empreintes et archive des traces.
+import asyncio
+import json
+
+import pytest
+
+from utils import erreurs, stockage
+
+@pytest.fixture(autouse=True)
+def archive_temporaire(tmp_path, monkeypatch):
+    monkeypatch.setattr(stockage, "DATA_DIR", str(tmp_path))
+
+def _lever(message: str) -> Exception:
+    try:
+        raise ValueError(message)
+    except ValueError as e:
+        return e
+
+def test_empreinte_ignore_ids_mais_pas_le_message():
+    a = erreurs.empreinte(_lever("Membre 123456789012345678 introuvable"))
+    b = erreurs.empreinte(_lever("Membre 876543210987654321 introuvable"))
+    c = erreurs.empreinte(_lever("Salon 123456789012345678 verrouillé"))
+    assert a == b
+    assert a != c
+
+def test_archive_echantillons_horodates():
+    pipeline = erreurs.PipelineErreurs()
+    for i in range(erreurs.ECHANTILLONS_MAX + 3):
+        pipeline.signaler(f"Échec {i}", "test", erreur=_lever(f"Membre {i} introuvable"))
+    asyncio.run(pipeline.arreter())
+    with open(erreurs.chemin_archive(), encoding="utf-8") as f:
+        lignes = [json.loads(ligne) for ligne in f]
+    assert len(lignes) == 1
+    ligne = lignes[0]
+    assert ligne["occurrences"] == erreurs.ECHANTILLONS_MAX + 3
+    assert ligne["non_echantillonnees"] == 3
+    assert [e["message"] for e in ligne["echantillons"]] == [f"Échec {i}" for i in range(erreurs.ECHANTILLONS_MAX)]
+    assert all(e["ts"] and "Membre" in e["trace"] for e in ligne["echantillons"])
@@ -0,0 +1,102 @@
+# Check-ins d'humeur : journal, compaction et agrégats glissants.
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import humeurs, stockage
+from utils import utils as outils
+from utils.stockage import StockageJSON
+
+JOUR = humeurs.SECONDES_PAR_JOUR
+MAINTENANT = 20000 * JOUR + 12 * 3600
+
+@pytest.fixture(autouse=True)
+def stockage_temporaire(tmp_path, monkeypatch):
+    monkeypatch.setattr(stockage, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(stockage, "_stockage", StockageJSON())
+    monkeypatch.setattr(outils, "charger_config", lambda: {})
+    monkeypatch.setattr(humeurs, "charger_config", lambda: {})
+    monkeypatch.setattr(humeurs, "agregats", humeurs.AgregatsHumeurs())
+
+def test_ancien_format_lu_avant_compaction():
+    stockage.sauvegarder(humeurs.DATASET, {"42": [
+        {"date": "2024-10-01T10:00:00", "score": 4},
+        {"date": "2024-10-02T10:00:00", "score": 8},
+    ]})
+    humeurs.agregats.charger()
+    debut = (humeurs.date(2024, 10, 1) - humeurs.date(1970, 1, 1)).days
+    assert humeurs.agregats.somme_periode(42, debut, debut + 1) == (12, 2)
+    assert humeurs.agregats.dernier(42)[1] == 8
+
+def test_compaction_conserve_les_totaux():
+    for i in range(20):
+        humeurs.enregistrer_humeur(1, i % 11, MAINTENANT - i * JOUR)
+    humeurs.agregats.charger()
+    avant = humeurs.moyenne_sur(1, 30, MAINTENANT)
+    stats = humeurs.compacter(MAINTENANT)
+    assert stats["replies"] > 0
+    humeurs.agregats.charger()
+    assert humeurs.moyenne_sur(1, 30, MAINTENANT) == avant
+
+def _compacter_interrompu(monkeypatch, maintenant):
+    # Arrêt simulé entre l'écriture des cases et la réécriture du journal
+    with monkeypatch.context() as m:
+        def coupure(nom, enregistrements):
+            raise RuntimeError("arrêt")
+        m.setattr(stockage, "remplacer_journal", coupure)
+        with pytest.raises(RuntimeError):
+            humeurs.compacter(maintenant)
+
+@pytest.mark.parametrize("ancien_format", [False, True])
+def test_compaction_interrompue_ne_compte_rien_deux_fois(monkeypatch, ancien_format):
+    aujourd_hui = humeurs.jour_epoch(MAINTENANT)
+    if ancien_format:
+        # Historique à migrer : une entrée ancienne (repliée) et une récente (gardée)
+        stockage.sauvegarder(humeurs.DATASET, {"1": [
+            {"date": datetime.utcfromtimestamp((aujourd_hui - 10) * JOUR).isoformat(), "score": 4},
+            {"date": datetime.utcfromtimestamp(aujourd_hui * JOUR).isoformat(), "score": 6},
+        ]})
+    for i in range(10):
+        humeurs.enregistrer_humeur(1, i, MAINTENANT - i * JOUR)
+    humeurs.agregats.charger()
+    avant = humeurs.moyenne_sur(1, 30, MAINTENANT), humeurs.agregats.somme_periode(1, aujourd_hui - 30, aujourd_hui)
+
+    _compacter_interrompu(monkeypatch, MAINTENANT)
+    humeurs.agregats.charger()
+    assert (humeurs.moyenne_sur(1, 30, MAINTENANT), humeurs.agregats.somme_periode(1, aujourd_hui - 30, aujourd_hui)) == avant
+
+    humeurs.compacter(MAINTENANT)
+    humeurs.compacter(MAINTENANT)
+    humeurs.agregats.charger()
+    assert (humeurs.moyenne_sur(1, 30, MAINTENANT), humeurs.agregats.somme_periode(1, aujourd_hui - 30, aujourd_hui)) == avant
+
+def _moyenne_naive(entrees, debut: int, fin: int):
+    scores = [score for _, ts, score in entrees if debut <= humeurs.jour_epoch(ts) <= fin]
+    return round(sum(scores) / len(scores), 2) if scores else None
+
+@pytest.mark.parametrize("decalage_dernier", [0, 3, 200])
+def test_moyennes_glissantes_egales_au_calcul_naif(decalage_dernier):
+    hasard = random.Random(decalage_dernier)
+    aujourd_hui = humeurs.jour_epoch(MAINTENANT)
+    # Un peu plus d'un an et demi d'historique, insérés dans le désordre
+    entrees = [[5, MAINTENANT - (decalage_dernier + hasard.randint(0, 600)) * JOUR - hasard.randint(0, 40000),
+                hasard.randint(0, 10)] for _ in range(1500)]
+    for user_id, ts, score in entrees:
+        humeurs.agregats.ajouter(user_id, ts, score)
+    humeurs.agregats.est_charge = True
+    for jours in (1, 2, 7, 8, 30, 365, humeurs.CAPACITE_JOURS):
+        attendu = _moyenne_naive(entrees, aujourd_hui - jours + 1, aujourd_hui)
+        assert humeurs.moyenne_sur(5, jours, MAINTENANT) == attendu, jours
+    epoch = humeurs.date(1970, 1, 1)
+    for _ in range(50):
+        a, b = sorted(hasard.randint(aujourd_hui - humeurs.CAPACITE_JOURS + 1, aujourd_hui) for _ in range(2))
+        debut, fin = epoch + timedelta(days=a), epoch + timedelta(days=b)
+        assert humeurs.moyenne_periode(5, debut, fin) == _moyenne_naive(entrees, a, b)
+
+def test_moyenne_sur_sept_jours_calendaires():
+    aujourd_hui = humeurs.jour_epoch(MAINTENANT)
+    humeurs.agregats.ajouter(9, (aujourd_hui - 7) * JOUR, 10)
+    humeurs.agregats.ajouter(9, (aujourd_hui - 6) * JOUR, 2)
+    humeurs.agregats.est_charge = True
+    assert humeurs.moyenne_sur(9, 7, MAINTENANT) == 2
@@ -0,0 +1,64 @@
+# Interactions concurrentes : le stockage asynchrone ne doit pas bloquer la boucle.
+import asyncio
+import threading
+
+import pytest
+
+from utils import stockage
+from utils import utils as outils
+from utils.mesure_boucle import SondeBoucle
+from utils.stockage import StockageJSON
+
+ENTREES = 5000
+INTERACTIONS = 50
+# Retard toléré sur un réveil de la sonde (le GIL pris par json.loads dans un thread compte)
+RETARD_MAX_MS = 100
+
+@pytest.fixture(autouse=True)
+def stockage_temporaire(tmp_path, monkeypatch):
+    monkeypatch.setattr(stockage, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(stockage, "_stockage", StockageJSON())
+    monkeypatch.setattr(stockage, "_documents", {})
+    monkeypatch.setattr(stockage, "_verrous_async", {})
+    stockage.sauvegarder("whitelist", [
+        {"user_id": 10**17 + i, "prenom": f"Prénom{i}", "nom": f"Nom{i}"} for i in range(ENTREES)
+    ])
+
+def test_retard_de_boucle_borne_sous_charge():
+    async def interaction(i: int):
+        # Lecture de la whitelist, puis une écriture sur une demande sur cinq
+        await stockage.charger_async("whitelist")
+        if i % 5 == 0:
+            await stockage.ecrire_entree_async("demandes_whitelist", i, {"user_id": i})
+
+    async def scenario():
+        sonde = SondeBoucle()
+        sonde.demarrer()
+        await asyncio.gather(*(interaction(i) for i in range(INTERACTIONS)))
+        return await sonde.arreter()
+
+    resultat = asyncio.run(scenario())
+    assert resultat["echantillons"] > 0
+    assert resultat["max_ms"] < RETARD_MAX_MS, resultat
+    assert len(stockage.charger("demandes_whitelist")) == INTERACTIONS // 5
+
+def test_ecriture_de_config_hors_boucle(monkeypatch):
+    monkeypatch.setattr(outils, "_config_cache", {**outils._config_cache, "data": None, "sale": False, "flush": None})
+    monkeypatch.setattr(outils, "CONFIG_COALESCENCE_S", 0)
+    fils = []
+    sauvegarder = stockage.sauvegarder
+    def sauvegarder_trace(nom, data):
+        fils.append(threading.current_thread())
+        sauvegarder(nom, data)
+    monkeypatch.setattr(stockage, "sauvegarder", sauvegarder_trace)
+
+    async def scenario():
+        outils.update_config(lambda cfg: cfg.update(a=1))
+        outils.update_config(lambda cfg: cfg.update(b=2))
+        while outils._config_cache["sale"]:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert stockage.charger("config") == {"a": 1, "b": 2}
+    # Une seule écriture pour les deux modifications, et pas sur le fil de la boucle
+    assert len(fils) == 1 and fils[0] is not threading.main_thread()
@@ -0,0 +1,22 @@
+# Mode examen : un salon en échec n'interrompt pas les autres.
+import asyncio
+from unittest import mock
+
+import discord
+
+from utils import mode_examen
+from utils.progression import MessageProgression
+
+def test_rate_limited_est_un_echec_par_salon(monkeypatch):
+    async def planifier(route, fabrique, priorite):
+        return await fabrique()
+    monkeypatch.setattr(mode_examen, "planifier", planifier)
+    salons = [mock.Mock(id=i, guild=mock.Mock(id=9)) for i in range(4)]
+
+    async def action(salon):
+        if salon.id == 1:
+            raise discord.RateLimited(60.0)
+
+    reussis, echecs = asyncio.run(mode_examen._executer(salons, action, MessageProgression(None), "Test"))
+    assert [s.id for s in echecs] == [1]
+    assert sorted(s.id for s in reussis) == [0, 2, 3]
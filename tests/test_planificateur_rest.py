@@ -0,0 +1,38 @@
+# Planificateur REST : pauses de route après un 429.
+import asyncio
+
+import discord
+
+from utils import planificateur_rest
+from utils.planificateur_rest import INTERACTIF, PlanificateurREST
+
+def test_pauses_expirees_oubliees(monkeypatch):
+    monkeypatch.setattr(planificateur_rest, "_retry_after", lambda erreur: 0.01)
+    planificateur = PlanificateurREST()
+    tentatives = []
+
+    async def limite_puis_ok():
+        tentatives.append(1)
+        if len(tentatives) == 1:
+            raise discord.RateLimited(0.01)
+        return "ok"
+
+    async def toujours_limite():
+        raise discord.RateLimited(0.01)
+
+    async def scenario():
+        assert await planificateur.executer("salon:1", limite_puis_ok, INTERACTIF) == "ok"
+        assert planificateur._pauses == {}
+        try:
+            await planificateur.executer("salon:2", toujours_limite, INTERACTIF)
+        except discord.RateLimited:
+            pass
+        await asyncio.sleep(0.02)
+        # La pause de salon:2 a expiré : elle part à la prochaine pause posée
+        try:
+            await planificateur.executer("salon:3", toujours_limite, INTERACTIF)
+        except discord.RateLimited:
+            pass
+        return set(planificateur._pauses)
+
+    assert asyncio.run(scenario()) <= {"salon:3"}
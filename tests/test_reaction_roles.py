@@ -0,0 +1,16 @@
+# Index des reaction roles : un emoji peut donner plusieurs rôles.
+from utils import utils as outils
+
+def test_plusieurs_roles_pour_un_emoji():
+    outils.reconstruire_index_reaction_roles({
+        "10": [
+            {"emoji": "❤️", "role_id": 1},
+            {"emoji": "❤", "role_id": 2},
+            {"emoji": "<:perso:99>", "role_id": 3},
+            {"emoji": "❤️", "role_id": 1},
+        ],
+    })
+    assert outils.roles_pour_reaction(10, "❤️") == (1, 2)
+    assert outils.roles_pour_reaction(10, "<:perso:99>") == (3,)
+    assert outils.roles_pour_reaction(10, "👍") == ()
+    assert outils.roles_pour_reaction(11, "❤️") == ()
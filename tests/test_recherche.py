@@ -0,0 +1,59 @@
+# Autocomplétion missions / conseils : classement et budget de latence.
+import asyncio
+import random
+import string
+import time
+
+import pytest
+
+from commands import missions
+from utils import stockage
+from utils.recherche import IndexTextes, normaliser
+from utils.stockage import StockageJSON
+
+NB_MISSIONS = 5000
+# Discord coupe une autocomplétion au bout de 3 s ; une frappe doit rester très en deçà
+BUDGET_REQUETE_S = 0.005
+BUDGET_PIRE_REQUETE_S = 0.02
+BUDGET_CONSTRUCTION_S = 1.0
+
+def test_normalisation_sans_accents():
+    assert normaliser("  Hélène ÉCRIT ") == "helene ecrit"
+
+def test_classement_prefixe_puis_mot_puis_sous_chaine():
+    index = IndexTextes(["Relire le cours", "Lire un chapitre", "Élire un délégué", "Faire une liste"])
+    assert index.rechercher("lire") == ["Lire un chapitre", "Relire le cours", "Élire un délégué"]
+    assert index.rechercher("eli") == ["Élire un délégué", "Relire le cours"]
+    assert index.rechercher("") == index.textes[:25]
+
+@pytest.fixture
+def missions_nombreuses(tmp_path, monkeypatch):
+    monkeypatch.setattr(stockage, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(stockage, "_stockage", StockageJSON())
+    monkeypatch.setattr(missions, "MISSIONS_PATH", stockage.chemin_dataset("missions"))
+    monkeypatch.setattr(missions, "_index_listes", {})
+    hasard = random.Random(8)
+    mots = ["".join(hasard.choices(string.ascii_lowercase + "éèàç", k=hasard.randint(3, 10))) for _ in range(500)]
+    stockage.sauvegarder("missions", [" ".join(hasard.choices(mots, k=hasard.randint(3, 12))) for _ in range(NB_MISSIONS)])
+    requetes = [hasard.choice(mots)[:hasard.randint(1, 4)] for _ in range(500)]
+    # Sans aucun préfixe correspondant : le pire cas (balayage des sous-chaînes)
+    requetes += ["zzzz", "qxw", "éàç"]
+    return requetes
+
+def test_autocompletion_dans_le_budget(missions_nombreuses):
+    async def scenario():
+        debut = time.perf_counter()
+        await missions.index_liste(missions.MISSIONS_PATH)
+        construction = time.perf_counter() - debut
+        durees = []
+        for requete in missions_nombreuses:
+            debut = time.perf_counter()
+            choix = await missions.choix_autocomplete(missions.MISSIONS_PATH, requete)
+            durees.append(time.perf_counter() - debut)
+            assert len(choix) <= 25
+        return construction, durees
+
+    construction, durees = asyncio.run(scenario())
+    assert construction < BUDGET_CONSTRUCTION_S
+    assert sum(durees) / len(durees) < BUDGET_REQUETE_S
+    assert max(durees) < BUDGET_PIRE_REQUETE_S
@@ -0,0 +1,45 @@
+# Travaux de rôles en masse : erreurs par membre et purge des travaux finis.
+import asyncio
+import time
+from unittest import mock
+
+import discord
+import pytest
+
+from utils import roles_en_masse, stockage
+from utils.stockage import StockageJSON
+
+@pytest.fixture(autouse=True)
+def stockage_temporaire(tmp_path, monkeypatch):
+    monkeypatch.setattr(stockage, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(stockage, "_stockage", StockageJSON())
+    monkeypatch.setattr(roles_en_masse, "_actifs", {})
+
+def test_rate_limited_compte_comme_echec(monkeypatch):
+    async def planifier(route, fabrique, priorite):
+        raise discord.RateLimited(60.0)
+    monkeypatch.setattr(roles_en_masse, "planifier", planifier)
+    role = mock.Mock()
+    guilde = mock.Mock(id=9)
+    guilde.get_role.return_value = role
+    guilde.get_member.side_effect = lambda user_id: mock.Mock(roles=[])
+    etat = roles_en_masse.nouvel_etat(9, 1, "ajouter", list(range(10)), 5)
+
+    async def scenario():
+        return await roles_en_masse.lancer(guilde, etat).tache
+    resultat = asyncio.run(scenario())
+    assert resultat["statut"] == roles_en_masse.TERMINE
+    assert resultat["echecs"] == 10 and resultat["restants"] == []
+
+def test_purge_des_travaux_finis():
+    maintenant = time.time()
+    async def scenario():
+        for travail_id, statut, fini_a in (("vieux", roles_en_masse.TERMINE, maintenant - 2 * roles_en_masse.RETENTION_S),
+                                           ("recent", roles_en_masse.ANNULE, maintenant - 60),
+                                           ("coupe", roles_en_masse.INTERROMPU, maintenant - 2 * roles_en_masse.RETENTION_S)):
+            etat = roles_en_masse.nouvel_etat(9, 1, "retirer", [], 5)
+            etat.update(id=travail_id, statut=statut, fini_a=fini_a)
+            await stockage.ecrire_entree_async(roles_en_masse.DATASET, travail_id, etat)
+        assert await roles_en_masse.purger_anciens(maintenant) == 1
+        return await roles_en_masse.charger_travaux()
+    assert set(asyncio.run(scenario())) == {"recent", "coupe"}
@@ -0,0 +1,69 @@
+# Participation aux sorties : ordre des overwrites et reprise des sorties antérieures.
+import asyncio
+from unittest import mock
+
+import discord
+import pytest
+
+from utils import sorties, stockage
+from utils.stockage import StockageJSON
+
+@pytest.fixture(autouse=True)
+def etat_temporaire(tmp_path, monkeypatch):
+    monkeypatch.setattr(stockage, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(stockage, "_stockage", StockageJSON())
+    monkeypatch.setattr(sorties, "_cache", {})
+    monkeypatch.setattr(sorties, "_verrous", {})
+    monkeypatch.setattr(sorties, "_planifier_maj", lambda category: None)
+
+def _membre(member_id):
+    membre = mock.Mock(spec=discord.Member)
+    membre.id = member_id
+    return membre
+
+def _categorie(nom="Bowling - 3", overwrites=None, salons=()):
+    guilde = mock.Mock(id=9)
+    guilde.me = _membre(0)
+    appliques = []
+    async def set_permissions(cible, overwrite):
+        # Le premier appel traîne : un second clic ne doit pas le doubler
+        await asyncio.sleep(0.01 if not appliques else 0)
+        appliques.append((cible.id, overwrite))
+    categorie = mock.Mock(spec=discord.CategoryChannel, id=42, guild=guilde, overwrites=overwrites or {},
+                          channels=list(salons), set_permissions=set_permissions)
+    categorie.name = nom
+    return categorie, appliques
+
+def test_rejoindre_puis_quitter_dans_l_ordre():
+    async def scenario():
+        categorie, appliques = _categorie()
+        await sorties.creer(categorie, "Bowling", 1)
+        membre = _membre(5)
+        assert await asyncio.gather(sorties.rejoindre(categorie, membre), sorties.quitter(categorie, membre)) == [True, True]
+        return appliques, await sorties.charger(categorie.id)
+    appliques, doc = asyncio.run(scenario())
+    assert [overwrite for _, overwrite in appliques] == [sorties._ACCES, None]
+    assert doc["participants"] == []
+
+def test_sortie_anterieure_reconstruite():
+    auteur, ancien = _membre(1), _membre(2)
+    salon = mock.Mock(overwrites={ancien: discord.PermissionOverwrite(read_messages=True, send_messages=True)})
+    async def scenario():
+        categorie, appliques = _categorie(overwrites={auteur: discord.PermissionOverwrite(read_messages=True)}, salons=[salon])
+        categorie.overwrites[categorie.guild.me] = discord.PermissionOverwrite(read_messages=True)
+        rejoint = await sorties.rejoindre(categorie, _membre(3))
+        return rejoint, appliques, await stockage.lire_entree_async(sorties.DATASET, categorie.id)
+    rejoint, appliques, doc = asyncio.run(scenario())
+    assert rejoint
+    assert doc["auteur_id"] == 1 and doc["base_nom"] == "Bowling" and doc["participants"] == [2, 3]
+    assert sorties.nombre_participants(doc) == 3
+    # L'ancien participant garde son accès une fois porté par la catégorie
+    assert [cible for cible, _ in appliques] == [2, 3]
+
+def test_supprimer_vide_le_cache():
+    async def scenario():
+        categorie, _ = _categorie()
+        await sorties.creer(categorie, "Bowling", 1)
+        await sorties.supprimer(categorie.id)
+    asyncio.run(scenario())
+    assert sorties._cache == {} and sorties._verrous == {}
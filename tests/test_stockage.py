@@ -0,0 +1,151 @@
+# Même scénario pour chaque moteur de stockage : ils doivent rendre les mêmes documents.
+# MongoDB : contre un mongod local si MONGO_URI est défini, sinon contre mongomock
+# (requirements-dev.txt).
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from utils import stockage
+from utils.stockage import StockageJSON
+from utils.stockage_mongo import StockageMongo
+from utils.stockage_sqlite import StockageSQLite
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+def _client_mongo():
+    if os.environ.get("MONGO_URI"):
+        from pymongo import MongoClient
+        return MongoClient(os.environ["MONGO_URI"], serverSelectionTimeoutMS=5000)
+    if mongomock is not None:
+        return mongomock.MongoClient()
+    pytest.skip("MongoDB : ni MONGO_URI ni mongomock (pip install -r requirements-dev.txt)")
+
+@pytest.fixture
+def mongo(tmp_path, monkeypatch):
+    monkeypatch.setattr(stockage, "DATA_DIR", str(tmp_path))
+    client = _client_mongo()
+    # Base jetable : un mongod partagé n'est jamais touché en dehors d'elle
+    base = f"test_{uuid.uuid4().hex[:12]}"
+    yield StockageMongo(client, base=base)
+    client.drop_database(base)
+
+@pytest.fixture(params=["json", "sqlite", "mongo"])
+def moteur(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(stockage, "DATA_DIR", str(tmp_path))
+    if request.param == "json":
+        return StockageJSON()
+    if request.param == "sqlite":
+        return StockageSQLite(str(tmp_path / "bot.sqlite3"))
+    return request.getfixturevalue("mongo")
+
+def test_document_absent(moteur):
+    assert moteur.charger("config") == {}
+    assert moteur.charger("whitelist") == []
+    assert moteur.signature("config") is None
+    assert moteur.lire_journal("checkin") == []
+
+def test_aller_retour_dict_ordre_conserve(moteur):
+    config = {"b": 1, "a": {"x": [1, 2]}, "é": "accentué"}
+    moteur.sauvegarder("config", config)
+    assert list(moteur.charger("config").items()) == list(config.items())
+    config = {"a": {"x": [1, 2, 3]}, "c": None}
+    moteur.sauvegarder("config", config)
+    assert list(moteur.charger("config").items()) == list(config.items())
+
+def test_signature_change_a_chaque_ecriture(moteur):
+    moteur.sauvegarder("config", {"a": 1})
+    premiere = moteur.signature("config")
+    assert premiere is not None
+    moteur.ecrire_entree("config", "b", 2)
+    assert moteur.signature("config") != premiere
+
+def test_liste_a_cle_acces_par_entree(moteur):
+    moteur.sauvegarder("whitelist", [{"user_id": 1, "nom": "a"}, {"user_id": 2, "nom": "b"}])
+    assert moteur.lire_entree("whitelist", "2") == {"user_id": 2, "nom": "b"}
+    assert moteur.lire_entree("whitelist", "3") is None
+    moteur.ecrire_entree("whitelist", "1", {"user_id": 1, "nom": "A"})
+    moteur.ecrire_entree("whitelist", "3", {"user_id": 3, "nom": "c"})
+    assert [e["nom"] for e in moteur.charger("whitelist")] == ["A", "b", "c"]
+    assert moteur.supprimer_entree("whitelist", "2") is True
+    assert moteur.supprimer_entree("whitelist", "2") is False
+    assert [e["user_id"] for e in moteur.charger("whitelist")] == [1, 3]
+
+def test_cles_en_double_conservees(moteur):
+    demandes = [{"user_id": 7, "n": 1}, {"user_id": 8, "n": 2}, {"user_id": 7, "n": 3}]
+    moteur.sauvegarder("demandes_whitelist", demandes)
+    assert moteur.charger("demandes_whitelist") == demandes
+    # Comme en JSON : la lecture par clé rend la première, la suppression les retire toutes
+    assert moteur.lire_entree("demandes_whitelist", "7") == {"user_id": 7, "n": 1}
+    assert moteur.supprimer_entree("demandes_whitelist", "7") is True
+    assert moteur.charger("demandes_whitelist") == [{"user_id": 8, "n": 2}]
+
+def test_liste_sans_cle(moteur):
+    missions = ["lire", "écrire", "compter", "réviser"]
+    moteur.sauvegarder("missions", missions)
+    del missions[1]
+    moteur.sauvegarder("missions", missions)
+    assert moteur.charger("missions") == ["lire", "compter", "réviser"]
+
+def test_journal(moteur):
+    for i in range(3):
+        moteur.ajouter_au_journal("checkin", {"i": i})
+    assert moteur.lire_journal("checkin") == [{"i": 0}, {"i": 1}, {"i": 2}]
+    moteur.remplacer_journal("checkin", [{"i": "compacte"}])
+    moteur.ajouter_au_journal("checkin", {"i": 3})
+    assert moteur.lire_journal("checkin") == [{"i": "compacte"}, {"i": 3}]
+
+def test_positions_apres_sauvegarde_et_ajouts(moteur):
+    moteur.sauvegarder("whitelist", [{"user_id": 1}, {"user_id": 2}])
+    moteur.ecrire_entree("whitelist", "3", {"user_id": 3})
+    moteur.supprimer_entree("whitelist", "1")
+    moteur.ecrire_entree("whitelist", "4", {"user_id": 4})
+    assert [e["user_id"] for e in moteur.charger("whitelist")] == [2, 3, 4]
+
+def test_cache_de_documents(moteur, monkeypatch):
+    monkeypatch.setattr(stockage, "_stockage", moteur)
+    monkeypatch.setattr(stockage, "_documents", {})
+    lectures = []
+    lire = stockage._lire_document
+    async def lire_compte(backend, nom):
+        lectures.append(nom)
+        return await lire(backend, nom)
+    monkeypatch.setattr(stockage, "_lire_document", lire_compte)
+    async def scenario():
+        moteur.sauvegarder("config", {"a": 1})
+        premier = await stockage.charger_async("config")
+        premier["a"] = "modifié par l'appelant"
+        assert await stockage.charger_async("config") == {"a": 1}
+        moteur.ecrire_entree("config", "b", 2)
+        assert await stockage.charger_async("config") == {"a": 1, "b": 2}
+    asyncio.run(scenario())
+    assert lectures == ["config", "config"]
+
+# ========== Spécifique MongoDB : journal partagé entre processus ==========
+def test_mongo_ajout_concurrent_a_la_compaction_conserve(mongo):
+    autre = StockageMongo(mongo._db.client, base=mongo._db.name)
+    mongo.ajouter_au_journal("checkin", [1, 10, 3])
+    lus = mongo.lire_journal("checkin")
+    # Un autre processus ajoute un check-in pendant que celui-ci compacte
+    autre.ajouter_au_journal("checkin", [2, 20, 4])
+    mongo.remplacer_journal("checkin", [["compacte"] + lus])
+    assert mongo.lire_journal("checkin") == [["compacte", [1, 10, 3]], [2, 20, 4]]
+
+def test_mongo_lot_non_publie_ignore(mongo):
+    mongo.ajouter_au_journal("checkin", [1, 10, 3])
+    # Crash simulé entre l'écriture du lot et la bascule
+    mongo._journal("checkin").insert_one({"lot": "orphelin", "rang": 0, "valeur": "perdu"})
+    assert mongo.lire_journal("checkin") == [[1, 10, 3]]
+    mongo.remplacer_journal("checkin", [[1, 10, 3]])
+    assert mongo.lire_journal("checkin") == [[1, 10, 3]]
+    assert mongo._journal("checkin").count_documents({"lot": "orphelin"}) == 0
+
+def test_mongo_compteur_de_positions_repris(mongo):
+    # Documents écrits avant l'introduction du compteur
+    mongo._db["whitelist"].insert_many([{"_id": str(i), "position": i, "valeur": {"user_id": i}} for i in range(3)])
+    StockageMongo(mongo._db.client, base=mongo._db.name).ecrire_entree("whitelist", "9", {"user_id": 9})
+    assert [e["user_id"] for e in mongo.charger("whitelist")] == [0, 1, 2, 9]
@@ -0,0 +1,57 @@
+# catalogue_commandes.py
+# Catalogue des commandes slash, construit une fois au démarrage puis après chaque
+# synchronisation de l'arbre : chemin complet (groupe sous-commande), description,
+# cog d'origine, et recherche par préfixe pour les autocomplétions.
+from discord import app_commands
+
+from utils.recherche import IndexTextes
+
+class CommandeCatalogue:
+    __slots__ = ("chemin", "description", "cog", "admin")
+
+    def __init__(self, chemin: str, description: str, cog: str | None, admin: bool):
+        self.chemin = chemin
+        self.description = description
+        self.cog = cog
+        self.admin = admin
+
+class CatalogueCommandes:
+    def __init__(self):
+        self.commandes: dict[str, CommandeCatalogue] = {}
+        self._index = IndexTextes([])
+
+    def construire(self, tree: app_commands.CommandTree):
+        commandes = {}
+        def parcourir(cmd, admin_parent=False, cog_parent=None):
+            permissions = getattr(cmd, "default_permissions", None)
+            admin = admin_parent or bool(permissions and permissions.administrator)
+            binding = getattr(cmd, "binding", None)
+            cog = type(binding).__name__ if binding is not None else cog_parent
+            if isinstance(cmd, app_commands.Group):
+                for sous in cmd.commands:
+                    parcourir(sous, admin, cog)
+            elif isinstance(cmd, app_commands.Command):
+                commandes[cmd.qualified_name] = CommandeCatalogue(cmd.qualified_name, cmd.description, cog, admin)
+        for cmd in tree.get_commands():
+            parcourir(cmd)
+        self.commandes = dict(sorted(commandes.items()))
+        self._index = IndexTextes(list(self.commandes))
+
+    def rechercher(self, requete: str, limite: int = 25) -> list[CommandeCatalogue]:
+        return [self.commandes[c] for c in self._index.rechercher(requete, limite)]
+
+    def par_cog(self, admin_seulement: bool = False) -> dict[str, list[CommandeCatalogue]]:
+        groupes = {}
+        for cmd in self.commandes.values():
+            if admin_seulement and not cmd.admin:
+                continue
+            groupes.setdefault(cmd.cog or "Autres", []).append(cmd)
+        return groupes
+
+    def choix(self, requete: str) -> list[app_commands.Choice[str]]:
+        return [
+            app_commands.Choice(name=f"{c.chemin} — {c.cog or '?'}"[:100], value=c.chemin)
+            for c in self.rechercher(requete)
+        ]
+
+catalogue = CatalogueCommandes()
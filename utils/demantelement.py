@@ -0,0 +1,134 @@
+# demantelement.py
+# Fermeture d'un espace privé (rôles temporaires, salons, catégorie, messages annexes) :
+#   - les rôles sont supprimés d'abord : Discord les retire alors de tous les membres,
+#     inutile de les enlever un par un ;
+#   - les salons et les messages sont supprimés en parallèle, avec quelques tentatives
+#     en cas d'erreur serveur ; la catégorie ne part qu'une fois vidée ;
+#   - ce qui échoue encore est consigné dans le dataset "demantelements_en_echec" et
+#     repris par balayer() (boucle périodique du cog admin).
+# Les suppressions passent par le planificateur REST (MODERATION, ARRIERE_PLAN au balayage).
+import asyncio
+import time
+
+import discord
+
+from utils import stockage
+from utils.planificateur_rest import ARRIERE_PLAN, MODERATION, planifier, route_messages, route_roles, route_salons
+
+DATASET = "demantelements_en_echec"
+TENTATIVES = 3
+DELAI_TENTATIVE_S = 1.0
+# Cible impossible à vérifier pour l'instant (guilde absente du cache ou indisponible)
+INCONNU = object()
+
+def _route(cible) -> str:
+    if isinstance(cible, discord.Role):
+        return route_roles(cible.guild.id)
+    if isinstance(cible, (discord.Message, discord.PartialMessage)):
+        return route_messages(cible.channel.id)
+    return route_salons(cible.guild.id)
+
+async def _supprimer(cible, priorite: int = MODERATION, tentatives: int = TENTATIVES):
+    """Supprime un salon, rôle ou message. NotFound = déjà fait."""
+    for essai in range(tentatives):
+        try:
+            await planifier(_route(cible), cible.delete, priorite)
+            return
+        except discord.NotFound:
+            return
+        except discord.Forbidden:
+            raise
+        except discord.HTTPException:
+            if essai == tentatives - 1:
+                raise
+            await asyncio.sleep(DELAI_TENTATIVE_S * (essai + 1))
+
+def _description(cible) -> dict:
+    if isinstance(cible, discord.Role):
+        return {"type": "role", "id": cible.id, "guild_id": cible.guild.id}
+    if isinstance(cible, (discord.Message, discord.PartialMessage)):
+        return {"type": "message", "id": cible.id, "channel_id": cible.channel.id,
+                "guild_id": cible.guild.id if cible.guild else None}
+    return {"type": "salon", "id": cible.id, "guild_id": cible.guild.id}
+
+async def _consigner(echecs: list[tuple], contexte: str):
+    for cible, erreur in echecs:
+        entree = _description(cible)
+        entree.update({"contexte": contexte, "erreur": str(erreur)[:200], "depuis": int(time.time())})
+        await stockage.ecrire_entree_async(DATASET, f"{entree['type']}:{entree['id']}", entree)
+
+async def _etape(cibles: list, priorite: int = MODERATION) -> list[tuple]:
+    """Supprime les cibles en parallèle ; renvoie [(cible, erreur)] pour les échecs."""
+    resultats = await asyncio.gather(*(_supprimer(c, priorite) for c in cibles), return_exceptions=True)
+    return [(c, r) for c, r in zip(cibles, resultats) if isinstance(r, Exception)]
+
+async def demanteler(categorie: discord.CategoryChannel = None, roles=(), messages=(), contexte: str = "") -> dict:
+    """
+    Ferme un espace : rôles, puis salons de la catégorie + messages annexes, puis la
+    catégorie. Ne lève pas : renvoie {"supprimes": n, "echecs": n} et consigne les échecs.
+    """
+    roles = [r for r in roles if r is not None]
+    messages = [m for m in messages if m is not None]
+    salons = list(categorie.channels) if categorie is not None else []
+
+    echecs = await _etape(roles)
+    echecs += await _etape(salons + messages)
+    if categorie is not None:
+        # Une catégorie supprimée avant ses salons les laisserait orphelins
+        if any(isinstance(c, discord.abc.GuildChannel) for c, _ in echecs):
+            echecs.append((categorie, "salons enfants non supprimés"))
+        else:
+            echecs += await _etape([categorie])
+
+    if echecs:
+        await _consigner(echecs, contexte)
+    total = len(roles) + len(salons) + len(messages) + (categorie is not None)
+    return {"supprimes": total - len(echecs), "echecs": len(echecs)}
+
+async def balayer(bot: discord.Client) -> dict:
+    """
+    Reprend les suppressions consignées. Les catégories passent après les salons.
+    Une entrée n'est retirée qu'une fois sa cible supprimée ou confirmée disparue.
+    """
+    en_echec = await stockage.charger_async(DATASET)
+    ordre = {"role": 0, "message": 1, "salon": 2}
+    entrees = sorted(
+        en_echec.items(),
+        key=lambda kv: (ordre[kv[1]["type"]], isinstance(_resoudre(bot, kv[1]), discord.CategoryChannel))
+    )
+    resolus = restants = 0
+    for cle, entree in entrees:
+        cible = _resoudre(bot, entree)
+        if cible is INCONNU:
+            restants += 1
+            continue
+        try:
+            if cible is not None:
+                if isinstance(cible, discord.CategoryChannel) and cible.channels:
+                    # La catégorie attend que tous ses salons soient partis
+                    if await _etape(list(cible.channels), ARRIERE_PLAN):
+                        restants += 1
+                        continue
+                await _supprimer(cible, ARRIERE_PLAN)
+            await stockage.supprimer_entree_async(DATASET, cle)
+            resolus += 1
+        except discord.HTTPException:
+            restants += 1
+    return {"resolus": resolus, "restants": restants}
+
+def _resoudre(bot: discord.Client, entree: dict):
+    """Objet Discord à supprimer, None s'il n'existe plus, INCONNU si on ne peut pas le savoir."""
+    guild = None
+    if entree.get("guild_id"):
+        guild = bot.get_guild(entree["guild_id"])
+        if guild is None or guild.unavailable:
+            return INCONNU
+    if entree["type"] == "role":
+        return guild.get_role(entree["id"]) if guild else INCONNU
+    if entree["type"] == "salon":
+        return guild.get_channel(entree["id"]) if guild else INCONNU
+    salon = bot.get_channel(entree["channel_id"])
+    if salon is None:
+        # Salon disparu d'une guilde en cache : le message avec lui
+        return None if guild else INCONNU
+    return salon.get_partial_message(entree["id"])
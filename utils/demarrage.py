@@ -0,0 +1,106 @@
+# demarrage.py
+# Pipeline de démarrage instrumenté :
+#   1. import de chaque module de cog, chronométré (séquentiel : les imports Python
+#      sont sérialisés ; un module importé par un autre est compté chez le premier) ;
+#   2. setup des cogs EN PARALLÈLE, chacun isolé : l'échec d'un cog est affiché avec
+#      sa trace et n'empêche pas les autres de se charger ;
+#   3. en même temps, préchargement et validation de tous les datasets de /data
+#      (premier accès au moteur, cache de documents de utils.stockage, cache de config) ;
+#   4. profil imprimé, puis complété par les temps de connexion et de « prêt ».
+import asyncio
+import importlib
+import time
+import traceback
+
+from utils import stockage
+from utils.utils import charger_config
+
+class ProfilDemarrage:
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.imports: dict[str, float] = {}
+        self.setups: dict[str, float] = {}
+        self.echecs: dict[str, str] = {}
+        self.datasets: dict[str, dict] = {}
+        self.etapes: dict[str, float] = {}
+
+    def ecoule_ms(self) -> float:
+        return round((time.perf_counter() - self.debut) * 1000, 1)
+
+    def marquer(self, etape: str):
+        """Horodate une étape (t+ depuis le lancement) ; seule la première occurrence compte."""
+        self.etapes.setdefault(etape, self.ecoule_ms())
+
+    def afficher(self):
+        lignes = ["[DEMARRAGE] Profil"]
+        lignes.append(f"  imports   : {round(sum(self.imports.values()), 1)} ms — " + _top(self.imports))
+        lignes.append(f"  cogs      : {len(self.setups)} chargés — " + _top(self.setups))
+        for nom, erreur in self.echecs.items():
+            lignes.append(f"  ❌ {nom} : {erreur}")
+        invalides = {n: d["erreur"] for n, d in self.datasets.items() if d.get("erreur")}
+        lignes.append(f"  datasets  : {len(self.datasets) - len(invalides)}/{len(self.datasets)} valides — "
+                      + _top({n: d["ms"] for n, d in self.datasets.items()}))
+        for nom, erreur in invalides.items():
+            lignes.append(f"  ❌ dataset {nom} : {erreur}")
+        for etape, t in self.etapes.items():
+            lignes.append(f"  {etape:<10}: t+{t} ms")
+        print("\n".join(lignes))
+
+def _top(durees: dict[str, float], n: int = 4) -> str:
+    plus_lents = sorted(durees.items(), key=lambda kv: kv[1], reverse=True)[:n]
+    return ", ".join(f"{nom} {ms} ms" for nom, ms in plus_lents) or "—"
+
+profil = ProfilDemarrage()
+
+# ========== Cogs ==========
+async def _setup(bot, nom: str, setup):
+    debut = time.perf_counter()
+    try:
+        await setup(bot)
+    except Exception as e:
+        profil.echecs[nom] = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+        return
+    profil.setups[nom] = round((time.perf_counter() - debut) * 1000, 1)
+
+async def charger_cogs(bot, cogs: list[tuple[str, str, str]]):
+    """cogs : [(nom affiché, module, fonction de setup)]."""
+    setups = []
+    for nom, module, fonction in cogs:
+        debut = time.perf_counter()
+        try:
+            setups.append((nom, getattr(importlib.import_module(module), fonction)))
+        except Exception as e:
+            profil.echecs[nom] = f"import : {type(e).__name__}: {e}"
+            traceback.print_exc()
+        profil.imports[module] = round((time.perf_counter() - debut) * 1000, 1)
+    await asyncio.gather(*(_setup(bot, nom, setup) for nom, setup in setups))
+
+# ========== Datasets ==========
+def _valider(nom: str, data) -> str | None:
+    info = stockage.DATASETS[nom]
+    if not isinstance(data, info["type"]):
+        return f"type {type(data).__name__} au lieu de {info['type'].__name__}"
+    if info["cle"]:
+        sans_cle = sum(1 for e in data if not isinstance(e, dict) or info["cle"] not in e)
+        if sans_cle:
+            return f"{sans_cle} entrée(s) sans « {info['cle']} »"
+    return None
+
+async def _prechauffer_dataset(nom: str):
+    debut = time.perf_counter()
+    try:
+        data = await stockage.charger_async(nom)
+        erreur = _valider(nom, data)
+        taille = len(data)
+    except Exception as e:
+        erreur, taille = f"{type(e).__name__}: {e}", 0
+    profil.datasets[nom] = {"ms": round((time.perf_counter() - debut) * 1000, 1), "entrees": taille, "erreur": erreur}
+
+async def prechauffer_datasets():
+    # Ouvre le moteur (connexion SQLite / pool MongoDB) avant les lectures parallèles
+    await asyncio.to_thread(stockage.get_stockage)
+    await asyncio.gather(*(_prechauffer_dataset(nom) for nom in stockage.DATASETS))
+    # La config est lue à chaque commande : elle entre tout de suite dans son cache
+    # (premier chargement synchrone, donc hors de la boucle)
+    await asyncio.to_thread(charger_config)
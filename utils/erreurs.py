@@ -0,0 +1,243 @@
+# erreurs.py
+# Pipeline des erreurs : log_erreur() et on_error ne postent plus un embed par erreur.
+#
+#   - chaque erreur reçoit une empreinte : message normalisé (nombres, ids et adresses
+#     → #), précédé pour une exception de son type et de sa pile d'appels (fichier,
+#     fonction, sans numéros de ligne) ; les répétitions d'une même empreinte sont
+#     regroupées pour la notification ;
+#   - une tâche de fond vide les groupes toutes les FLUSH_S secondes : un groupe est
+#     posté à sa première occurrence, puis au plus une fois par FENETRE_S avec le
+#     nombre de répétitions ; au-delà de POSTS_PAR_MINUTE, les groupes restants sont
+#     réunis dans un seul message de synthèse ou attendent le vidage suivant ;
+#   - l'archive locale (/data/erreurs.jsonl, une rotation au-delà de ARCHIVE_MAX_OCTETS)
+#     reçoit pour chaque groupe vidé ses traces complètes horodatées : toutes, jusqu'à
+#     ECHANTILLONS_MAX par vidage, les suivantes étant seulement comptées.
+# Pendant une tempête de 5xx, le salon de logs reçoit donc quelques messages par minute
+# et le bot garde ses limites de débit pour le reste.
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import traceback
+from collections import deque
+
+import discord
+
+from utils import stockage
+from utils.metriques import compteur, jauge
+from utils.planificateur_rest import ARRIERE_PLAN, planifier, route_messages
+
+FLUSH_S = 10
+FENETRE_S = 60
+POSTS_PAR_MINUTE = 5
+ARCHIVE = "erreurs.jsonl"
+ARCHIVE_MAX_OCTETS = 5 * 2**20
+ECHANTILLONS_MAX = 5
+
+erreurs_signalees = compteur("bot_erreurs_total", "Erreurs signalées", ("source",))
+posts_reportes = compteur("bot_erreurs_posts_reportes_total", "Groupes d'erreurs reportés par la limite de posts")
+
+_VARIABLE = re.compile(r"[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}|0x[0-9a-f]+|\b[0-9a-f]{8,}\b|\d+", re.IGNORECASE)
+
+def normaliser(message: str) -> str:
+    """Message sans ce qui change d'une occurrence à l'autre (ids, nombres, adresses)."""
+    return _VARIABLE.sub("#", message)[:200]
+
+def empreinte(erreur: BaseException | None, message: str = "") -> str:
+    if erreur is not None:
+        pile = traceback.extract_tb(erreur.__traceback__)[-8:]
+        base = (type(erreur).__qualname__ + "|" + normaliser(str(erreur)) + "|"
+                + "|".join(f"{os.path.basename(f.filename)}:{f.name}" for f in pile))
+    else:
+        base = normaliser(message)
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()[:12]
+
+class GroupeErreurs:
+    __slots__ = ("empreinte", "source", "message", "trace", "guild_id", "premier", "dernier",
+                 "total", "en_attente", "poste_a", "echantillons")
+
+    def __init__(self, empreinte: str, source: str, message: str, trace: str, guild_id: int | None):
+        self.empreinte = empreinte
+        self.source = source
+        self.message = message
+        self.trace = trace
+        self.guild_id = guild_id
+        self.premier = self.dernier = time.time()
+        self.total = 0
+        self.en_attente = 0
+        self.poste_a = None
+        # Occurrences à archiver depuis le dernier vidage (les ECHANTILLONS_MAX premières)
+        self.echantillons: list[dict] = []
+
+    def pret(self, maintenant: float) -> bool:
+        return self.en_attente > 0 and (self.poste_a is None or maintenant - self.poste_a >= FENETRE_S)
+
+class PipelineErreurs:
+    def __init__(self):
+        self.groupes: dict[str, GroupeErreurs] = {}
+        self._posts: deque[float] = deque()
+        self._a_archiver: list[dict] = []
+        self._tache = None
+        self.bot = None
+
+    # ----- Entrée -----
+    def signaler(self, message: str, source: str, guild: discord.Guild = None, erreur: BaseException = None):
+        """Enregistre une erreur (synchrone, ne poste rien)."""
+        erreurs_signalees.inc(source=source.split(":")[0])
+        cle = empreinte(erreur, message)
+        groupe = self.groupes.get(cle)
+        trace = None
+        if groupe is None or len(groupe.echantillons) < ECHANTILLONS_MAX:
+            trace = "".join(traceback.format_exception(erreur)) if erreur is not None else message
+        if groupe is None:
+            groupe = self.groupes[cle] = GroupeErreurs(cle, source, message, trace, guild.id if guild else None)
+            # Première occurrence seulement : une tempête ne remplit pas la console
+            print(f"[ERREUR {cle}] {source} : {message}\n{trace if erreur is not None else ''}".rstrip())
+        groupe.dernier = time.time()
+        groupe.total += 1
+        groupe.en_attente += 1
+        if trace is not None:
+            groupe.echantillons.append({
+                "ts": round(groupe.dernier, 3), "source": source, "guild_id": guild.id if guild else None,
+                "message": message, "trace": trace,
+            })
+
+    # ----- Boucle de vidage -----
+    def demarrer(self, bot: discord.Client):
+        self.bot = bot
+        if self._tache is None or self._tache.done():
+            self._tache = asyncio.create_task(self._tourner())
+
+    async def arreter(self):
+        if self._tache is not None:
+            self._tache.cancel()
+            self._tache = None
+        # Rien ne part sur Discord à l'arrêt, mais l'archive est complétée
+        maintenant = time.time()
+        for groupe in self.groupes.values():
+            if groupe.en_attente:
+                self._preparer_archive(groupe, maintenant)
+                groupe.en_attente = 0
+        await self._archiver()
+
+    async def _tourner(self):
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                await self.vider()
+            except Exception as e:
+                print(f"[ERREURS] Échec du vidage : {e}")
+            await asyncio.sleep(FLUSH_S)
+
+    def _budget(self, maintenant: float) -> int:
+        while self._posts and maintenant - self._posts[0] >= 60:
+            self._posts.popleft()
+        return POSTS_PAR_MINUTE - len(self._posts)
+
+    async def vider(self) -> int:
+        """Poste les groupes prêts dans la limite de débit. Renvoie le nombre de messages envoyés."""
+        maintenant = time.time()
+        self._oublier_anciens(maintenant)
+        prets = sorted((g for g in self.groupes.values() if g.pret(maintenant)), key=lambda g: g.en_attente, reverse=True)
+        if not prets:
+            return 0
+        salon = self._salon()
+        envoyes = 0
+        if salon is not None:
+            budget = self._budget(maintenant)
+            if budget <= 0:
+                # Les répétitions continuent de s'accumuler jusqu'au prochain créneau
+                posts_reportes.inc(len(prets))
+                return 0
+            individuels = prets if len(prets) <= budget else prets[:budget - 1]
+            for groupe in individuels:
+                await self._poster(salon, self._embed(groupe))
+            if len(individuels) < len(prets):
+                await self._poster(salon, self._embed_synthese(prets[len(individuels):]))
+            envoyes = min(len(prets), budget)
+        # Sans salon de logs configuré, l'archive locale reste la seule trace
+        for groupe in prets:
+            self._preparer_archive(groupe, maintenant)
+            groupe.en_attente = 0
+            groupe.poste_a = maintenant
+        await self._archiver()
+        return envoyes
+
+    def _oublier_anciens(self, maintenant: float):
+        # Les groupes calmes depuis 10 fenêtres sont oubliés (la prochaine occurrence sera « nouvelle »)
+        for cle in [c for c, g in self.groupes.items() if not g.en_attente and maintenant - g.dernier > 10 * FENETRE_S]:
+            del self.groupes[cle]
+
+    # ----- Discord -----
+    def _salon(self):
+        # Import local : utils.utils importe ce module pour log_erreur
+        from utils.utils import charger_config
+        salon_id = charger_config().get("log_erreurs_channel")
+        if not salon_id or self.bot is None:
+            return None
+        return self.bot.get_channel(int(salon_id))
+
+    async def _poster(self, salon, embed: discord.Embed):
+        self._posts.append(time.time())
+        try:
+            await planifier(route_messages(salon.id), lambda: salon.send(embed=embed), ARRIERE_PLAN)
+        except discord.HTTPException as e:
+            print(f"[ERREURS] Envoi impossible : {e}")
+
+    def _embed(self, groupe: GroupeErreurs) -> discord.Embed:
+        repetitions = f" (×{groupe.en_attente})" if groupe.en_attente > 1 else ""
+        embed = discord.Embed(
+            title=f"❌ Erreur détectée{repetitions}",
+            description=f"{groupe.message[:1500]}\n```{groupe.trace[-2200:]}```" if groupe.trace != groupe.message
+            else groupe.message[:4000],
+            color=discord.Color.red()
+        )
+        embed.set_footer(text=f"{groupe.source} · empreinte {groupe.empreinte} · {groupe.total} au total")
+        return embed
+
+    def _embed_synthese(self, groupes: list[GroupeErreurs]) -> discord.Embed:
+        embed = discord.Embed(
+            title=f"⚠️ {sum(g.en_attente for g in groupes)} autres erreurs ({len(groupes)} groupes)",
+            description="Limite de messages atteinte : détail dans l'archive locale.",
+            color=discord.Color.orange()
+        )
+        for groupe in groupes[:25]:
+            embed.add_field(name=f"×{groupe.en_attente} · {groupe.empreinte}", value=groupe.message[:200] or "—", inline=False)
+        return embed
+
+    # ----- Archive locale -----
+    def _preparer_archive(self, groupe: GroupeErreurs, maintenant: float):
+        self._a_archiver.append({
+            "ts": int(maintenant), "empreinte": groupe.empreinte, "source": groupe.source, "guild_id": groupe.guild_id,
+            "occurrences": groupe.en_attente, "premier": int(groupe.premier), "dernier": int(groupe.dernier),
+            "message": groupe.message, "echantillons": groupe.echantillons,
+            "non_echantillonnees": groupe.en_attente - len(groupe.echantillons),
+        })
+        groupe.echantillons = []
+
+    async def _archiver(self):
+        if not self._a_archiver:
+            return
+        lignes, self._a_archiver = self._a_archiver, []
+        await asyncio.to_thread(_ecrire_archive, lignes)
+
+def chemin_archive() -> str:
+    return os.path.join(stockage.DATA_DIR, ARCHIVE)
+
+def _ecrire_archive(lignes: list[dict]):
+    path = chemin_archive()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path) and os.path.getsize(path) > ARCHIVE_MAX_OCTETS:
+        os.replace(path, path + ".1")
+    with open(path, "a", encoding="utf-8") as f:
+        for ligne in lignes:
+            f.write(json.dumps(ligne, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+pipeline = PipelineErreurs()
+jauge("bot_erreurs_groupes_en_attente", "Groupes d'erreurs non encore postés",
+      lambda: sum(1 for g in pipeline.groupes.values() if g.en_attente))
+
+def signaler(message: str, source: str, guild: discord.Guild = None, erreur: BaseException = None):
+    pipeline.signaler(message, source, guild, erreur)
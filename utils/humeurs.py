@@ -0,0 +1,283 @@
+# humeurs.py
+# Stockage des check-ins d'humeur :
+#   - chaque check-in est ajouté au journal "checkin" sous forme compacte [user_id, timestamp, score] ;
+#   - une compaction périodique replie les entrées plus vieilles que `checkin_compaction_jours`
+#     en cases journalières par utilisateur (dataset "checkin_humeurs") et applique
+#     la rétention `checkin_retention_jours`.
+# Le coût d'un check-in ne dépend donc plus de l'historique, et le disque reste borné.
+#
+# La compaction écrit deux documents (cases, puis journal) : les cases portent un marqueur
+# (génération, limite de repli, entrées migrées gardées) et le journal réécrit commence par
+# {"compaction": génération}. Tant que les deux ne concordent pas, l'arrêt est tombé entre
+# les deux écritures : les entrées du journal d'avant la limite sont ignorées (déjà dans les
+# cases) et les entrées migrées sont relues depuis le marqueur. Rien n'est compté deux fois.
+#
+# Les moyennes glissantes sont servies par des agrégats en mémoire (AgregatsHumeurs),
+# mis à jour à chaque check-in et reconstruits au démarrage depuis le stockage.
+import threading
+import time
+from array import array
+from datetime import date
+
+from utils import stockage
+from utils.utils import charger_config
+
+JOURNAL = "checkin"
+DATASET = "checkin_humeurs"
+SECONDES_PAR_JOUR = 86400
+MARQUEUR = "_compaction"
+
+COMPACTION_JOURS_DEFAUT = 2
+RETENTION_JOURS_DEFAUT = 365
+# Fenêtre maximale interrogeable ; l'anneau garde un jour de plus (le cumul de la veille
+# du premier jour de la fenêtre)
+CAPACITE_JOURS = 366
+TAILLE_ANNEAU = CAPACITE_JOURS + 1
+
+def jour_epoch(ts: float) -> int:
+    return int(ts) // SECONDES_PAR_JOUR
+
+def _parametres() -> tuple[int, int]:
+    cfg = charger_config()
+    compaction = int(cfg.get("checkin_compaction_jours", COMPACTION_JOURS_DEFAUT))
+    retention = int(cfg.get("checkin_retention_jours", RETENTION_JOURS_DEFAUT))
+    return max(compaction, 0), max(retention, compaction, 1)
+
+def enregistrer_humeur(user_id: int, score: int, ts: float = None) -> list:
+    """Ajoute un check-in au journal (une ligne, sans relire l'historique)."""
+    enregistrement = [int(user_id), int(ts if ts is not None else time.time()), int(score)]
+    stockage.ajouter_au_journal(JOURNAL, enregistrement)
+    if agregats.est_charge:
+        agregats.ajouter(*enregistrement)
+    return enregistrement
+
+async def enregistrer_humeur_async(user_id: int, score: int, ts: float = None) -> list:
+    """Variante pour les cogs : l'ajout au journal se fait hors de la boucle d'événements."""
+    enregistrement = [int(user_id), int(ts if ts is not None else time.time()), int(score)]
+    await stockage.ajouter_au_journal_async(JOURNAL, enregistrement)
+    if agregats.est_charge:
+        agregats.ajouter(*enregistrement)
+    return enregistrement
+
+def _migrer_ancien_format(cases: dict) -> list:
+    """
+    Ancien format : {user_id: [{"date": iso, "score": n}, …]}.
+    Les entrées sont converties en enregistrements de journal, la compaction fait le reste.
+    """
+    from datetime import datetime, timezone
+    enregistrements = []
+    for user_id, valeur in list(cases.items()):
+        if not isinstance(valeur, list):
+            continue
+        for e in valeur:
+            horodatage = datetime.fromisoformat(e["date"])
+            if horodatage.tzinfo is None:
+                horodatage = horodatage.replace(tzinfo=timezone.utc)
+            enregistrements.append([int(user_id), int(horodatage.timestamp()), int(e["score"])])
+        del cases[user_id]
+    return enregistrements
+
+def _journal_effectif(cases: dict, journal: list) -> tuple[list, list]:
+    """
+    Retire le marqueur de `cases` et renvoie (entrées migrées à reporter, entrées du
+    journal à compter), en écartant ce qu'une compaction interrompue a déjà replié.
+    """
+    marqueur = cases.pop(MARQUEUR, None)
+    entrees = [e for e in journal if not isinstance(e, dict)]
+    tete = journal[0] if journal and isinstance(journal[0], dict) else {}
+    if marqueur is None or tete.get("compaction") == marqueur["generation"]:
+        return [], entrees
+    return marqueur["reportes"], [e for e in entrees if jour_epoch(e[1]) >= marqueur["limite"]]
+
+def compacter(maintenant: float = None) -> dict:
+    """
+    Replie le journal en cases journalières et applique la rétention.
+    Format des cases : {user_id: {"jours": {jour_epoch: [somme, nombre]}, "dernier": [ts, score]}}.
+    """
+    maintenant = maintenant if maintenant is not None else time.time()
+    compaction_jours, retention_jours = _parametres()
+    jour_actuel = jour_epoch(maintenant)
+    limite_compaction = jour_actuel - compaction_jours
+    limite_retention = jour_actuel - retention_jours
+
+    # Le verrou du journal n'est tenu que pour le lire puis le remplacer : les check-ins
+    # arrivés pendant le calcul sont recopiés tels quels à la fin.
+    with stockage.verrou_dataset(DATASET):
+        cases = stockage.charger(DATASET)
+        journal = stockage.lire_journal(JOURNAL)
+        deja_lus = len(journal)
+        generation = (cases.get(MARQUEUR) or {}).get("generation", 0) + 1
+        reportes, entrees = _journal_effectif(cases, journal)
+        reportes = _migrer_ancien_format(cases) + reportes
+
+        replies = 0
+        def replier(enregistrements: list) -> list:
+            nonlocal replies
+            conserves = []
+            for user_id, ts, score in enregistrements:
+                jour = jour_epoch(ts)
+                if jour < limite_retention:
+                    continue
+                if jour >= limite_compaction:
+                    conserves.append([user_id, ts, score])
+                    continue
+                doc = cases.setdefault(str(user_id), {"jours": {}, "dernier": None})
+                somme, nombre = doc["jours"].get(str(jour), [0, 0])
+                doc["jours"][str(jour)] = [somme + score, nombre + 1]
+                if doc["dernier"] is None or ts >= doc["dernier"][0]:
+                    doc["dernier"] = [ts, score]
+                replies += 1
+            return conserves
+
+        # Entrées migrées gardées : hors du journal tant qu'il n'est pas réécrit
+        reportes = replier(reportes)
+        conserves = reportes + replier(entrees)
+
+        expires = 0
+        for user_id in list(cases):
+            jours = cases[user_id]["jours"]
+            for jour in [j for j in jours if int(j) < limite_retention]:
+                del jours[jour]
+                expires += 1
+            if not jours:
+                del cases[user_id]
+
+        cases[MARQUEUR] = {"generation": generation, "limite": limite_compaction, "reportes": reportes}
+        stockage.sauvegarder(DATASET, cases)
+        with stockage.verrou_journal(JOURNAL):
+            arrives_entre_temps = stockage.lire_journal(JOURNAL)[deja_lus:]
+            stockage.remplacer_journal(JOURNAL, [{"compaction": generation}] + conserves + arrives_entre_temps)
+
+    return {"replies": replies, "conserves": len(conserves), "cases_expirees": expires}
+
+# ========== Agrégats glissants en mémoire ==========
+class _AnneauUtilisateur:
+    """
+    Anneau de TAILLE_ANNEAU cases contenant les cumuls (somme, nombre) arrêtés à
+    chaque jour : la somme sur [a, b] vaut cumul(b) - cumul(a - 1), en O(1).
+    """
+    __slots__ = ("sommes", "nombres", "premier_jour", "dernier_jour", "somme", "nombre", "dernier")
+
+    def __init__(self):
+        self.sommes = array("q", bytes(8 * TAILLE_ANNEAU))
+        self.nombres = array("q", bytes(8 * TAILLE_ANNEAU))
+        self.premier_jour = None
+        self.dernier_jour = None
+        self.somme = 0
+        self.nombre = 0
+        self.dernier = None
+
+    def _avancer(self, jour: int):
+        # Les jours sans check-in reprennent le cumul courant (au plus un tour d'anneau)
+        debut = max(self.dernier_jour + 1, jour - TAILLE_ANNEAU + 1)
+        for j in range(debut, jour + 1):
+            self.sommes[j % TAILLE_ANNEAU] = self.somme
+            self.nombres[j % TAILLE_ANNEAU] = self.nombre
+        self.dernier_jour = jour
+
+    def ajouter(self, jour: int, somme: int, nombre: int):
+        if self.dernier_jour is None:
+            self.premier_jour = self.dernier_jour = jour
+        elif jour > self.dernier_jour:
+            self._avancer(jour)
+        self.somme += somme
+        self.nombre += nombre
+        self.premier_jour = min(self.premier_jour, jour)
+        # Check-in dans le passé (reconstruction désordonnée) : on décale les cumuls suivants
+        for j in range(max(jour, self._plus_ancien()), self.dernier_jour + 1):
+            self.sommes[j % TAILLE_ANNEAU] += somme
+            self.nombres[j % TAILLE_ANNEAU] += nombre
+
+    def _plus_ancien(self) -> int:
+        return self.dernier_jour - TAILLE_ANNEAU + 1
+
+    def cumul(self, jour: int) -> tuple[int, int]:
+        """Cumul arrêté au jour `jour` inclus, qui doit être dans l'anneau ou avant le premier check-in."""
+        if self.dernier_jour is None or jour < self.premier_jour:
+            return 0, 0
+        if jour >= self.dernier_jour:
+            return self.somme, self.nombre
+        return self.sommes[jour % TAILLE_ANNEAU], self.nombres[jour % TAILLE_ANNEAU]
+
+    def fenetre(self, debut: int, fin: int) -> tuple[int, int]:
+        """(somme, nombre) sur [debut, fin], coupé au début de l'anneau : les jours plus anciens ne comptent pas."""
+        if self.dernier_jour is None:
+            return 0, 0
+        debut = max(debut, self._plus_ancien() + 1)
+        if debut > fin:
+            return 0, 0
+        s_fin, n_fin = self.cumul(fin)
+        s_debut, n_debut = self.cumul(debut - 1)
+        return s_fin - s_debut, n_fin - n_debut
+
+class AgregatsHumeurs:
+    def __init__(self):
+        self._utilisateurs: dict[int, _AnneauUtilisateur] = {}
+        self._lock = threading.RLock()
+        self.est_charge = False
+
+    def charger(self):
+        """Reconstruit les agrégats depuis les cases compactées et le journal."""
+        with self._lock:
+            self._utilisateurs = {}
+            cases = stockage.charger(DATASET)
+            reportes, entrees = _journal_effectif(cases, stockage.lire_journal(JOURNAL))
+            # Historique à l'ancien format pas encore compacté : lu comme des entrées de journal
+            anciens = _migrer_ancien_format(cases) + reportes
+            for user_id, doc in cases.items():
+                if not isinstance(doc, dict):
+                    continue
+                for jour, (somme, nombre) in sorted(doc["jours"].items(), key=lambda kv: int(kv[0])):
+                    self._anneau(int(user_id)).ajouter(int(jour), somme, nombre)
+                if doc.get("dernier"):
+                    self._anneau(int(user_id)).dernier = list(doc["dernier"])
+            for user_id, ts, score in sorted(anciens + entrees, key=lambda e: e[1]):
+                self.ajouter(user_id, ts, score)
+            self.est_charge = True
+
+    def _assurer_charge(self):
+        if not self.est_charge:
+            self.charger()
+
+    def _anneau(self, user_id: int) -> _AnneauUtilisateur:
+        anneau = self._utilisateurs.get(user_id)
+        if anneau is None:
+            anneau = self._utilisateurs[user_id] = _AnneauUtilisateur()
+        return anneau
+
+    def ajouter(self, user_id: int, ts: int, score: int):
+        with self._lock:
+            anneau = self._anneau(int(user_id))
+            anneau.ajouter(jour_epoch(ts), score, 1)
+            if anneau.dernier is None or ts >= anneau.dernier[0]:
+                anneau.dernier = [ts, score]
+
+    def dernier(self, user_id: int):
+        with self._lock:
+            self._assurer_charge()
+            anneau = self._utilisateurs.get(int(user_id))
+            return anneau.dernier if anneau else None
+
+    def somme_periode(self, user_id: int, jour_debut: int, jour_fin: int) -> tuple[int, int]:
+        """(somme, nombre) des check-ins entre deux jours epoch inclus."""
+        with self._lock:
+            self._assurer_charge()
+            anneau = self._utilisateurs.get(int(user_id))
+            return anneau.fenetre(jour_debut, jour_fin) if anneau else (0, 0)
+
+def _moyenne(somme: int, nombre: int):
+    return round(somme / nombre, 2) if nombre else None
+
+def moyenne_sur(user_id: int, jours: int, maintenant: float = None):
+    """Moyenne des check-ins des `jours` derniers jours, aujourd'hui compris (None si aucune donnée)."""
+    maintenant = maintenant if maintenant is not None else time.time()
+    # Jours ]aujourd'hui - jours, aujourd'hui] : exactement `jours` jours calendaires
+    fin = jour_epoch(maintenant)
+    return _moyenne(*agregats.somme_periode(user_id, fin - jours + 1, fin))
+
+def moyenne_periode(user_id: int, debut: date, fin: date):
+    """Moyenne des check-ins entre deux dates (UTC, incluses)."""
+    epoch = date(1970, 1, 1)
+    return _moyenne(*agregats.somme_periode(user_id, (debut - epoch).days, (fin - epoch).days))
+
+agregats = AgregatsHumeurs()
@@ -0,0 +1,144 @@
+# index_whitelist.py
+# Index mémoire de la whitelist : ensemble des ids (arrivées sur le serveur),
+# id → entrée, et index des préfixes normalisés de prénom / nom (recherche).
+# Reconstruit à chaque sauvegarde de la whitelist.
+#
+# IndexDemandes : demandes d'accès en attente, triées par date de dépôt (digest de rappel).
+import bisect
+import threading
+from datetime import datetime, timezone
+
+from utils import stockage
+from utils.recherche import tokens
+
+class IndexWhitelist:
+    def __init__(self):
+        self.ids: set[int] = set()
+        self.par_id: dict[int, dict] = {}
+        self._prefixes: dict[str, set[int]] = {}
+        self._lock = threading.RLock()
+        self.est_charge = False
+
+    def reconstruire(self, whitelist: list):
+        with self._lock:
+            self.ids, self.par_id, self._prefixes = set(), {}, {}
+            for entry in whitelist:
+                self._indexer(entry)
+            self.est_charge = True
+
+    def _assurer_charge(self):
+        if not self.est_charge:
+            self.reconstruire(stockage.charger("whitelist"))
+
+    def _indexer(self, entry: dict):
+        user_id = int(entry["user_id"])
+        self.ids.add(user_id)
+        self.par_id[user_id] = entry
+        for token in tokens(f"{entry.get('prenom', '')} {entry.get('nom', '')}"):
+            for i in range(1, len(token) + 1):
+                self._prefixes.setdefault(token[:i], set()).add(user_id)
+
+    def ajouter(self, entry: dict):
+        with self._lock:
+            self._assurer_charge()
+            self.retirer(entry["user_id"])
+            self._indexer(entry)
+
+    def retirer(self, user_id: int) -> dict | None:
+        with self._lock:
+            self._assurer_charge()
+            entry = self.par_id.pop(int(user_id), None)
+            self.ids.discard(int(user_id))
+            if entry:
+                for token in tokens(f"{entry.get('prenom', '')} {entry.get('nom', '')}"):
+                    for i in range(1, len(token) + 1):
+                        ids = self._prefixes.get(token[:i])
+                        if ids is not None:
+                            ids.discard(int(user_id))
+                            if not ids:
+                                del self._prefixes[token[:i]]
+            return entry
+
+    def contient(self, user_id: int) -> bool:
+        with self._lock:
+            self._assurer_charge()
+            return int(user_id) in self.ids
+
+    def entree(self, user_id: int) -> dict | None:
+        with self._lock:
+            self._assurer_charge()
+            return self.par_id.get(int(user_id))
+
+    def rechercher(self, requete: str) -> list[dict]:
+        """Entrées dont chaque mot de la requête préfixe un mot du prénom ou du nom."""
+        with self._lock:
+            self._assurer_charge()
+            mots = tokens(requete)
+            if not mots:
+                return []
+            resultats = None
+            for mot in mots:
+                ids = self._prefixes.get(mot, set())
+                resultats = ids.copy() if resultats is None else resultats & ids
+                if not resultats:
+                    return []
+            entries = [self.par_id[i] for i in resultats]
+        return sorted(entries, key=lambda e: (tokens(e.get("nom", "")), tokens(e.get("prenom", ""))))
+
+index_whitelist = IndexWhitelist()
+
+def horodatage_demande(entry: dict) -> float:
+    """Timestamp de dépôt d'une demande (0 si inconnu : considérée comme la plus ancienne)."""
+    try:
+        date = datetime.fromisoformat(entry["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
+
+class IndexDemandes:
+    def __init__(self):
+        self.par_id: dict[int, dict] = {}
+        self._ordre: list[tuple[float, int]] = []
+        self._lock = threading.RLock()
+        self.est_charge = False
+
+    def reconstruire(self, demandes: list):
+        with self._lock:
+            self.par_id = {int(d["user_id"]): d for d in demandes}
+            self._ordre = sorted((horodatage_demande(d), uid) for uid, d in self.par_id.items())
+            self.est_charge = True
+
+    def _assurer_charge(self):
+        if not self.est_charge:
+            self.reconstruire(stockage.charger("demandes_whitelist"))
+
+    def ajouter(self, entry: dict):
+        with self._lock:
+            self._assurer_charge()
+            self.retirer(entry["user_id"])
+            self.par_id[int(entry["user_id"])] = entry
+            bisect.insort(self._ordre, (horodatage_demande(entry), int(entry["user_id"])))
+
+    def retirer(self, user_id: int) -> dict | None:
+        with self._lock:
+            self._assurer_charge()
+            entry = self.par_id.pop(int(user_id), None)
+            if entry is not None:
+                cle = (horodatage_demande(entry), int(user_id))
+                i = bisect.bisect_left(self._ordre, cle)
+                if i < len(self._ordre) and self._ordre[i] == cle:
+                    del self._ordre[i]
+            return entry
+
+    def en_attente(self) -> list[dict]:
+        """Demandes de la plus ancienne à la plus récente."""
+        with self._lock:
+            self._assurer_charge()
+            return [self.par_id[uid] for _, uid in self._ordre]
+
+    def __len__(self):
+        return len(self.par_id)
+
+index_demandes = IndexDemandes()
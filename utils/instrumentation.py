@@ -0,0 +1,181 @@
+# instrumentation.py
+# Latences de chaque commande slash et de chaque listener d'événement gateway.
+#
+#   - une Mesure (utils.metriques) est attachée au contexte pendant l'exécution : les
+#     tâches créées par la commande (gather…) héritent de la même mesure ;
+#   - le temps passé dans le stockage (utils.stockage) et dans les appels REST
+#     (planificateur, client HTTP, réponses d'interaction) y est cumulé ; le reste
+#     est compté en « calcul ». Avec des appels en parallèle, stockage + REST peut
+#     dépasser la durée totale : le calcul est alors ramené à 0 ;
+#   - pour les commandes : délai avant la première réponse à l'interaction (Discord
+#     exige un accusé sous 3 s, mesuré ici depuis la réception) et issue :
+#     ok, erreur, hors_delai (réponse après 3 s), sans_reponse ;
+#   - tout va dans des histogrammes à seuils fixes (utils.metriques, donc aussi dans
+#     /metrics) ; exporter() renvoie un résumé JSON, affiché par /diagnostic.
+#
+# Branchement : bot = BotInstrumente(..., tree_cls=ArbreInstrumente). S'appuie sur
+# deux points internes de discord.py 2.x : CommandTree._call et Client._run_event.
+import asyncio
+import time
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context
+
+from utils import metriques
+from utils.metriques import Mesure, chrono, mesure_courante
+
+DELAI_ACCUSE_S = 3.0
+SEUILS_REPONSE_S = (0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 5.0, 10.0, 15.0)
+
+latences = metriques.histogramme(
+    "bot_latence_secondes", "Durée des commandes et listeners, par composante", ("type", "nom", "composante")
+)
+premieres_reponses = metriques.histogramme(
+    "bot_premiere_reponse_secondes", "Délai avant la première réponse à une commande", ("nom",), SEUILS_REPONSE_S
+)
+executions = metriques.compteur("bot_executions_total", "Exécutions par issue", ("type", "nom", "issue"))
+
+def _enregistrer(type: str, nom: str, mesure: Mesure, issue: str):
+    total = time.perf_counter() - mesure.debut
+    valeurs = {
+        "total": total,
+        "stockage": mesure.temps["stockage"],
+        "rest": mesure.temps["rest"],
+        "calcul": max(0.0, total - mesure.temps["stockage"] - mesure.temps["rest"]),
+    }
+    for composante, valeur in valeurs.items():
+        latences.observer(valeur, type=type, nom=nom, composante=composante)
+    if mesure.premiere_reponse is not None:
+        premieres_reponses.observer(mesure.premiere_reponse, nom=nom)
+    executions.inc(type=type, nom=nom, issue=issue)
+
+# ========== Réponses d'interaction ==========
+class AdaptateurInstrumente(AsyncWebhookAdapter):
+    """Adaptateur des webhooks d'interaction : REST chronométré, première réponse horodatée."""
+
+    async def request(self, *args, **kwargs):
+        with chrono("rest"):
+            return await super().request(*args, **kwargs)
+
+    async def create_interaction_response(self, *args, **kwargs):
+        resultat = await super().create_interaction_response(*args, **kwargs)
+        mesure = mesure_courante.get()
+        if mesure is not None and mesure.premiere_reponse is None:
+            mesure.premiere_reponse = time.perf_counter() - mesure.debut
+        return resultat
+
+# ========== Arbre et bot ==========
+class ArbreInstrumente(app_commands.CommandTree):
+    async def _call(self, interaction: discord.Interaction):
+        mesure = Mesure()
+        jeton = mesure_courante.set(mesure)
+        try:
+            await super()._call(interaction)
+        finally:
+            mesure_courante.reset(jeton)
+            command = interaction.command
+            nom = command.qualified_name if command else interaction.data.get("name", "?")
+            if interaction.type is discord.InteractionType.autocomplete:
+                _enregistrer("autocompletion", nom, mesure, "ok")
+            else:
+                if interaction.command_failed:
+                    issue = "erreur"
+                elif mesure.premiere_reponse is None:
+                    issue = "sans_reponse"
+                elif mesure.premiere_reponse > DELAI_ACCUSE_S:
+                    issue = "hors_delai"
+                else:
+                    issue = "ok"
+                _enregistrer("commande", nom, mesure, issue)
+
+class BotInstrumente(commands.Bot):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("tree_cls", ArbreInstrumente)
+        super().__init__(*args, **kwargs)
+        requete = self.http.request
+
+        async def requete_chronometree(*args, **kwargs):
+            with chrono("rest"):
+                return await requete(*args, **kwargs)
+        self.http.request = requete_chronometree
+
+    async def setup_hook(self):
+        # Les tâches d'événements créées ensuite héritent de ce contexte
+        async_context.set(AdaptateurInstrumente())
+        await super().setup_hook()
+
+    async def _run_event(self, coro, event_name: str, *args, **kwargs):
+        mesure = Mesure()
+        jeton = mesure_courante.set(mesure)
+        issue = "ok"
+        try:
+            await coro(*args, **kwargs)
+        except asyncio.CancelledError:
+            issue = "annule"
+        except Exception:
+            issue = "erreur"
+            try:
+                await self.on_error(event_name, *args, **kwargs)
+            except asyncio.CancelledError:
+                pass
+        finally:
+            mesure_courante.reset(jeton)
+            _enregistrer("listener", f"{event_name}:{getattr(coro, '__qualname__', coro)}", mesure, issue)
+
+# ========== Export ==========
+def _resume(serie: list, seuils: tuple) -> dict:
+    effectifs, somme, nombre = serie
+    def quantile(q: float) -> float | None:
+        # Borne haute du seuil qui contient le quantile
+        rang, cumul = q * nombre, 0
+        for seuil, effectif in zip((*seuils, float("inf")), effectifs):
+            cumul += effectif
+            if cumul >= rang:
+                return None if seuil == float("inf") else round(seuil * 1000, 1)
+        return None
+    return {"n": nombre, "moyenne_ms": round(somme / nombre * 1000, 1) if nombre else 0.0,
+            "p50_ms": quantile(0.5), "p95_ms": quantile(0.95), "p99_ms": quantile(0.99)}
+
+def exporter() -> dict:
+    """{type: {nom: {composante: résumé, "premiere_reponse": résumé, "issues": {...}}}}."""
+    resultat: dict[str, dict] = {}
+    for (type, nom, composante), serie in latences.series.items():
+        resultat.setdefault(type, {}).setdefault(nom, {"issues": {}})[composante] = _resume(serie, latences.seuils)
+    for (nom,), serie in premieres_reponses.series.items():
+        if nom in resultat.get("commande", {}):
+            resultat["commande"][nom]["premiere_reponse"] = _resume(serie, premieres_reponses.seuils)
+    for (type, nom, issue), n in executions.valeurs.items():
+        if nom in resultat.get(type, {}):
+            resultat[type][nom]["issues"][issue] = int(n)
+    return resultat
+
+def _ms(valeur) -> str:
+    return f"{valeur:g} ms" if valeur is not None else "> 10 s"
+
+def lignes_diagnostic(type: str, limite: int = 10) -> list[str]:
+    """Les `limite` entrées les plus lentes (p95 du total), une ligne chacune."""
+    entrees = exporter().get(type, {})
+    tri = sorted(entrees.items(),
+                 key=lambda kv: (kv[1]["total"]["p95_ms"] is None, kv[1]["total"]["p95_ms"] or 0, kv[1]["total"]["moyenne_ms"]),
+                 reverse=True)
+    lignes = []
+    for nom, d in tri[:limite]:
+        ligne = (f"`{nom}` ×{d['total']['n']} : p95 {_ms(d['total']['p95_ms'])}, moy. {d['total']['moyenne_ms']} ms "
+                 f"(stockage {d['stockage']['moyenne_ms']} / REST {d['rest']['moyenne_ms']} / calcul {d['calcul']['moyenne_ms']})")
+        problemes = {k: v for k, v in d["issues"].items() if k != "ok"}
+        if problemes:
+            ligne += " — " + ", ".join(f"{k} {v}" for k, v in problemes.items())
+        lignes.append(ligne)
+    return lignes
+
+def accuses_manques() -> tuple[int, int]:
+    """(commandes répondues après 3 s ou jamais, commandes au total)."""
+    manques = total = 0
+    for (type, _, issue), n in executions.valeurs.items():
+        if type == "commande":
+            total += n
+            if issue in ("hors_delai", "sans_reponse"):
+                manques += n
+    return int(manques), int(total)
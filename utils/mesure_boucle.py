@@ -0,0 +1,86 @@
+# mesure_boucle.py
+# Sonde de latence de la boucle d'événements : une tâche se réveille toutes les
+# `intervalle` secondes et mesure son retard. Tout appel bloquant (lecture JSON
+# synchrone, écriture de fichier…) apparaît directement comme du retard.
+#
+# En continu (serveur de santé), `fenetre` borne l'historique aux derniers échantillons.
+#
+# Comparaison stockage synchrone / asynchrone :  python -m utils.mesure_boucle
+# Borne vérifiée en test sous interactions concurrentes : tests/test_mesure_boucle.py
+import asyncio
+import time
+from collections import deque
+
+class SondeBoucle:
+    def __init__(self, intervalle: float = 0.005, fenetre: int = None):
+        self.intervalle = intervalle
+        self.fenetre = fenetre
+        self.retards: deque[float] = deque(maxlen=fenetre)
+        self._tache = None
+
+    async def _mesurer(self):
+        while True:
+            debut = time.perf_counter()
+            await asyncio.sleep(self.intervalle)
+            self.retards.append(max(0.0, time.perf_counter() - debut - self.intervalle))
+
+    def demarrer(self):
+        self.retards = deque(maxlen=self.fenetre)
+        self._tache = asyncio.create_task(self._mesurer())
+
+    async def arreter(self) -> dict:
+        self._tache.cancel()
+        try:
+            await self._tache
+        except asyncio.CancelledError:
+            pass
+        return self.resume()
+
+    def resume(self) -> dict:
+        if not self.retards:
+            return {"max_ms": 0.0, "total_ms": 0.0, "echantillons": 0}
+        return {
+            "max_ms": round(max(self.retards) * 1000, 2),
+            "total_ms": round(sum(self.retards) * 1000, 2),
+            "echantillons": len(self.retards),
+        }
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+
+    from utils import stockage
+
+    ENTREES = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    INTERACTIONS = 50
+
+    async def scenario(asynchrone: bool) -> dict:
+        sonde = SondeBoucle()
+        sonde.demarrer()
+        debut = time.perf_counter()
+
+        async def interaction(i: int):
+            # Une interaction simulée : lecture de la whitelist puis réponse
+            if asynchrone:
+                await stockage.charger_async("whitelist")
+            else:
+                stockage.charger("whitelist")
+            await asyncio.sleep(0)
+
+        await asyncio.gather(*(interaction(i) for i in range(INTERACTIONS)))
+        resultat = await sonde.arreter()
+        resultat["duree_ms"] = round((time.perf_counter() - debut) * 1000, 1)
+        return resultat
+
+    with tempfile.TemporaryDirectory() as dossier:
+        stockage.DATA_DIR = dossier
+        stockage.definir_stockage(stockage.StockageJSON())
+        stockage.sauvegarder("whitelist", [
+            {"user_id": 10**17 + i, "prenom": f"Prénom{i}", "nom": f"Nom{i}"} for i in range(ENTREES)
+        ])
+        print(f"whitelist : {ENTREES} entrées ({os.path.getsize(stockage.chemin_dataset('whitelist')) // 1024} Kio), "
+              f"{INTERACTIONS} interactions concurrentes")
+        for libelle, asynchrone in (("synchrone ", False), ("asynchrone", True)):
+            r = asyncio.run(scenario(asynchrone))
+            print(f"{libelle} : retard max {r['max_ms']} ms, retard cumulé {r['total_ms']} ms, durée {r['duree_ms']} ms")
@@ -0,0 +1,146 @@
+# metriques.py
+# Métriques en mémoire, exposées au format texte Prometheus (GET /metrics, voir
+# utils/sante.py). Trois sortes :
+#   - Compteur : total qui ne fait que monter (commandes exécutées, erreurs…) ;
+#   - Histogramme : seuils fixes, pour les durées (stockage…) ;
+#   - Jauge : valeur lue au moment de l'export via une fonction (files d'attente,
+#     latence gateway…), rien à tenir à jour.
+# Les métriques sont créées une fois au niveau module : compteur("nom", "aide", ("label",)).
+#
+# En fin de fichier : la Mesure de l'exécution en cours (commande, listener), où le
+# stockage et le REST cumulent leur temps via `with chrono("stockage"):`.
+import bisect
+import contextlib
+import contextvars
+import math
+import time
+
+# Secondes : de 1 ms à 10 s
+SEUILS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metriques: dict[str, object] = {}
+
+def _echapper(valeur) -> str:
+    return str(valeur).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _etiquettes(noms: tuple, valeurs: tuple, extra: str = "") -> str:
+    paires = [f'{n}="{_echapper(v)}"' for n, v in zip(noms, valeurs)]
+    if extra:
+        paires.append(extra)
+    return "{" + ",".join(paires) + "}" if paires else ""
+
+def _nombre(valeur: float) -> str:
+    if math.isinf(valeur):
+        return "+Inf" if valeur > 0 else "-Inf"
+    return repr(float(valeur)) if not float(valeur).is_integer() else str(int(valeur))
+
+class Compteur:
+    type = "counter"
+
+    def __init__(self, nom: str, aide: str, etiquettes: tuple = ()):
+        self.nom, self.aide, self.etiquettes = nom, aide, etiquettes
+        self.valeurs: dict[tuple, float] = {}
+
+    def inc(self, valeur: float = 1, **etiquettes):
+        cle = tuple(etiquettes[n] for n in self.etiquettes)
+        self.valeurs[cle] = self.valeurs.get(cle, 0) + valeur
+
+    def lignes(self) -> list[str]:
+        return [f"{self.nom}{_etiquettes(self.etiquettes, cle)} {_nombre(v)}" for cle, v in self.valeurs.items()]
+
+class Histogramme:
+    type = "histogram"
+
+    def __init__(self, nom: str, aide: str, etiquettes: tuple = (), seuils: tuple = SEUILS_S):
+        self.nom, self.aide, self.etiquettes, self.seuils = nom, aide, etiquettes, seuils
+        # cle → [effectifs par seuil (+ dépassement), somme, nombre]
+        self.series: dict[tuple, list] = {}
+
+    def observer(self, valeur: float, **etiquettes):
+        cle = tuple(etiquettes[n] for n in self.etiquettes)
+        serie = self.series.get(cle)
+        if serie is None:
+            serie = self.series[cle] = [[0] * (len(self.seuils) + 1), 0.0, 0]
+        serie[0][bisect.bisect_left(self.seuils, valeur)] += 1
+        serie[1] += valeur
+        serie[2] += 1
+
+    def lignes(self) -> list[str]:
+        lignes = []
+        for cle, (effectifs, somme, nombre) in self.series.items():
+            cumul = 0
+            for seuil, effectif in zip((*self.seuils, math.inf), effectifs):
+                cumul += effectif
+                le = 'le="' + _nombre(seuil) + '"'
+                lignes.append(f"{self.nom}_bucket{_etiquettes(self.etiquettes, cle, le)} {cumul}")
+            lignes.append(f"{self.nom}_sum{_etiquettes(self.etiquettes, cle)} {_nombre(round(somme, 6))}")
+            lignes.append(f"{self.nom}_count{_etiquettes(self.etiquettes, cle)} {nombre}")
+        return lignes
+
+class Jauge:
+    type = "gauge"
+
+    def __init__(self, nom: str, aide: str, lecture, etiquettes: tuple = ()):
+        """`lecture()` renvoie un nombre, ou {tuple d'étiquettes: nombre} si `etiquettes`."""
+        self.nom, self.aide, self.lecture, self.etiquettes = nom, aide, lecture, etiquettes
+
+    def lignes(self) -> list[str]:
+        # Une lecture en échec ne doit pas casser tout l'export
+        try:
+            valeur = self.lecture()
+            if not self.etiquettes:
+                return [f"{self.nom} {_nombre(valeur)}"]
+            return [f"{self.nom}{_etiquettes(self.etiquettes, cle)} {_nombre(v)}" for cle, v in valeur.items()]
+        except Exception:
+            return []
+
+def _enregistrer(metrique):
+    # Idempotent : un module rechargé retrouve sa métrique
+    return _metriques.setdefault(metrique.nom, metrique)
+
+def compteur(nom: str, aide: str, etiquettes: tuple = ()) -> Compteur:
+    return _enregistrer(Compteur(nom, aide, etiquettes))
+
+def histogramme(nom: str, aide: str, etiquettes: tuple = (), seuils: tuple = SEUILS_S) -> Histogramme:
+    return _enregistrer(Histogramme(nom, aide, etiquettes, seuils))
+
+def jauge(nom: str, aide: str, lecture, etiquettes: tuple = ()) -> Jauge:
+    return _enregistrer(Jauge(nom, aide, lecture, etiquettes))
+
+def exposer() -> str:
+    """Toutes les métriques au format texte Prometheus 0.0.4."""
+    lignes = []
+    for m in _metriques.values():
+        lignes.append(f"# HELP {m.nom} {m.aide}")
+        lignes.append(f"# TYPE {m.nom} {m.type}")
+        lignes.extend(m.lignes())
+    return "\n".join(lignes) + "\n"
+
+# ========== Temps par composante de l'exécution en cours ==========
+class Mesure:
+    __slots__ = ("debut", "temps", "premiere_reponse")
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.temps = {"stockage": 0.0, "rest": 0.0}
+        self.premiere_reponse = None
+
+mesure_courante: contextvars.ContextVar[Mesure | None] = contextvars.ContextVar("mesure_courante", default=None)
+# Composantes déjà chronométrées plus haut dans la pile (planificateur → client HTTP)
+_en_cours: contextvars.ContextVar[frozenset] = contextvars.ContextVar("composantes_en_cours", default=frozenset())
+
+@contextlib.contextmanager
+def chrono(composante: str):
+    """Ajoute la durée du bloc à la mesure courante (sans double compte si imbriqué)."""
+    mesure = mesure_courante.get()
+    en_cours = _en_cours.get()
+    if mesure is None or composante in en_cours:
+        yield
+        return
+    jeton = _en_cours.set(en_cours | {composante})
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        mesure.temps[composante] += time.perf_counter() - debut
+        _en_cours.reset(jeton)
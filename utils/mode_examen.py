@@ -0,0 +1,137 @@
+# mode_examen.py
+# Mode examen : masque à @everyone tous les salons (texte, vocaux, catégories) sauf
+# ceux à garder, puis rétablit EXACTEMENT les permissions d'origine.
+#
+# Déroulement, sûr en cas de crash à mi-parcours :
+#   1. l'overwrite @everyone d'origine de chaque salon (paire allow/deny, ou None
+#      s'il n'y en avait pas) est sauvegardé dans le dataset "mode_examen" AVANT
+#      toute modification ; un salon déjà sauvegardé ne l'est jamais une 2e fois,
+#      relancer l'activation ne peut donc pas écraser l'état d'origine ;
+#   2. les modifications sont appliquées avec une concurrence bornée ; elles sont
+#      idempotentes, une relance refait simplement le travail ;
+#   3. à la désactivation, chaque salon restauré sort de la sauvegarde ; le document
+#      n'est supprimé que lorsque tout est restauré (une relance reprend le reste).
+import asyncio
+
+import discord
+
+from utils import stockage
+from utils.planificateur_rest import MODERATION, planifier, route_salons
+from utils.progression import MessageProgression
+
+DATASET = "mode_examen"
+CONCURRENCE = 5
+
+ACTIVATION, ACTIF, RESTAURATION = "activation", "actif", "restauration"
+
+def _salons_concernes(guild: discord.Guild) -> list[discord.abc.GuildChannel]:
+    return [*guild.categories, *guild.text_channels, *guild.voice_channels]
+
+def _paire(overwrite: discord.PermissionOverwrite) -> list[int] | None:
+    if overwrite.is_empty():
+        return None
+    allow, deny = overwrite.pair()
+    return [allow.value, deny.value]
+
+def _depuis_paire(paire: list[int] | None) -> discord.PermissionOverwrite | None:
+    if paire is None:
+        return None
+    return discord.PermissionOverwrite.from_pair(discord.Permissions(paire[0]), discord.Permissions(paire[1]))
+
+async def etat(guild_id: int) -> dict | None:
+    return await stockage.lire_entree_async(DATASET, guild_id)
+
+async def _executer(salons: list, action, progression: MessageProgression, libelle: str) -> tuple[list, list]:
+    """Applique `action` à chaque salon (concurrence bornée, via le planificateur REST). Renvoie (réussis, échecs)."""
+    semaphore = asyncio.Semaphore(CONCURRENCE)
+    reussis, echecs = [], []
+
+    async def traiter(salon):
+        async with semaphore:
+            try:
+                await planifier(route_salons(salon.guild.id), lambda: action(salon), MODERATION)
+                reussis.append(salon)
+            except discord.NotFound:
+                # Salon supprimé entre-temps : plus rien à faire
+                reussis.append(salon)
+            except discord.DiscordException:
+                # HTTPException, ou RateLimited relevée par le planificateur après ses reprises
+                echecs.append(salon)
+        await progression.maj(f"⏳ {libelle} : {len(reussis) + len(echecs)}/{len(salons)} salons…")
+
+    await asyncio.gather(*(traiter(s) for s in salons))
+    return reussis, echecs
+
+async def activer(guild: discord.Guild, a_garder: list[str], message: discord.Message | None = None) -> dict:
+    progression = MessageProgression(message)
+    everyone = guild.default_role
+    doc = await etat(guild.id) or {"statut": ACTIVATION, "salons": {}, "a_garder": []}
+    if doc["statut"] == RESTAURATION:
+        raise RuntimeError("Une désactivation est en cours : relancez /desactiver_mode_examen d'abord.")
+
+    cibles = [
+        s for s in _salons_concernes(guild)
+        if str(s.id) not in a_garder and s.name not in a_garder
+    ]
+    # 1. Sauvegarde des overwrites d'origine (jamais écrasées)
+    for salon in cibles:
+        doc["salons"].setdefault(str(salon.id), _paire(salon.overwrites_for(everyone)))
+    doc["statut"] = ACTIVATION
+    doc["a_garder"] = sorted(set(doc["a_garder"]) | set(a_garder))
+    await stockage.ecrire_entree_async(DATASET, guild.id, doc)
+
+    # 2. Application : on part de l'overwrite actuel pour ne toucher qu'à view_channel
+    async def masquer(salon):
+        overwrite = salon.overwrites_for(everyone)
+        if overwrite.view_channel is False:
+            return
+        overwrite.view_channel = False
+        await salon.set_permissions(everyone, overwrite=overwrite, reason="Mode examen")
+
+    reussis, echecs = await _executer(cibles, masquer, progression, "Activation du mode examen")
+    if not echecs:
+        doc["statut"] = ACTIF
+        await stockage.ecrire_entree_async(DATASET, guild.id, doc)
+    resultat = {"salons": len(cibles), "reussis": len(reussis), "echecs": len(echecs)}
+    await progression.maj(texte_resultat("activation", resultat), forcer=True)
+    return resultat
+
+async def desactiver(guild: discord.Guild, message: discord.Message | None = None) -> dict | None:
+    """Restaure les overwrites sauvegardés. Renvoie None si le mode examen n'est pas actif."""
+    progression = MessageProgression(message)
+    everyone = guild.default_role
+    doc = await etat(guild.id)
+    if doc is None:
+        return None
+    doc["statut"] = RESTAURATION
+    await stockage.ecrire_entree_async(DATASET, guild.id, doc)
+
+    a_restaurer, disparus = [], []
+    for salon_id in doc["salons"]:
+        salon = guild.get_channel(int(salon_id))
+        (a_restaurer if salon else disparus).append(salon or salon_id)
+
+    async def restaurer(salon):
+        await salon.set_permissions(everyone, overwrite=_depuis_paire(doc["salons"][str(salon.id)]), reason="Fin du mode examen")
+
+    reussis, echecs = await _executer(a_restaurer, restaurer, progression, "Restauration des salons")
+    for salon_id in disparus:
+        del doc["salons"][salon_id]
+    for salon in reussis:
+        del doc["salons"][str(salon.id)]
+    if doc["salons"]:
+        await stockage.ecrire_entree_async(DATASET, guild.id, doc)
+    else:
+        await stockage.supprimer_entree_async(DATASET, guild.id)
+    resultat = {"salons": len(a_restaurer), "reussis": len(reussis), "echecs": len(echecs)}
+    await progression.maj(texte_resultat("restauration", resultat), forcer=True)
+    return resultat
+
+def texte_resultat(sens: str, resultat: dict) -> str:
+    if resultat["echecs"]:
+        commande = "/activer_mode_examen" if sens == "activation" else "/desactiver_mode_examen"
+        return (f"⚠️ {sens.capitalize()} partielle : {resultat['reussis']}/{resultat['salons']} salons, "
+                f"{resultat['echecs']} échec(s). Relancez {commande} pour terminer.")
+    if sens == "activation":
+        return f"✅ Mode examen activé ({resultat['salons']} salons masqués)."
+    return f"✅ Mode examen désactivé ({resultat['salons']} salons restaurés à l'identique)."
@@ -0,0 +1,172 @@
+# planificateur_rest.py
+# Planificateur des appels REST Discord hors réponses d'interaction.
+#
+#   - trois classes de priorité : INTERACTIF (action faite pour un utilisateur qui
+#     attend), MODERATION (commandes admin, travaux en masse), ARRIERE_PLAN (boucles,
+#     rappels, logs). Quand un créneau se libère, il va à la classe la plus prioritaire ;
+#     l'arrière-plan ne peut jamais occuper tous les créneaux ;
+#   - une limite de concurrence par route (ex: "roles:<guild>", "salons:<guild>") pour
+#     ne pas saturer un même bucket de rate limit ; l'admission sur une route suit
+#     elle aussi les priorités (une édition interactive passe devant les appels d'un
+#     /purger_role déjà en file sur la même route) ;
+#   - les 429 courts sont attendus et retentés par discord.py lui-même ; seuls ceux
+#     dont l'attente dépasse max_ratelimit_timeout (30 s, voir main.py) arrivent ici en
+#     discord.RateLimited : la route est alors mise en pause pendant le retry_after
+#     et l'appel est retenté ;
+#   - compteurs : en file, en vol, exécutés, limités (429), échecs.
+#
+# Usage :  await planifier("roles:123", lambda: membre.add_roles(role), MODERATION)
+# La fabrique est rappelée à chaque tentative (une coroutine ne peut être attendue qu'une fois).
+import asyncio
+import time
+from collections import deque
+
+import discord
+
+from utils.metriques import chrono
+
+INTERACTIF, MODERATION, ARRIERE_PLAN = 0, 1, 2
+NOMS_PRIORITES = {INTERACTIF: "interactif", MODERATION: "moderation", ARRIERE_PLAN: "arriere_plan"}
+
+CONCURRENCE_GLOBALE = 8
+CONCURRENCE_PAR_ROUTE = 3
+TENTATIVES_429 = 3
+
+def route_roles(guild_id: int) -> str:
+    return f"roles:{guild_id}"
+
+def route_salons(guild_id: int) -> str:
+    return f"salons:{guild_id}"
+
+def route_messages(channel_id: int) -> str:
+    return f"messages:{channel_id}"
+
+def _retry_after(erreur: Exception) -> float:
+    if isinstance(erreur, discord.RateLimited):
+        return erreur.retry_after
+    reponse = getattr(erreur, "response", None)
+    try:
+        return float(reponse.headers.get("Retry-After", 1.0))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
+
+def _est_429(erreur: Exception) -> bool:
+    return isinstance(erreur, discord.RateLimited) or (
+        isinstance(erreur, discord.HTTPException) and erreur.status == 429
+    )
+
+class Creneaux:
+    """N créneaux attribués par priorité ; `plafonds` borne le nombre occupé par classe."""
+
+    def __init__(self, capacite: int, plafonds: dict[int, int] | None = None):
+        self.capacite = capacite
+        self.plafonds = plafonds or {p: capacite for p in NOMS_PRIORITES}
+        self.files = {p: deque() for p in NOMS_PRIORITES}
+        self.en_vol = {p: 0 for p in NOMS_PRIORITES}
+
+    def _peut_entrer(self, priorite: int) -> bool:
+        return sum(self.en_vol.values()) < self.capacite and self.en_vol[priorite] < self.plafonds[priorite]
+
+    def inactif(self) -> bool:
+        return not any(self.en_vol.values()) and not any(self.files.values())
+
+    async def acquerir(self, priorite: int):
+        if self._peut_entrer(priorite) and not any(self.files[p] for p in NOMS_PRIORITES if p <= priorite):
+            self.en_vol[priorite] += 1
+            return
+        futur = asyncio.get_running_loop().create_future()
+        self.files[priorite].append(futur)
+        try:
+            await futur
+        except asyncio.CancelledError:
+            if futur.done() and not futur.cancelled():
+                # Créneau attribué juste avant l'annulation : on le rend
+                self.liberer(priorite)
+            elif futur in self.files[priorite]:
+                self.files[priorite].remove(futur)
+            raise
+
+    def liberer(self, priorite: int):
+        self.en_vol[priorite] -= 1
+        for p in sorted(NOMS_PRIORITES):
+            file = self.files[p]
+            while file and self._peut_entrer(p):
+                futur = file.popleft()
+                if not futur.done():
+                    self.en_vol[p] += 1
+                    futur.set_result(None)
+                    return
+
+class PlanificateurREST:
+    def __init__(self, concurrence: int = CONCURRENCE_GLOBALE, par_route: int = CONCURRENCE_PAR_ROUTE):
+        self.par_route = par_route
+        # Plafond de créneaux occupables par classe : l'arrière-plan en laisse toujours de libres
+        self.globaux = Creneaux(concurrence, {
+            INTERACTIF: concurrence, MODERATION: max(concurrence - 1, 1), ARRIERE_PLAN: max(concurrence // 2, 1)
+        })
+        self._routes: dict[str, Creneaux] = {}
+        self._pauses: dict[str, float] = {}
+        self.compteurs = {
+            nom: {"executes": 0, "limites": 0, "echecs": 0} for nom in NOMS_PRIORITES.values()
+        }
+
+    def _route(self, route: str) -> Creneaux:
+        creneaux = self._routes.get(route)
+        if creneaux is None:
+            creneaux = self._routes[route] = Creneaux(self.par_route)
+        return creneaux
+
+    def _liberer_route(self, route: str, priorite: int):
+        creneaux = self._routes[route]
+        creneaux.liberer(priorite)
+        # Une route par salon / guilde : on ne garde pas celles qui ne servent plus
+        if creneaux.inactif():
+            del self._routes[route]
+
+    def _purger_pauses(self):
+        # Une entrée par salon / guilde limité : celles dont l'échéance est passée partent
+        maintenant = time.monotonic()
+        for route in [r for r, fin in self._pauses.items() if fin <= maintenant]:
+            del self._pauses[route]
+
+    async def executer(self, route: str, fabrique, priorite: int = ARRIERE_PLAN):
+        compteurs = self.compteurs[NOMS_PRIORITES[priorite]]
+        for tentative in range(TENTATIVES_429):
+            await self._route(route).acquerir(priorite)
+            try:
+                pause = self._pauses.get(route, 0) - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                if route in self._pauses and self._pauses[route] <= time.monotonic():
+                    del self._pauses[route]
+                await self.globaux.acquerir(priorite)
+                try:
+                    resultat = await fabrique()
+                    compteurs["executes"] += 1
+                    return resultat
+                except Exception as e:
+                    if not _est_429(e) or tentative == TENTATIVES_429 - 1:
+                        compteurs["echecs"] += 1
+                        raise
+                    compteurs["limites"] += 1
+                    self._purger_pauses()
+                    self._pauses[route] = time.monotonic() + _retry_after(e)
+                finally:
+                    self.globaux.liberer(priorite)
+            finally:
+                self._liberer_route(route, priorite)
+
+    def statistiques(self) -> dict:
+        return {
+            "en_file": {NOMS_PRIORITES[p]: len(f) for p, f in self.globaux.files.items()},
+            "en_vol": {NOMS_PRIORITES[p]: n for p, n in self.globaux.en_vol.items()},
+            "routes_en_pause": sum(1 for fin in self._pauses.values() if fin > time.monotonic()),
+            "par_classe": {nom: dict(c) for nom, c in self.compteurs.items()},
+        }
+
+planificateur = PlanificateurREST()
+
+async def planifier(route: str, fabrique, priorite: int = ARRIERE_PLAN):
+    # Attente d'un créneau comprise : c'est du temps REST pour la commande qui attend
+    with chrono("rest"):
+        return await planificateur.executer(route, fabrique, priorite)
@@ -0,0 +1,28 @@
+# progression.py
+# Affichage de la progression d'une opération longue en éditant un message de suivi
+# (followup d'interaction) : au plus une édition toutes les `intervalle` secondes,
+# et plus aucune une fois le jeton d'interaction expiré (15 min).
+import asyncio
+import time
+
+import discord
+
+class MessageProgression:
+    def __init__(self, message: discord.Message | None, intervalle: float = 2.0):
+        self.message = message
+        self.intervalle = intervalle
+        self._derniere = 0.0
+        self._lock = asyncio.Lock()
+
+    async def maj(self, texte: str, forcer: bool = False):
+        if self.message is None:
+            return
+        if not forcer and (time.monotonic() - self._derniere < self.intervalle or self._lock.locked()):
+            return
+        async with self._lock:
+            self._derniere = time.monotonic()
+            try:
+                await self.message.edit(content=texte)
+            except discord.HTTPException:
+                # L'opération continue sans affichage
+                self.message = None
@@ -0,0 +1,125 @@
+# provisionnement.py
+# Création d'espaces privés (catégorie + salons + messages d'accueil) à partir de
+# modèles déclaratifs :
+#   1. la catégorie est créée avec ses overwrites ;
+#   2. les salons enfants sont créés en parallèle (ils héritent des overwrites) ;
+#   3. les messages initiaux partent en parallèle d'un salon à l'autre, dans l'ordre
+#      au sein d'un même salon.
+# En cas d'échec, tout ce qui a déjà été créé est supprimé avant de relancer l'erreur.
+# Les appels REST passent par le planificateur (classe INTERACTIF par défaut : un
+# utilisateur attend l'espace).
+import asyncio
+import time
+
+import discord
+
+from utils.planificateur_rest import INTERACTIF, planifier, route_messages, route_salons
+
+TEXTE, VOCAL = "texte", "vocal"
+
+class MessageInitial:
+    """`vue` peut être une View ou une fabrique `vue(espace) -> View` (l'espace n'existe qu'après création)."""
+    __slots__ = ("salon", "contenu", "embed", "vue")
+
+    def __init__(self, salon: str, contenu: str = None, embed: discord.Embed = None, vue=None):
+        self.salon = salon
+        self.contenu = contenu
+        self.embed = embed
+        self.vue = vue
+
+class SalonModele:
+    __slots__ = ("nom", "type", "overwrites")
+
+    def __init__(self, nom: str, type: str = TEXTE, overwrites: dict = None):
+        if type not in (TEXTE, VOCAL):
+            raise ValueError(f"Type de salon inconnu : {type}")
+        self.nom = nom
+        self.type = type
+        self.overwrites = overwrites
+
+class ModeleEspace:
+    __slots__ = ("categorie", "overwrites", "salons", "messages")
+
+    def __init__(self, categorie: str, overwrites: dict, salons: list[SalonModele], messages: list[MessageInitial] = None):
+        self.categorie = categorie
+        self.overwrites = overwrites
+        self.salons = salons
+        self.messages = messages or []
+
+class EspaceProvisionne:
+    def __init__(self, categorie: discord.CategoryChannel):
+        self.categorie = categorie
+        self.salons: dict[str, discord.abc.GuildChannel] = {}
+        self.messages: list[discord.Message] = []
+        self.durees_ms: dict[str, float] = {}
+
+    def __getitem__(self, nom: str) -> discord.abc.GuildChannel:
+        return self.salons[nom]
+
+def overwrites_prives(guild: discord.Guild, *cibles) -> dict:
+    """Overwrites d'un espace privé : masqué à @everyone, lecture/écriture pour chaque cible (None ignoré)."""
+    overwrites = {guild.default_role: discord.PermissionOverwrite(read_messages=False)}
+    for cible in cibles:
+        if cible is not None:
+            overwrites[cible] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+    return overwrites
+
+async def _creer_salon(guild: discord.Guild, categorie: discord.CategoryChannel, salon: SalonModele, priorite: int):
+    kwargs = {"category": categorie}
+    if salon.overwrites is not None:
+        kwargs["overwrites"] = salon.overwrites
+    creer = guild.create_voice_channel if salon.type == VOCAL else guild.create_text_channel
+    return await planifier(route_salons(guild.id), lambda: creer(salon.nom, **kwargs), priorite)
+
+async def _envoyer(espace: EspaceProvisionne, messages: list[MessageInitial], priorite: int):
+    for m in messages:
+        vue = m.vue(espace) if callable(m.vue) else m.vue
+        kwargs = {"content": m.contenu, "embed": m.embed}
+        if vue is not None:
+            kwargs["view"] = vue
+        salon = espace[m.salon]
+        espace.messages.append(await planifier(route_messages(salon.id), lambda: salon.send(**kwargs), priorite))
+
+async def supprimer_espace(espace: EspaceProvisionne, priorite: int = INTERACTIF):
+    """Suppression au mieux (rollback) : salons en parallèle, puis la catégorie."""
+    route = route_salons(espace.categorie.guild.id)
+    await asyncio.gather(*(planifier(route, s.delete, priorite) for s in espace.salons.values()), return_exceptions=True)
+    try:
+        await planifier(route, espace.categorie.delete, priorite)
+    except discord.HTTPException:
+        pass
+
+async def provisionner(guild: discord.Guild, modele: ModeleEspace, raison: str = None, priorite: int = INTERACTIF) -> EspaceProvisionne:
+    debut = time.perf_counter()
+    categorie = await planifier(
+        route_salons(guild.id),
+        lambda: guild.create_category(modele.categorie, overwrites=modele.overwrites, reason=raison),
+        priorite
+    )
+    espace = EspaceProvisionne(categorie)
+    espace.durees_ms["categorie"] = round((time.perf_counter() - debut) * 1000, 1)
+    try:
+        etape = time.perf_counter()
+        resultats = await asyncio.gather(
+            *(_creer_salon(guild, categorie, s, priorite) for s in modele.salons), return_exceptions=True
+        )
+        for salon, resultat in zip(modele.salons, resultats):
+            if not isinstance(resultat, BaseException):
+                espace.salons[salon.nom] = resultat
+        erreur = next((r for r in resultats if isinstance(r, BaseException)), None)
+        if erreur is not None:
+            raise erreur
+        espace.durees_ms["salons"] = round((time.perf_counter() - etape) * 1000, 1)
+
+        etape = time.perf_counter()
+        par_salon: dict[str, list[MessageInitial]] = {}
+        for m in modele.messages:
+            par_salon.setdefault(m.salon, []).append(m)
+        await asyncio.gather(*(_envoyer(espace, messages, priorite) for messages in par_salon.values()))
+        espace.durees_ms["messages"] = round((time.perf_counter() - etape) * 1000, 1)
+    except BaseException:
+        await supprimer_espace(espace, priorite)
+        raise
+    espace.durees_ms["total"] = round((time.perf_counter() - debut) * 1000, 1)
+    print(f"[PROVISIONNEMENT] {categorie.name} : {espace.durees_ms}")
+    return espace
@@ -0,0 +1,74 @@
+# recherche.py
+# Normalisation de texte pour les recherches : insensible à la casse et aux accents
+# ("Hélène" et "helene" donnent la même clé).
+import bisect
+import re
+import unicodedata
+
+_SEPARATEURS = re.compile(r"[\s\-'’_.,;:/()]+")
+
+def normaliser(texte: str) -> str:
+    decompose = unicodedata.normalize("NFKD", str(texte).casefold())
+    return "".join(c for c in decompose if not unicodedata.combining(c)).strip()
+
+def tokens(texte: str) -> list[str]:
+    return [t for t in _SEPARATEURS.split(normaliser(texte)) if t]
+
+class IndexTextes:
+    """
+    Index de recherche sur une liste de textes (autocomplétion).
+    Classement : préfixe du texte entier, puis préfixe d'un mot, puis sous-chaîne.
+    Les deux premiers rangs sont servis par bisection sur des listes triées.
+    """
+    def __init__(self, textes: list[str]):
+        self.textes = list(textes)
+        self._normes = [normaliser(t) for t in self.textes]
+        self._entiers = sorted((n, i) for i, n in enumerate(self._normes))
+        self._mots = sorted({(mot, i) for i, t in enumerate(self.textes) for mot in tokens(t)})
+
+    @staticmethod
+    def _prefixes(triee: list, prefixe: str):
+        debut = bisect.bisect_left(triee, (prefixe,))
+        for cle, i in triee[debut:]:
+            if not cle.startswith(prefixe):
+                break
+            yield i
+
+    def rechercher(self, requete: str, limite: int = 25) -> list[str]:
+        q = normaliser(requete)
+        if not q:
+            return self.textes[:limite]
+        vus, resultats = set(), []
+        def ajouter(indices):
+            for i in indices:
+                if i not in vus:
+                    vus.add(i)
+                    resultats.append(i)
+                    if len(resultats) >= limite:
+                        return True
+            return False
+        if ajouter(self._prefixes(self._entiers, q)):
+            return [self.textes[i] for i in resultats]
+        # On garde l'ordre d'origine à rang égal
+        if ajouter(sorted(set(self._prefixes(self._mots, q)) - vus)):
+            return [self.textes[i] for i in resultats]
+        ajouter(i for i, n in enumerate(self._normes) if q in n)
+        return [self.textes[i] for i in resultats]
+
+if __name__ == "__main__":
+    # Mesure rapide : python -m utils.recherche
+    import random
+    import string
+    import time
+    mots = ["".join(random.choices(string.ascii_lowercase + "éèàç", k=random.randint(3, 10))) for _ in range(500)]
+    textes = [" ".join(random.choices(mots, k=random.randint(3, 12))) for _ in range(5000)]
+    debut = time.perf_counter()
+    index = IndexTextes(textes)
+    construction = time.perf_counter() - debut
+    requetes = [random.choice(mots)[:random.randint(1, 4)] for _ in range(1000)]
+    debut = time.perf_counter()
+    for r in requetes:
+        index.rechercher(r)
+    par_requete = (time.perf_counter() - debut) / len(requetes)
+    print(f"{len(textes)} textes : construction {construction * 1000:.1f} ms, "
+          f"recherche {par_requete * 1000:.3f} ms/requête")
@@ -0,0 +1,212 @@
+# registre_vues.py
+# Vues persistantes (boutons qui doivent survivre à un redémarrage).
+#
+#   - une SEULE instance par type de vue est enregistrée avec bot.add_view, sans
+#     message_id : Discord renvoie le custom_id du bouton, qui suffit à la retrouver ;
+#   - les paramètres propres à chaque message (ids de catégorie, de rôle, d'auteur…)
+#     sont dans le dataset "vues_persistantes" (clé = id du message), chargé une fois
+#     en mémoire : rien n'est refetché au démarrage ;
+#   - les messages sont envoyés avec un gabarit() déjà arrêté : discord.py ne le garde
+#     pas en mémoire, seul le singleton enregistré répond aux clics ;
+#   - le registre est borné : une entrée disparaît quand son espace est fermé
+#     (oublier_categorie), quand sa catégorie n'existe plus (balayer) ou quand elle
+#     est trop ancienne / au-delà de ENTREES_MAX.
+#
+# Une vue persistante : constructeur sans argument, custom_id fixe sur chaque bouton,
+# décorée avec @vue_persistante("nom") ; ses callbacks lisent leurs paramètres avec
+# `await registre.params_interaction(interaction)`.
+import asyncio
+import time
+
+import discord
+
+from utils import stockage
+
+DATASET = "vues_persistantes"
+ENTREES_MAX = 20000
+AGE_MAX_S = 90 * 24 * 3600
+
+_types: dict[str, type] = {}
+
+def vue_persistante(nom: str):
+    def decorateur(cls):
+        cls.type_vue = nom
+        _types[nom] = cls
+        return cls
+    return decorateur
+
+class RegistreVues:
+    def __init__(self):
+        self._entrees: dict[int, dict] = {}
+        self._par_categorie: dict[int, set[int]] = {}
+        self._instances: dict[str, discord.ui.View] = {}
+        self._charge = False
+        self._verrou = asyncio.Lock()
+
+    # ----- Vues -----
+    def installer(self, bot: discord.Client, *classes):
+        """Enregistre le singleton de chaque classe (idempotent)."""
+        for cls in classes:
+            if cls.type_vue not in self._instances:
+                self._instances[cls.type_vue] = cls()
+                bot.add_view(self._instances[cls.type_vue])
+
+    @staticmethod
+    def gabarit(cls, desactiver: bool = False) -> discord.ui.View:
+        """Vue à joindre à un message : arrêtée, discord.py ne la conserve pas."""
+        vue = cls()
+        if desactiver:
+            for item in vue.children:
+                item.disabled = True
+        vue.stop()
+        return vue
+
+    # ----- Entrées -----
+    async def charger(self):
+        async with self._verrou:
+            if self._charge:
+                return
+            donnees = await stockage.charger_async(DATASET)
+            for cle, entree in sorted(donnees.items(), key=lambda kv: kv[1].get("cree_a", 0)):
+                self._indexer(int(cle), entree)
+            self._charge = True
+
+    def _indexer(self, message_id: int, entree: dict):
+        self._entrees[message_id] = entree
+        if entree.get("category_id"):
+            self._par_categorie.setdefault(entree["category_id"], set()).add(message_id)
+
+    def _desindexer(self, message_id: int) -> dict | None:
+        entree = self._entrees.pop(message_id, None)
+        if entree is not None and entree.get("category_id"):
+            ids = self._par_categorie.get(entree["category_id"])
+            if ids is not None:
+                ids.discard(message_id)
+                if not ids:
+                    del self._par_categorie[entree["category_id"]]
+        return entree
+
+    async def enregistrer(self, message: discord.Message, cls, params: dict, category_id: int = None):
+        await self.charger()
+        entree = {
+            "type": cls.type_vue,
+            "params": params,
+            "guild_id": message.guild.id if message.guild else None,
+            "category_id": category_id,
+            "cree_a": int(time.time()),
+        }
+        self._desindexer(message.id)
+        self._indexer(message.id, entree)
+        await stockage.ecrire_entree_async(DATASET, message.id, entree)
+        # Plus ancienne d'abord (ordre d'insertion)
+        while len(self._entrees) > ENTREES_MAX:
+            await self.oublier(next(iter(self._entrees)))
+
+    async def params(self, message_id: int, cls=None) -> dict | None:
+        await self.charger()
+        entree = self._entrees.get(message_id)
+        if entree is None or (cls is not None and entree["type"] != cls.type_vue):
+            return None
+        return entree["params"]
+
+    async def params_interaction(self, interaction: discord.Interaction, cls=None) -> dict | None:
+        """Paramètres du message cliqué ; répond à l'utilisateur s'ils n'existent plus."""
+        params = await self.params(interaction.message.id, cls) if interaction.message else None
+        if params is None and not interaction.response.is_done():
+            await interaction.response.send_message("⚠️ Cette action n'est plus disponible.", ephemeral=True)
+        return params
+
+    async def oublier(self, message_id: int):
+        if self._desindexer(message_id) is not None:
+            await stockage.supprimer_entree_async(DATASET, message_id)
+
+    async def oublier_categorie(self, category_id: int):
+        await self.charger()
+        for message_id in list(self._par_categorie.get(category_id, ())):
+            await self.oublier(message_id)
+
+    async def balayer(self, bot: discord.Client) -> int:
+        """Retire les entrées dont la catégorie a disparu ou trop anciennes. Renvoie le nombre retiré."""
+        await self.charger()
+        limite = time.time() - AGE_MAX_S
+        a_retirer = []
+        for message_id, entree in self._entrees.items():
+            guild = bot.get_guild(entree["guild_id"]) if entree.get("guild_id") else None
+            if entree.get("category_id"):
+                # Guilde absente du cache : on ne conclut rien
+                if guild is not None and guild.get_channel(entree["category_id"]) is None:
+                    a_retirer.append(message_id)
+            elif entree.get("cree_a", 0) < limite:
+                a_retirer.append(message_id)
+        for message_id in a_retirer:
+            await self.oublier(message_id)
+        return len(a_retirer)
+
+    def __len__(self) -> int:
+        return len(self._entrees)
+
+registre = RegistreVues()
+
+
+if __name__ == "__main__":
+    # Banc d'essai du démarrage : N messages à boutons vivants, restaurés
+    #   - à l'ancienne : une View par message + bot.add_view(view, message_id=…) ;
+    #   - avec le registre : chargement du dataset + un singleton par type.
+    #   python -m utils.registre_vues [N]
+    import sys
+    import tempfile
+    import tracemalloc
+
+    N = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    @vue_persistante("banc")
+    class VueBanc(discord.ui.View):
+        def __init__(self, category_id: int = 0, role_id: int = 0):
+            super().__init__(timeout=None)
+            self.category_id = category_id
+            self.role_id = role_id
+
+        @discord.ui.button(label="Rejoindre", custom_id="banc_rejoindre")
+        async def rejoindre(self, interaction, button):
+            pass
+
+        @discord.ui.button(label="Fermer", custom_id="banc_fermer")
+        async def fermer(self, interaction, button):
+            pass
+
+    def nouveau_bot():
+        return discord.Client(intents=discord.Intents.none())
+
+    async def ancien():
+        bot = nouveau_bot()
+        for i in range(N):
+            bot.add_view(VueBanc(10**17 + i, 10**17 + i), message_id=10**18 + i)
+
+    async def registre_seul():
+        bot = nouveau_bot()
+        r = RegistreVues()
+        await r.charger()
+        r.installer(bot, VueBanc)
+        assert len(r) == N
+
+    def mesurer(scenario) -> tuple[float, float]:
+        tracemalloc.start()
+        debut = time.perf_counter()
+        asyncio.run(scenario())
+        duree = (time.perf_counter() - debut) * 1000
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return round(duree, 1), round(pic / 2**20, 1)
+
+    with tempfile.TemporaryDirectory() as dossier:
+        stockage.DATA_DIR = dossier
+        stockage.definir_stockage(stockage.StockageJSON())
+        stockage.sauvegarder(DATASET, {
+            str(10**18 + i): {"type": "banc", "params": {"category_id": 10**17 + i, "role_id": 10**17 + i},
+                              "guild_id": 1, "category_id": 10**17 + i, "cree_a": 1_700_000_000 + i}
+            for i in range(N)
+        })
+        print(f"{N} messages à boutons vivants")
+        for libelle, scenario in (("une View par message", ancien), ("registre            ", registre_seul)):
+            duree, pic = mesurer(scenario)
+            print(f"{libelle} : {duree} ms, pic mémoire {pic} Mio")
@@ -0,0 +1,180 @@
+# roles_en_masse.py
+# Travaux d'ajout / retrait d'un rôle sur beaucoup de membres :
+#   - l'état (membres restants, compteurs, statut) est persisté dans le dataset
+#     "travaux_roles", un travail interrompu (redémarrage, annulation) peut être repris ;
+#   - les appels REST tournent avec une concurrence bornée et passent par le
+#     planificateur REST (classe MODERATION, route des rôles de la guilde) ;
+#   - la progression est affichée en éditant un message (MessageProgression) ;
+#   - les travaux terminés ou annulés sont purgés après RETENTION_S (au démarrage et à
+#     la fin de chaque travail).
+import asyncio
+import time
+import uuid
+from collections import deque
+
+import discord
+
+from utils import stockage
+from utils.planificateur_rest import MODERATION, planifier, route_roles
+from utils.progression import MessageProgression
+
+DATASET = "travaux_roles"
+CONCURRENCE = 4
+INTERVALLE_PROGRESSION_S = 2.0
+INTERVALLE_SAUVEGARDE_S = 5.0
+RETENTION_S = 7 * 24 * 3600
+
+ACTIONS = {
+    "retirer": "Retrait",
+    "ajouter": "Ajout",
+}
+
+EN_COURS, TERMINE, ANNULE, INTERROMPU = "en_cours", "termine", "annule", "interrompu"
+
+# Travaux en cours d'exécution dans ce processus
+_actifs: dict[str, "TravailRoles"] = {}
+
+def nouvel_etat(guild_id: int, role_id: int, action: str, membres: list[int], auteur_id: int) -> dict:
+    if action not in ACTIONS:
+        raise ValueError(f"Action inconnue : {action}")
+    return {
+        "id": uuid.uuid4().hex[:8],
+        "guild_id": guild_id,
+        "role_id": role_id,
+        "action": action,
+        "auteur_id": auteur_id,
+        "cree_a": int(time.time()),
+        "total": len(membres),
+        "restants": list(membres),
+        "traites": 0,
+        "echecs": 0,
+        "absents": 0,
+        "statut": EN_COURS,
+    }
+
+async def charger_travaux() -> dict:
+    return await stockage.charger_async(DATASET)
+
+async def charger_travail(travail_id: str) -> dict | None:
+    return await stockage.lire_entree_async(DATASET, travail_id)
+
+async def marquer_interrompus():
+    """Au démarrage : un travail resté « en cours » a été coupé par l'arrêt du bot."""
+    travaux = await charger_travaux()
+    for etat in travaux.values():
+        if etat["statut"] == EN_COURS and etat["id"] not in _actifs:
+            etat["statut"] = INTERROMPU
+            await stockage.ecrire_entree_async(DATASET, etat["id"], etat)
+    await purger_anciens()
+
+async def purger_anciens(maintenant: float = None) -> int:
+    """Supprime les travaux terminés ou annulés depuis plus de RETENTION_S."""
+    maintenant = time.time() if maintenant is None else maintenant
+    travaux = await charger_travaux()
+    anciens = [
+        t["id"] for t in travaux.values()
+        if t["statut"] in (TERMINE, ANNULE) and t["id"] not in _actifs
+        and maintenant - t.get("fini_a", t["cree_a"]) > RETENTION_S
+    ]
+    for travail_id in anciens:
+        await stockage.supprimer_entree_async(DATASET, travail_id)
+    return len(anciens)
+
+def texte_progression(etat: dict, role: discord.Role | None = None) -> str:
+    role_txt = role.mention if role else f"<@&{etat['role_id']}>"
+    fait = etat["traites"] + etat["echecs"] + etat["absents"]
+    icones = {EN_COURS: "⏳", TERMINE: "✅", ANNULE: "🛑", INTERROMPU: "⏸️"}
+    lignes = [
+        f"{icones[etat['statut']]} {ACTIONS[etat['action']]} du rôle {role_txt} — travail `{etat['id']}`",
+        f"Progression : **{fait}/{etat['total']}** (réussis : {etat['traites']}, échecs : {etat['echecs']}, partis : {etat['absents']})",
+    ]
+    if etat["statut"] in (ANNULE, INTERROMPU) and etat["restants"]:
+        lignes.append(f"Reprendre avec `/reprendre_travail_roles {etat['id']}`.")
+    return "\n".join(lignes)
+
+class TravailRoles:
+    def __init__(self, guild: discord.Guild, etat: dict, message: discord.Message | None = None):
+        self.guild = guild
+        self.etat = etat
+        self.progression = MessageProgression(message, INTERVALLE_PROGRESSION_S)
+        self._annulation = asyncio.Event()
+        self._derniere_sauvegarde = 0.0
+        self._file = deque(etat["restants"])
+        self._en_vol: set[int] = set()
+        self.tache = None
+
+    @property
+    def id(self) -> str:
+        return self.etat["id"]
+
+    def annuler(self):
+        self._annulation.set()
+
+    async def _sauvegarder(self):
+        self._derniere_sauvegarde = time.monotonic()
+        self.etat["restants"] = list(self._en_vol) + list(self._file)
+        await stockage.ecrire_entree_async(DATASET, self.id, self.etat)
+
+    async def _afficher(self, forcer: bool = False):
+        texte = texte_progression(self.etat, self.guild.get_role(self.etat["role_id"]))
+        await self.progression.maj(texte, forcer)
+
+    async def _traiter(self, role: discord.Role, user_id: int):
+        membre = self.guild.get_member(user_id)
+        if membre is None:
+            self.etat["absents"] += 1
+            return
+        try:
+            raison = f"Travail de rôles {self.id}"
+            if self.etat["action"] == "retirer":
+                if role in membre.roles:
+                    await planifier(route_roles(self.guild.id), lambda: membre.remove_roles(role, reason=raison), MODERATION)
+            elif role not in membre.roles:
+                await planifier(route_roles(self.guild.id), lambda: membre.add_roles(role, reason=raison), MODERATION)
+            self.etat["traites"] += 1
+        except discord.NotFound:
+            self.etat["absents"] += 1
+        except discord.DiscordException:
+            # HTTPException, mais aussi RateLimited relevée par le planificateur après ses reprises
+            self.etat["echecs"] += 1
+
+    async def _ouvrier(self, role: discord.Role):
+        while self._file and not self._annulation.is_set():
+            user_id = self._file.popleft()
+            self._en_vol.add(user_id)
+            await self._traiter(role, user_id)
+            self._en_vol.discard(user_id)
+            if time.monotonic() - self._derniere_sauvegarde >= INTERVALLE_SAUVEGARDE_S:
+                await self._sauvegarder()
+            await self._afficher()
+
+    async def executer(self) -> dict:
+        role = self.guild.get_role(self.etat["role_id"])
+        self.etat["statut"] = EN_COURS
+        try:
+            if role is None:
+                self._annulation.set()
+            await self._sauvegarder()
+            await self._afficher(forcer=True)
+            await asyncio.gather(*(self._ouvrier(role) for _ in range(min(CONCURRENCE, len(self._file)) or 1)))
+            self.etat["statut"] = ANNULE if self._annulation.is_set() and self._file else TERMINE
+            self.etat["fini_a"] = int(time.time())
+        except asyncio.CancelledError:
+            self.etat["statut"] = INTERROMPU
+            raise
+        finally:
+            _actifs.pop(self.id, None)
+            await self._sauvegarder()
+            await self._afficher(forcer=True)
+        await purger_anciens()
+        return self.etat
+
+def lancer(guild: discord.Guild, etat: dict, message: discord.Message | None = None) -> "TravailRoles":
+    """Démarre le travail en tâche de fond et le renvoie (pour annulation)."""
+    travail = TravailRoles(guild, etat, message)
+    _actifs[travail.id] = travail
+    travail.tache = asyncio.create_task(travail.executer())
+    return travail
+
+def travail_actif(travail_id: str) -> TravailRoles | None:
+    return _actifs.get(travail_id)
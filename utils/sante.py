@@ -0,0 +1,144 @@
+# sante.py
+# Serveur HTTP de santé et de métriques, sur la boucle d'événements du bot (aiohttp,
+# fourni avec discord.py) — remplace l'ancien keep_alive.py (thread + HTTPServer
+# qui répondait « Bot actif. » même bot déconnecté ou boucle bloquée).
+#
+#   GET /         → « Bot actif. » (compatibilité avec les pings existants)
+#   GET /healthz  → vivant : boucle réactive et gateway pas perdu depuis trop longtemps
+#   GET /readyz   → prêt : bot prêt, connecté, latence gateway et retard de boucle bas
+#   GET /metrics  → format texte Prometheus (utils.metriques)
+#   GET /latences → résumé JSON des latences par commande / listener (utils.instrumentation)
+# 200 si OK, 503 sinon ; /healthz et /readyz renvoient l'état détaillé en JSON.
+#
+# Une boucle bloquée ne répond plus du tout : c'est alors le délai du health check
+# qui échoue, ce qui est le comportement voulu.
+import math
+import os
+import time
+
+import discord
+from aiohttp import web
+from discord.ext import commands
+
+from utils import instrumentation, metriques
+from utils.mesure_boucle import SondeBoucle
+from utils.planificateur_rest import planificateur
+from utils.registre_vues import registre
+from utils.taches_planifiees import taches
+
+PORT = int(os.getenv("PORT", 10000))
+RETARD_MAX_VIVANT_S = 5.0
+RETARD_MAX_PRET_S = 1.0
+LATENCE_MAX_S = 10.0
+DECONNEXION_MAX_S = 300
+
+commandes_terminees = metriques.compteur("bot_commandes_total", "Commandes slash terminées", ("commande",))
+
+class ServeurSante:
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        # Un échantillon par demi-seconde, une minute d'historique
+        self.sonde = SondeBoucle(intervalle=0.5, fenetre=120)
+        self.deconnecte_depuis = time.monotonic()
+        self._runner = None
+
+    # ----- Suivi de la connexion gateway -----
+    async def _connecte(self, *args):
+        self.deconnecte_depuis = None
+
+    async def _deconnecte(self):
+        if self.deconnecte_depuis is None:
+            self.deconnecte_depuis = time.monotonic()
+
+    async def _commande_terminee(self, interaction: discord.Interaction, commande):
+        commandes_terminees.inc(commande=commande.qualified_name)
+
+    # ----- État -----
+    def retard_boucle_s(self) -> float:
+        # Les 10 derniers échantillons (~5 s)
+        recents = list(self.sonde.retards)[-10:]
+        return max(recents, default=0.0)
+
+    def etat(self) -> dict:
+        latence = self.bot.latency
+        deconnexion = None if self.deconnecte_depuis is None else time.monotonic() - self.deconnecte_depuis
+        return {
+            "pret": self.bot.is_ready(),
+            "ferme": self.bot.is_closed(),
+            "connecte": deconnexion is None,
+            "deconnecte_depuis_s": None if deconnexion is None else round(deconnexion, 1),
+            "latence_ms": None if math.isinf(latence) or math.isnan(latence) else round(latence * 1000, 1),
+            "retard_boucle_ms": round(self.retard_boucle_s() * 1000, 1),
+        }
+
+    def vivant(self, etat: dict) -> bool:
+        return (not etat["ferme"] and etat["retard_boucle_ms"] < RETARD_MAX_VIVANT_S * 1000
+                and (etat["deconnecte_depuis_s"] or 0) < DECONNEXION_MAX_S)
+
+    def pret(self, etat: dict) -> bool:
+        return (etat["pret"] and not etat["ferme"] and etat["connecte"]
+                and etat["latence_ms"] is not None and etat["latence_ms"] < LATENCE_MAX_S * 1000
+                and etat["retard_boucle_ms"] < RETARD_MAX_PRET_S * 1000)
+
+    # ----- Routes -----
+    async def _racine(self, request):
+        return web.Response(text="Bot actif.")
+
+    async def _healthz(self, request):
+        etat = self.etat()
+        return web.json_response(etat, status=200 if self.vivant(etat) else 503)
+
+    async def _readyz(self, request):
+        etat = self.etat()
+        return web.json_response(etat, status=200 if self.pret(etat) else 503)
+
+    async def _metrics(self, request):
+        return web.Response(text=metriques.exposer(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def _latences(self, request):
+        return web.json_response(instrumentation.exporter())
+
+    # ----- Cycle de vie -----
+    def _declarer_jauges(self):
+        bot, stats = self.bot, planificateur.statistiques
+        metriques.jauge("bot_pret", "1 si le bot est prêt", lambda: int(bot.is_ready()))
+        metriques.jauge("bot_latence_gateway_secondes", "Latence du heartbeat gateway",
+                        lambda: bot.latency if math.isfinite(bot.latency) else -1)
+        metriques.jauge("bot_retard_boucle_secondes", "Retard max récent de la boucle d'événements", self.retard_boucle_s)
+        metriques.jauge("bot_guildes", "Guildes en cache", lambda: len(bot.guilds))
+        metriques.jauge("bot_rest_en_file", "Appels REST en attente d'un créneau",
+                        lambda: {(p,): n for p, n in stats()["en_file"].items()}, etiquettes=("priorite",))
+        metriques.jauge("bot_rest_en_vol", "Appels REST en cours",
+                        lambda: {(p,): n for p, n in stats()["en_vol"].items()}, etiquettes=("priorite",))
+        metriques.jauge("bot_rest_appels", "Appels REST par issue (cumul)",
+                        lambda: {(p, issue): n for p, c in stats()["par_classe"].items() for issue, n in c.items()},
+                        etiquettes=("priorite", "issue"))
+        metriques.jauge("bot_rest_routes_en_pause", "Routes REST en pause après un 429", lambda: stats()["routes_en_pause"])
+        metriques.jauge("bot_taches_planifiees_en_attente", "Tâches différées en attente", lambda: len(taches.en_attente()))
+        metriques.jauge("bot_vues_persistantes", "Messages à boutons suivis", lambda: len(registre))
+
+    async def demarrer(self, port: int = PORT):
+        self.sonde.demarrer()
+        self.bot.add_listener(self._connecte, "on_connect")
+        self.bot.add_listener(self._connecte, "on_resumed")
+        self.bot.add_listener(self._deconnecte, "on_disconnect")
+        self.bot.add_listener(self._commande_terminee, "on_app_command_completion")
+        self._declarer_jauges()
+
+        app = web.Application()
+        app.router.add_get("/", self._racine)
+        app.router.add_get("/healthz", self._healthz)
+        app.router.add_get("/readyz", self._readyz)
+        app.router.add_get("/metrics", self._metrics)
+        app.router.add_get("/latences", self._latences)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "0.0.0.0", port).start()
+        print(f"✅ Serveur de santé lancé sur le port {port} (/healthz, /readyz, /metrics)")
+
+    async def arreter(self):
+        await self.sonde.arreter()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,180 @@
+# sorties.py
+# État des sorties proposées avec /proposer_sortie.
+#
+#   - les participants de chaque sortie sont un ensemble stocké (dataset "sorties",
+#     clé = id de la catégorie) et mis en cache mémoire ; les clics simultanés sont
+#     sérialisés par un verrou par sortie, overwrite compris : le compteur ne peut plus
+#     dériver et les accès suivent l'ordre des clics ;
+#   - une sortie créée avant ce dataset est reconstruite au premier clic depuis ses
+#     overwrites (auteur sur la catégorie, participants sur les salons) ;
+#   - l'accès est donné par UN overwrite sur la catégorie ; les salons enfants sont
+#     ensuite resynchronisés sur la catégorie (une seule synchro en attente par sortie) ;
+#   - le nom « <base> - <nombre> » n'est plus la source du compteur : le renommage est
+#     regroupé (au plus un en attente par sortie, qui prend le nombre courant au moment
+#     de s'exécuter) et respecte la limite Discord de 2 renommages / 10 minutes.
+import asyncio
+import time
+
+import discord
+
+from utils import stockage
+from utils.planificateur_rest import ARRIERE_PLAN, INTERACTIF, planifier, route_salons
+
+DATASET = "sorties"
+DELAI_SYNCHRO_S = 2.0
+RENOMMAGES_MAX = 2
+FENETRE_RENOMMAGE_S = 600
+_ACCES = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+
+_cache: dict[int, dict] = {}
+_verrous: dict[int, asyncio.Lock] = {}
+
+def _verrou(category_id: int) -> asyncio.Lock:
+    verrou = _verrous.get(category_id)
+    if verrou is None:
+        verrou = _verrous[category_id] = asyncio.Lock()
+    return verrou
+
+def nombre_participants(doc: dict) -> int:
+    # L'auteur compte pour 1 (inconnu pour une sortie reconstruite ambiguë)
+    return (doc["auteur_id"] is not None) + len(doc["participants"])
+
+async def charger(category_id: int) -> dict | None:
+    doc = _cache.get(category_id)
+    if doc is None:
+        doc = await stockage.lire_entree_async(DATASET, category_id)
+        if doc is not None:
+            _cache[category_id] = doc
+    return doc
+
+async def creer(category: discord.CategoryChannel, base_nom: str, auteur_id: int) -> dict:
+    doc = {
+        "category_id": category.id,
+        "guild_id": category.guild.id,
+        "base_nom": base_nom,
+        "auteur_id": auteur_id,
+        "participants": [],
+        "nombre_affiche": 1,
+        "renommages": [],
+        "cree_a": int(time.time()),
+    }
+    _cache[category.id] = doc
+    await stockage.ecrire_entree_async(DATASET, category.id, doc)
+    return doc
+
+async def _reconstruire(category: discord.CategoryChannel) -> dict:
+    """Document d'une sortie antérieure, relu depuis ses overwrites (appelé sous le verrou)."""
+    moi = category.guild.me
+    sur_categorie = [c for c in category.overwrites if isinstance(c, discord.Member) and c != moi]
+    auteur_id = sur_categorie[0].id if len(sur_categorie) == 1 else None
+    participants = []
+    for salon in category.channels:
+        for cible, overwrite in salon.overwrites.items():
+            if (isinstance(cible, discord.Member) and cible != moi and overwrite.read_messages
+                    and cible.id != auteur_id and cible.id not in participants):
+                participants.append(cible.id)
+    base, _, nombre = category.name.rpartition(" - ")
+    doc = await creer(category, base if base and nombre.isdigit() else category.name, auteur_id)
+    doc["participants"] = participants
+    doc["nombre_affiche"] = int(nombre) if nombre.isdigit() else 1
+    # Accès désormais porté par la catégorie : la synchro des salons effacera les anciens
+    route = route_salons(category.guild.id)
+    for user_id in participants:
+        await planifier(route, lambda u=user_id: category.set_permissions(discord.Object(u), overwrite=_ACCES), INTERACTIF)
+    await stockage.ecrire_entree_async(DATASET, category.id, doc)
+    return doc
+
+async def supprimer(category_id: int):
+    _cache.pop(category_id, None)
+    _verrous.pop(category_id, None)
+    for taches in (_synchros, _renommages):
+        tache = taches.pop(category_id, None)
+        if tache is not None:
+            tache.cancel()
+    await stockage.supprimer_entree_async(DATASET, category_id)
+
+# ========== Participation ==========
+async def _charger_ou_reconstruire(category: discord.CategoryChannel) -> dict:
+    return await charger(category.id) or await _reconstruire(category)
+
+# L'overwrite est posé sous le verrou, avant l'enregistrement : deux clics rapprochés
+# (rejoindre puis quitter) s'appliquent dans l'ordre, et un échec n'enregistre rien.
+async def rejoindre(category: discord.CategoryChannel, membre: discord.Member) -> bool:
+    """Ajoute un participant. False s'il participait déjà (ou est l'auteur)."""
+    async with _verrou(category.id):
+        doc = await _charger_ou_reconstruire(category)
+        if membre.id == doc["auteur_id"] or membre.id in doc["participants"]:
+            return False
+        await planifier(route_salons(category.guild.id), lambda: category.set_permissions(membre, overwrite=_ACCES), INTERACTIF)
+        doc["participants"].append(membre.id)
+        await stockage.ecrire_entree_async(DATASET, category.id, doc)
+    _planifier_maj(category)
+    return True
+
+async def quitter(category: discord.CategoryChannel, membre: discord.Member) -> bool:
+    """Retire un participant. False s'il ne participait pas."""
+    async with _verrou(category.id):
+        doc = await _charger_ou_reconstruire(category)
+        if membre.id not in doc["participants"]:
+            return False
+        await planifier(route_salons(category.guild.id), lambda: category.set_permissions(membre, overwrite=None), INTERACTIF)
+        doc["participants"].remove(membre.id)
+        await stockage.ecrire_entree_async(DATASET, category.id, doc)
+    _planifier_maj(category)
+    return True
+
+# ========== Synchro des enfants & renommage regroupés ==========
+_synchros: dict[int, asyncio.Task] = {}
+_renommages: dict[int, asyncio.Task] = {}
+
+def _planifier_maj(category: discord.CategoryChannel):
+    if category.id not in _synchros:
+        _synchros[category.id] = asyncio.create_task(_synchroniser(category))
+    if category.id not in _renommages:
+        _renommages[category.id] = asyncio.create_task(_renommer(category))
+
+async def _synchroniser(category: discord.CategoryChannel):
+    try:
+        await asyncio.sleep(DELAI_SYNCHRO_S)
+    finally:
+        # Les clics suivants programmeront une nouvelle synchro
+        _synchros.pop(category.id, None)
+    route = route_salons(category.guild.id)
+    await asyncio.gather(
+        *(planifier(route, lambda c=c: c.edit(sync_permissions=True), INTERACTIF) for c in category.channels),
+        return_exceptions=True
+    )
+
+def _attente_renommage(doc: dict, maintenant: float) -> float:
+    recents = [t for t in doc["renommages"] if maintenant - t < FENETRE_RENOMMAGE_S]
+    doc["renommages"] = recents
+    if len(recents) < RENOMMAGES_MAX:
+        return DELAI_SYNCHRO_S
+    return max(DELAI_SYNCHRO_S, recents[0] + FENETRE_RENOMMAGE_S - maintenant)
+
+async def _renommer(category: discord.CategoryChannel):
+    # Tant que cette tâche existe, aucun autre renommage n'est programmé pour la sortie ;
+    # elle boucle jusqu'à ce que le nom affiché corresponde au nombre courant.
+    try:
+        while True:
+            doc = await charger(category.id)
+            if doc is None:
+                return
+            await asyncio.sleep(_attente_renommage(doc, time.time()))
+            doc = await charger(category.id)
+            if doc is None or doc.get("nombre_affiche", 1) == nombre_participants(doc):
+                return
+            nombre = nombre_participants(doc)
+            await planifier(
+                route_salons(category.guild.id),
+                lambda: category.edit(name=f"{doc['base_nom']} - {nombre}"),
+                ARRIERE_PLAN
+            )
+            async with _verrou(category.id):
+                doc["nombre_affiche"] = nombre
+                doc["renommages"].append(time.time())
+                await stockage.ecrire_entree_async(DATASET, category.id, doc)
+    except discord.NotFound:
+        return
+    finally:
+        _renommages.pop(category.id, None)
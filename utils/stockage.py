@@ -0,0 +1,393 @@
+# stockage.py
+# Couche de stockage commune à tous les cogs : chaque jeu de données (« dataset »)
+# est chargé / sauvegardé par nom, quel que soit le moteur choisi (JSON, SQLite ou MongoDB).
+# Le moteur se choisit avec la variable d'environnement STOCKAGE_BACKEND.
+#
+# Les cogs utilisent l'API asynchrone (charger_async, sauvegarder_async…) : lectures
+# via aiofiles, (dé)sérialisation et écritures hors de la boucle d'événements, et un
+# verrou asyncio par dataset pour sérialiser les écritures. Les documents lus sont
+# gardés en mémoire tant que la signature du moteur ne change pas : le préchargement
+# du démarrage (utils.demarrage) les y met, les lectures suivantes évitent disque et parsing.
+import asyncio
+import functools
+import json
+import os
+import pickle
+import threading
+import time
+
+import aiofiles
+
+from utils.metriques import chrono, histogramme
+
+DATA_DIR = "/data"
+
+# nom → fichier JSON historique, type du document, champ servant de clé pour les listes
+DATASETS = {
+    "config":             {"fichier": "config.json",               "type": dict, "cle": None},
+    "reaction_roles":     {"fichier": "reaction_roles.json",       "type": dict, "cle": None},
+    "salons_autorises":   {"fichier": "salons_autorises.json",     "type": dict, "cle": None},
+    "permissions":        {"fichier": "permissions.json",          "type": dict, "cle": None},
+    "whitelist":          {"fichier": "whitelist.json",            "type": list, "cle": "user_id"},
+    "demandes_whitelist": {"fichier": "demandes_whitelist.json",   "type": list, "cle": "user_id"},
+    "checkin_humeurs":    {"fichier": "checkin_humeurs.json",      "type": dict, "cle": None},
+    "ressources":         {"fichier": "ressources.json",           "type": list, "cle": None},
+    "missions":           {"fichier": "missions_du_jour.json",     "type": list, "cle": None},
+    "conseils":           {"fichier": "conseils_methodo.json",     "type": list, "cle": None},
+    "travaux_roles":      {"fichier": "travaux_roles.json",        "type": dict, "cle": None},
+    "mode_examen":        {"fichier": "mode_examen.json",          "type": dict, "cle": None},
+    "demantelements_en_echec": {"fichier": "demantelements_en_echec.json", "type": dict, "cle": None},
+    "taches_planifiees":  {"fichier": "taches_planifiees.json",    "type": dict, "cle": None},
+    "sorties":            {"fichier": "sorties.json",              "type": dict, "cle": None},
+    "vues_persistantes":  {"fichier": "vues_persistantes.json",    "type": dict, "cle": None},
+    "synchro_commandes":  {"fichier": "synchro_commandes.json",    "type": dict, "cle": None},
+}
+
+# Journaux en ajout seul (une ligne compacte par événement)
+JOURNAUX = {
+    "checkin": {"fichier": "checkin_humeurs.jsonl"},
+}
+
+def chemin_dataset(nom: str) -> str:
+    return os.path.join(DATA_DIR, DATASETS[nom]["fichier"])
+
+def chemin_journal(nom: str) -> str:
+    return os.path.join(DATA_DIR, JOURNAUX[nom]["fichier"])
+
+def dataset_pour_chemin(path: str) -> str:
+    """Retrouve le dataset correspondant à un ancien chemin de fichier JSON (ex: MISSIONS_PATH)."""
+    fichier = os.path.basename(path)
+    for nom, info in DATASETS.items():
+        if info["fichier"] == fichier:
+            return nom
+    raise KeyError(f"Aucun dataset pour le fichier {path}")
+
+def document_vide(nom: str):
+    return DATASETS[nom]["type"]()
+
+def cle_entree(nom: str, entree) -> str:
+    """Clé d'une entrée de liste (ex: user_id pour la whitelist)."""
+    champ = DATASETS[nom]["cle"]
+    if champ is None:
+        raise ValueError(f"Le dataset {nom} n'a pas d'accès par clé")
+    return str(entree[champ])
+
+# Séparateur des clés de lignes en double (voir lignes_document)
+SEPARATEUR_DOUBLON = "\x1f"
+
+def lignes_document(nom: str, data) -> dict:
+    """
+    Document → {clé de ligne: (position, entrée)}, pour les moteurs à une ligne par entrée.
+    Deux entrées d'une liste qui partagent la même clé (ex: deux demandes du même
+    user_id) sont toutes deux conservées, comme en JSON : la première garde la clé,
+    les suivantes reçoivent « clé␟n ».
+    Limite : les listes sans champ clé (missions, conseils, ressources) sont indexées
+    par leur rang, donc supprimer un élément réécrit toutes les lignes qui le suivent.
+    """
+    if DATASETS[nom]["type"] is dict:
+        return {str(k): (i, v) for i, (k, v) in enumerate(data.items())}
+    if DATASETS[nom]["cle"] is None:
+        return {str(i): (i, e) for i, e in enumerate(data)}
+    lignes, vus = {}, {}
+    for i, e in enumerate(data):
+        cle = cle_entree(nom, e)
+        n = vus[cle] = vus.get(cle, -1) + 1
+        lignes[cle if n == 0 else f"{cle}{SEPARATEUR_DOUBLON}{n}"] = (i, e)
+    return lignes
+
+def _est_indexe(nom: str) -> bool:
+    return DATASETS[nom]["type"] is dict or DATASETS[nom]["cle"] is not None
+
+# ========== Verrous par fichier & écriture atomique ==========
+# Chaque fichier a son verrou (les helpers peuvent tourner dans un executor) et
+# est écrit dans un fichier temporaire puis renommé : un crash pendant json.dump
+# laisse l'ancienne version intacte au lieu d'un fichier tronqué.
+_verrous_fichiers: dict[str, threading.RLock] = {}
+_verrous_fichiers_lock = threading.Lock()
+
+def verrou_fichier(path: str) -> threading.RLock:
+    with _verrous_fichiers_lock:
+        return _verrous_fichiers.setdefault(os.path.abspath(path), threading.RLock())
+
+def verrou_dataset(nom: str) -> threading.RLock:
+    return verrou_fichier(chemin_dataset(nom))
+
+def verrou_journal(nom: str) -> threading.RLock:
+    return verrou_fichier(chemin_journal(nom))
+
+def ecrire_json_atomique(path: str, data, **dump_kwargs):
+    dump_kwargs.setdefault("indent", 4)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with verrou_fichier(path):
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, **dump_kwargs)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+# ========== Moteur JSON (un fichier par dataset) ==========
+class StockageJSON:
+    nom = "json"
+
+    def charger(self, nom: str):
+        path = chemin_dataset(nom)
+        if not os.path.exists(path):
+            return document_vide(nom)
+        with verrou_fichier(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+    def sauvegarder(self, nom: str, data):
+        ecrire_json_atomique(chemin_dataset(nom), data, ensure_ascii=False)
+
+    def signature(self, nom: str):
+        try:
+            st = os.stat(chemin_dataset(nom))
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    # Accès par entrée : sur fichier JSON, c'est forcément un cycle lecture / réécriture
+    def lire_entree(self, nom: str, cle: str):
+        data = self.charger(nom)
+        if DATASETS[nom]["type"] is dict:
+            return data.get(str(cle))
+        return next((e for e in data if cle_entree(nom, e) == str(cle)), None)
+
+    def ecrire_entree(self, nom: str, cle: str, valeur):
+        with verrou_dataset(nom):
+            data = self.charger(nom)
+            if DATASETS[nom]["type"] is dict:
+                data[str(cle)] = valeur
+            else:
+                for i, e in enumerate(data):
+                    if cle_entree(nom, e) == str(cle):
+                        data[i] = valeur
+                        break
+                else:
+                    data.append(valeur)
+            self.sauvegarder(nom, data)
+
+    def supprimer_entree(self, nom: str, cle: str) -> bool:
+        with verrou_dataset(nom):
+            data = self.charger(nom)
+            if DATASETS[nom]["type"] is dict:
+                if str(cle) not in data:
+                    return False
+                del data[str(cle)]
+            else:
+                restant = [e for e in data if cle_entree(nom, e) != str(cle)]
+                if len(restant) == len(data):
+                    return False
+                data = restant
+            self.sauvegarder(nom, data)
+            return True
+
+    # Journal : un enregistrement JSON par ligne, ouvert en mode ajout
+    def ajouter_au_journal(self, nom: str, enregistrement):
+        path = chemin_journal(nom)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        ligne = json.dumps(enregistrement, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with verrou_fichier(path):
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(ligne)
+
+    def lire_journal(self, nom: str) -> list:
+        path = chemin_journal(nom)
+        if not os.path.exists(path):
+            return []
+        enregistrements = []
+        with verrou_fichier(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for ligne in f:
+                    try:
+                        enregistrements.append(json.loads(ligne))
+                    except ValueError:
+                        # Dernière ligne tronquée par un crash pendant l'écriture
+                        continue
+        return enregistrements
+
+    def remplacer_journal(self, nom: str, enregistrements: list):
+        path = chemin_journal(nom)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with verrou_fichier(path):
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    for e in enregistrements:
+                        f.write(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+# ========== Sélection du moteur ==========
+_stockage = None
+_stockage_lock = threading.Lock()
+
+def _creer_stockage(backend: str):
+    if backend == "json":
+        return StockageJSON()
+    if backend == "sqlite":
+        from utils.stockage_sqlite import StockageSQLite
+        return StockageSQLite()
+    if backend == "mongo":
+        from utils.stockage_mongo import StockageMongo
+        return StockageMongo()
+    raise ValueError(f"STOCKAGE_BACKEND inconnu : {backend}")
+
+def get_stockage():
+    global _stockage
+    if _stockage is None:
+        with _stockage_lock:
+            if _stockage is None:
+                _stockage = _creer_stockage(os.getenv("STOCKAGE_BACKEND", "json").strip().lower())
+    return _stockage
+
+def definir_stockage(stockage):
+    """Remplace le moteur courant (migration, scripts)."""
+    global _stockage
+    with _stockage_lock:
+        _stockage = stockage
+
+# ========== API utilisée par les cogs ==========
+def charger(nom: str):
+    return get_stockage().charger(nom)
+
+def sauvegarder(nom: str, data):
+    with verrou_dataset(nom):
+        get_stockage().sauvegarder(nom, data)
+
+def signature(nom: str):
+    return get_stockage().signature(nom)
+
+def lire_entree(nom: str, cle):
+    if not _est_indexe(nom):
+        raise ValueError(f"Le dataset {nom} n'a pas d'accès par clé")
+    return get_stockage().lire_entree(nom, str(cle))
+
+def ecrire_entree(nom: str, cle, valeur):
+    if not _est_indexe(nom):
+        raise ValueError(f"Le dataset {nom} n'a pas d'accès par clé")
+    get_stockage().ecrire_entree(nom, str(cle), valeur)
+
+def supprimer_entree(nom: str, cle) -> bool:
+    if not _est_indexe(nom):
+        raise ValueError(f"Le dataset {nom} n'a pas d'accès par clé")
+    return get_stockage().supprimer_entree(nom, str(cle))
+
+def ajouter_au_journal(nom: str, enregistrement):
+    # Même verrou que la compaction : un ajout ne peut pas tomber entre sa relecture
+    # du journal et remplacer_journal
+    with verrou_journal(nom):
+        get_stockage().ajouter_au_journal(nom, enregistrement)
+
+def lire_journal(nom: str) -> list:
+    return get_stockage().lire_journal(nom)
+
+def remplacer_journal(nom: str, enregistrements: list):
+    with verrou_journal(nom):
+        get_stockage().remplacer_journal(nom, enregistrements)
+
+# ========== API asynchrone (cogs) ==========
+_durees = histogramme("bot_stockage_duree_secondes", "Durée des opérations de stockage asynchrones", ("operation", "dataset"))
+
+def _chronometre(operation: str):
+    def decorateur(fonction):
+        @functools.wraps(fonction)
+        async def enveloppe(nom: str, *args):
+            debut = time.perf_counter()
+            try:
+                with chrono("stockage"):
+                    return await fonction(nom, *args)
+            finally:
+                _durees.observer(time.perf_counter() - debut, operation=operation, dataset=nom)
+        return enveloppe
+    return decorateur
+
+_verrous_async: dict[str, asyncio.Lock] = {}
+
+def verrou_async(nom: str) -> asyncio.Lock:
+    verrou = _verrous_async.get(nom)
+    if verrou is None:
+        verrou = _verrous_async[nom] = asyncio.Lock()
+    return verrou
+
+# nom → (moteur, signature, document sérialisé) : chaque appelant en reçoit sa propre
+# copie (pickle.loads, bien plus rapide que copy.deepcopy ou que relire le JSON)
+_documents: dict[str, tuple] = {}
+# nom → (moteur, signature, lecture en cours)
+_lectures: dict[str, tuple] = {}
+
+async def _lire_document(backend, nom: str):
+    if isinstance(backend, StockageJSON):
+        path = chemin_dataset(nom)
+        if not os.path.exists(path):
+            return document_vide(nom)
+        async with aiofiles.open(path, "r", encoding="utf-8") as f:
+            texte = await f.read()
+        return await asyncio.to_thread(json.loads, texte)
+    return await asyncio.to_thread(backend.charger, nom)
+
+async def _lire_serialise(backend, nom: str) -> bytes:
+    data = await _lire_document(backend, nom)
+    return await asyncio.to_thread(pickle.dumps, data, pickle.HIGHEST_PROTOCOL)
+
+@_chronometre("charger")
+async def charger_async(nom: str):
+    backend = get_stockage()
+    # Signature relevée AVANT la lecture : une écriture concurrente ne peut que la rendre
+    # périmée (relecture au prochain appel), jamais faire garder un document trop ancien
+    sig = await asyncio.to_thread(backend.signature, nom)
+    en_cache = _documents.get(nom)
+    if en_cache is None or en_cache[0] is not backend or en_cache[1] != sig:
+        # Lectures simultanées d'une même version : un seul parsing, partagé (les parsings
+        # concurrents se disputent le GIL avec la boucle)
+        en_cours = _lectures.get(nom)
+        if en_cours is None or en_cours[0] is not backend or en_cours[1] != sig:
+            en_cours = _lectures[nom] = (backend, sig, asyncio.ensure_future(_lire_serialise(backend, nom)))
+        try:
+            en_cache = (backend, sig, await asyncio.shield(en_cours[2]))
+        finally:
+            if _lectures.get(nom) is en_cours and en_cours[2].done():
+                del _lectures[nom]
+        _documents[nom] = en_cache
+    return await asyncio.to_thread(_copier, en_cache[2])
+
+# Une copie à la fois : pickle.loads garde le GIL de bout en bout, et plusieurs threads
+# qui s'en passent le relais affameraient la boucle d'événements
+_verrou_copie = threading.Lock()
+
+def _copier(octets: bytes):
+    with _verrou_copie:
+        return pickle.loads(octets)
+
+@_chronometre("sauvegarder")
+async def sauvegarder_async(nom: str, data):
+    async with verrou_async(nom):
+        await asyncio.to_thread(sauvegarder, nom, data)
+
+@_chronometre("lire_entree")
+async def lire_entree_async(nom: str, cle):
+    return await asyncio.to_thread(lire_entree, nom, cle)
+
+@_chronometre("ecrire_entree")
+async def ecrire_entree_async(nom: str, cle, valeur):
+    async with verrou_async(nom):
+        await asyncio.to_thread(ecrire_entree, nom, cle, valeur)
+
+@_chronometre("supprimer_entree")
+async def supprimer_entree_async(nom: str, cle) -> bool:
+    async with verrou_async(nom):
+        return await asyncio.to_thread(supprimer_entree, nom, cle)
+
+@_chronometre("journal")
+async def ajouter_au_journal_async(nom: str, enregistrement):
+    await asyncio.to_thread(ajouter_au_journal, nom, enregistrement)
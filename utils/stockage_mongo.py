@@ -0,0 +1,206 @@
+# stockage_mongo.py
+# Moteur MongoDB : une collection par dataset, un document par entrée
+#   {_id: clé, position: rang dans le document, valeur: entrée, [user_id | message_id]}
+# Les sauvegardes complètes ne touchent que les entrées modifiées, en un seul bulk_write.
+# Le document "versions" de chaque dataset porte aussi le compteur de positions : une
+# nouvelle entrée prend sa position par un $inc atomique, même à plusieurs processus.
+# Le client (pool de connexions) est partagé par tout le processus : plusieurs
+# instances du bot peuvent ainsi travailler sur la même base.
+#
+# Configuration : MONGO_URI (défaut mongodb://localhost:27017), MONGO_DB (défaut botdiscord),
+#                 MONGO_POOL_MAX (défaut 20)
+# Migration des fichiers JSON existants :  python -m utils.stockage_mongo [--ecraser]
+import os
+import sys
+import threading
+import uuid
+
+from pymongo import ASCENDING, DeleteMany, MongoClient, ReplaceOne, ReturnDocument
+
+from utils.stockage import DATASETS, SEPARATEUR_DOUBLON, lignes_document
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+MONGO_DB = os.getenv("MONGO_DB", "botdiscord")
+MONGO_POOL_MAX = int(os.getenv("MONGO_POOL_MAX", "20"))
+
+# Champ indexé recopié à la racine du document, pour les requêtes directes
+CHAMPS_INDEXES = {
+    "whitelist":          "user_id",
+    "demandes_whitelist": "user_id",
+    "checkin_humeurs":    "user_id",
+    "reaction_roles":     "message_id",
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+def client_mongo() -> MongoClient:
+    """Client unique du processus (MongoClient gère lui-même le pool, thread-safe)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(MONGO_URI, maxPoolSize=MONGO_POOL_MAX, serverSelectionTimeoutMS=5000)
+    return _client
+
+def _entier_ou_brut(cle: str):
+    try:
+        return int(cle)
+    except ValueError:
+        return cle
+
+class StockageMongo:
+    nom = "mongo"
+
+    def __init__(self, client: MongoClient = None, base: str = MONGO_DB):
+        self._db = (client or client_mongo())[base]
+        self._indexes_crees = set()
+        self._lock = threading.Lock()
+        # Identifiants des ajouts renvoyés par le dernier lire_journal (voir remplacer_journal)
+        self._lus: dict[str, list] = {}
+
+    def _collection(self, nom: str):
+        collection = self._db[nom]
+        if nom not in self._indexes_crees:
+            with self._lock:
+                if nom not in self._indexes_crees:
+                    collection.create_index([("position", ASCENDING)])
+                    if nom in CHAMPS_INDEXES:
+                        collection.create_index([(CHAMPS_INDEXES[nom], ASCENDING)])
+                    # Données écrites avant le compteur de positions : il repart après la dernière
+                    dernier = collection.find_one({}, {"position": 1}, sort=[("position", -1)])
+                    if dernier is not None:
+                        self._db["versions"].update_one(
+                            {"_id": nom}, {"$max": {"positions": dernier["position"] + 1}}, upsert=True
+                        )
+                    self._indexes_crees.add(nom)
+        return collection
+
+    def _journal(self, nom: str):
+        journal = self._db[f"{nom}_journal"]
+        if journal.name not in self._indexes_crees:
+            with self._lock:
+                if journal.name not in self._indexes_crees:
+                    journal.create_index([("lot", ASCENDING), ("rang", ASCENDING)])
+                    self._indexes_crees.add(journal.name)
+        return journal
+
+    def _document(self, nom: str, cle: str, position: int, valeur) -> dict:
+        doc = {"_id": cle, "position": position, "valeur": valeur}
+        champ = CHAMPS_INDEXES.get(nom)
+        if champ is not None:
+            doc[champ] = _entier_ou_brut(cle.split(SEPARATEUR_DOUBLON)[0])
+        return doc
+
+    def _incrementer_version(self, nom: str):
+        self._db["versions"].find_one_and_update(
+            {"_id": nom}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+
+    def charger(self, nom: str):
+        docs = self._collection(nom).find({}, {"valeur": 1}).sort("position", ASCENDING)
+        if DATASETS[nom]["type"] is dict:
+            return {doc["_id"]: doc["valeur"] for doc in docs}
+        return [doc["valeur"] for doc in docs]
+
+    def sauvegarder(self, nom: str, data):
+        collection = self._collection(nom)
+        nouvelles = lignes_document(nom, data)
+        actuelles = {
+            doc["_id"]: (doc["position"], doc["valeur"])
+            for doc in collection.find({}, {"position": 1, "valeur": 1})
+        }
+        operations = [
+            ReplaceOne({"_id": cle}, self._document(nom, cle, position, valeur), upsert=True)
+            for cle, (position, valeur) in nouvelles.items()
+            if actuelles.get(cle) != (position, valeur)
+        ]
+        supprimees = list(actuelles.keys() - nouvelles.keys())
+        if supprimees:
+            operations.append(DeleteMany({"_id": {"$in": supprimees}}))
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+            self._db["versions"].update_one(
+                {"_id": nom}, {"$inc": {"version": 1}, "$max": {"positions": len(nouvelles)}}, upsert=True
+            )
+
+    def signature(self, nom: str):
+        doc = self._db["versions"].find_one({"_id": nom})
+        return doc["version"] if doc else None
+
+    def lire_entree(self, nom: str, cle: str):
+        doc = self._collection(nom).find_one({"_id": cle}, {"valeur": 1})
+        return doc["valeur"] if doc else None
+
+    def ecrire_entree(self, nom: str, cle: str, valeur):
+        collection = self._collection(nom)
+        if collection.find_one({"_id": cle}, {"_id": 1}) is None:
+            # Position tirée atomiquement ; si un autre processus insère la même clé entre-temps,
+            # $setOnInsert est ignoré et la position est simplement perdue
+            compteur = self._db["versions"].find_one_and_update(
+                {"_id": nom}, {"$inc": {"positions": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+            doc = self._document(nom, cle, compteur["positions"] - 1, valeur)
+            position = doc.pop("position")
+            del doc["_id"]
+            collection.update_one({"_id": cle}, {"$set": doc, "$setOnInsert": {"position": position}}, upsert=True)
+        else:
+            collection.update_one({"_id": cle}, {"$set": {"valeur": valeur}})
+        self._incrementer_version(nom)
+
+    def supprimer_entree(self, nom: str, cle: str) -> bool:
+        # Avec ses doublons éventuels (« clé␟n »), comme le moteur JSON
+        supprime = self._collection(nom).delete_many({"$or": [
+            {"_id": cle},
+            {"_id": {"$gt": cle + SEPARATEUR_DOUBLON, "$lt": cle + chr(ord(SEPARATEUR_DOUBLON) + 1)}},
+        ]}).deleted_count > 0
+        if supprime:
+            self._incrementer_version(nom)
+        return supprime
+
+    # Journal : une collection "<nom>_journal".
+    #   - un ajout est un document {valeur}, ordonné par _id (ObjectId croissant) ;
+    #   - une compaction écrit un lot {lot, rang, valeur}, marque les ajouts qu'elle a lus
+    #     {consomme_par: lot}, puis publie le lot en modifiant un seul document
+    #     ("journaux", {_id: nom, lot}) : c'est le point de bascule atomique.
+    # Un crash avant la bascule laisse l'ancien journal intact (le lot orphelin est ignoré
+    # puis nettoyé) ; les ajouts faits par d'autres processus après la lecture ne sont
+    # pas marqués, donc jamais perdus.
+    def _lot_courant(self, nom: str):
+        doc = self._db["journaux"].find_one({"_id": nom})
+        return doc["lot"] if doc else None
+
+    def ajouter_au_journal(self, nom: str, enregistrement):
+        self._journal(nom).insert_one({"valeur": enregistrement})
+
+    def lire_journal(self, nom: str) -> list:
+        journal, lot = self._journal(nom), self._lot_courant(nom)
+        base = []
+        ajouts = {"lot": {"$exists": False}}
+        if lot is not None:
+            base = [doc["valeur"] for doc in journal.find({"lot": lot}, {"valeur": 1}).sort("rang", ASCENDING)]
+            ajouts["consomme_par"] = {"$ne": lot}
+        docs = list(journal.find(ajouts, {"valeur": 1}).sort("_id", ASCENDING))
+        self._lus[nom] = [doc["_id"] for doc in docs]
+        return base + [doc["valeur"] for doc in docs]
+
+    def remplacer_journal(self, nom: str, enregistrements: list):
+        """Remplace ce qu'a renvoyé le dernier lire_journal ; les ajouts arrivés depuis restent à la suite."""
+        if nom not in self._lus:
+            self.lire_journal(nom)
+        journal, lus, lot = self._journal(nom), self._lus.pop(nom), uuid.uuid4().hex
+        if enregistrements:
+            journal.insert_many([{"lot": lot, "rang": i, "valeur": e} for i, e in enumerate(enregistrements)], ordered=True)
+        if lus:
+            journal.update_many({"_id": {"$in": lus}}, {"$set": {"consomme_par": lot}})
+        self._db["journaux"].update_one({"_id": nom}, {"$set": {"lot": lot}}, upsert=True)
+        journal.delete_many({"$or": [{"lot": {"$exists": True, "$ne": lot}}, {"consomme_par": lot}]})
+
+if __name__ == "__main__":
+    from utils.stockage_sqlite import migrer_depuis_json
+
+    migres = migrer_depuis_json(cible=StockageMongo(), ecraser="--ecraser" in sys.argv)
+    if not migres:
+        print("ℹ️ Rien à migrer.")
+    for nom, total in migres.items():
+        print(f"✅ {nom} : {total} entrée(s) migrée(s) vers {MONGO_URI}/{MONGO_DB}")
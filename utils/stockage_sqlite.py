@@ -0,0 +1,210 @@
+# stockage_sqlite.py
+# Moteur SQLite (mode WAL) : une ligne par entrée de dataset, indexée par (dataset, clé).
+# Une sauvegarde complète ne réécrit que les lignes qui ont changé.
+#
+# Migration des fichiers JSON existants :  python -m utils.stockage_sqlite [--ecraser]
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from utils.stockage import DATA_DIR, DATASETS, JOURNAUX, SEPARATEUR_DOUBLON, StockageJSON, document_vide, lignes_document
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(DATA_DIR, "bot.sqlite3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entrees (
+    dataset  TEXT    NOT NULL,
+    cle      TEXT    NOT NULL,
+    position INTEGER NOT NULL,
+    valeur   TEXT    NOT NULL,
+    PRIMARY KEY (dataset, cle)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entrees_position ON entrees (dataset, position);
+CREATE TABLE IF NOT EXISTS journaux (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    journal TEXT    NOT NULL,
+    valeur  TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS journaux_journal ON journaux (journal, id);
+CREATE TABLE IF NOT EXISTS versions (
+    dataset TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+def _dumps(valeur) -> str:
+    return json.dumps(valeur, ensure_ascii=False, separators=(",", ":"))
+
+class StockageSQLite:
+    nom = "sqlite"
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        # Une connexion par thread : les helpers peuvent être appelés depuis un executor
+        self._local = threading.local()
+
+    def _connexion(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _lignes(self, nom: str, data) -> dict:
+        """Document → {clé: (position, valeur sérialisée)}."""
+        return {cle: (position, _dumps(e)) for cle, (position, e) in lignes_document(nom, data).items()}
+
+    def _incrementer_version(self, conn: sqlite3.Connection, nom: str):
+        conn.execute(
+            "INSERT INTO versions (dataset, version) VALUES (?, 1) "
+            "ON CONFLICT(dataset) DO UPDATE SET version = version + 1",
+            (nom,)
+        )
+
+    def charger(self, nom: str):
+        rows = self._connexion().execute(
+            "SELECT cle, valeur FROM entrees WHERE dataset = ? ORDER BY position", (nom,)
+        ).fetchall()
+        if DATASETS[nom]["type"] is dict:
+            return {cle: json.loads(valeur) for cle, valeur in rows}
+        return [json.loads(valeur) for _, valeur in rows] if rows else document_vide(nom)
+
+    def sauvegarder(self, nom: str, data):
+        conn = self._connexion()
+        nouvelles = self._lignes(nom, data)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            actuelles = {
+                cle: (position, valeur)
+                for cle, position, valeur in conn.execute(
+                    "SELECT cle, position, valeur FROM entrees WHERE dataset = ?", (nom,)
+                )
+            }
+            supprimees = [(nom, cle) for cle in actuelles.keys() - nouvelles.keys()]
+            modifiees = [
+                (nom, cle, position, valeur)
+                for cle, (position, valeur) in nouvelles.items()
+                if actuelles.get(cle) != (position, valeur)
+            ]
+            if supprimees:
+                conn.executemany("DELETE FROM entrees WHERE dataset = ? AND cle = ?", supprimees)
+            if modifiees:
+                conn.executemany(
+                    "INSERT INTO entrees (dataset, cle, position, valeur) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(dataset, cle) DO UPDATE SET position = excluded.position, valeur = excluded.valeur",
+                    modifiees
+                )
+            if supprimees or modifiees:
+                self._incrementer_version(conn, nom)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def signature(self, nom: str):
+        row = self._connexion().execute(
+            "SELECT version FROM versions WHERE dataset = ?", (nom,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def lire_entree(self, nom: str, cle: str):
+        row = self._connexion().execute(
+            "SELECT valeur FROM entrees WHERE dataset = ? AND cle = ?", (nom, cle)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def ecrire_entree(self, nom: str, cle: str, valeur):
+        conn = self._connexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO entrees (dataset, cle, position, valeur) "
+                "VALUES (?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM entrees WHERE dataset = ?), ?) "
+                "ON CONFLICT(dataset, cle) DO UPDATE SET valeur = excluded.valeur",
+                (nom, cle, nom, _dumps(valeur))
+            )
+            self._incrementer_version(conn, nom)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def supprimer_entree(self, nom: str, cle: str) -> bool:
+        conn = self._connexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Avec ses doublons éventuels (« clé␟n »), comme le moteur JSON
+            supprime = conn.execute(
+                "DELETE FROM entrees WHERE dataset = ? AND (cle = ? OR (cle > ? AND cle < ?))",
+                (nom, cle, cle + SEPARATEUR_DOUBLON, cle + chr(ord(SEPARATEUR_DOUBLON) + 1))
+            ).rowcount > 0
+            if supprime:
+                self._incrementer_version(conn, nom)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return supprime
+
+    def ajouter_au_journal(self, nom: str, enregistrement):
+        self._connexion().execute(
+            "INSERT INTO journaux (journal, valeur) VALUES (?, ?)", (nom, _dumps(enregistrement))
+        )
+
+    def lire_journal(self, nom: str) -> list:
+        rows = self._connexion().execute(
+            "SELECT valeur FROM journaux WHERE journal = ? ORDER BY id", (nom,)
+        ).fetchall()
+        return [json.loads(valeur) for (valeur,) in rows]
+
+    def remplacer_journal(self, nom: str, enregistrements: list):
+        conn = self._connexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM journaux WHERE journal = ?", (nom,))
+            conn.executemany(
+                "INSERT INTO journaux (journal, valeur) VALUES (?, ?)",
+                [(nom, _dumps(e)) for e in enregistrements]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+# ========== Migration depuis les fichiers JSON ==========
+def migrer_depuis_json(cible=None, ecraser: bool = False) -> dict:
+    """
+    Copie chaque fichier JSON (et chaque journal) de /data dans le moteur cible
+    (SQLite par défaut, ou MongoDB). Un dataset déjà présent n'est pas touché, sauf si `ecraser`. Renvoie {dataset: nb d'entrées}.
+    """
+    source = StockageJSON()
+    cible = cible or StockageSQLite()
+    resultat = {}
+    for nom in DATASETS:
+        if source.signature(nom) is None:
+            continue
+        if cible.signature(nom) is not None and not ecraser:
+            continue
+        data = source.charger(nom)
+        cible.sauvegarder(nom, data)
+        resultat[nom] = len(data)
+    for nom in JOURNAUX:
+        enregistrements = source.lire_journal(nom)
+        if not enregistrements or (cible.lire_journal(nom) and not ecraser):
+            continue
+        cible.remplacer_journal(nom, enregistrements)
+        resultat[f"journal {nom}"] = len(enregistrements)
+    return resultat
+
+if __name__ == "__main__":
+    migres = migrer_depuis_json(ecraser="--ecraser" in sys.argv)
+    if not migres:
+        print("ℹ️ Rien à migrer.")
+    for nom, total in migres.items():
+        print(f"✅ {nom} : {total} entrée(s) migrée(s) vers {SQLITE_PATH}")
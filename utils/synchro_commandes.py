@@ -0,0 +1,60 @@
+# synchro_commandes.py
+# Synchronisation des commandes slash, uniquement quand l'arbre a changé.
+#
+#   - l'empreinte = sha256 de l'arbre sérialisé (to_dict de chaque commande, triées,
+#     JSON à clés triées) : stable d'un démarrage à l'autre ;
+#   - la dernière empreinte synchronisée est gardée par cible (« global » ou id de
+#     guilde) dans le dataset "synchro_commandes" ; on_ready, qui repasse à chaque
+#     reconnexion, ne fait donc plus d'upload inutile ;
+#   - SYNC_GUILD_ID=<id> : mode développement, les commandes sont copiées et
+#     synchronisées sur cette seule guilde (propagation immédiate) ;
+#   - /forcer_sync (admin) ignore l'empreinte.
+import hashlib
+import json
+import os
+import time
+
+import discord
+
+from utils import stockage
+
+DATASET = "synchro_commandes"
+
+def guilde_de_dev() -> discord.Object | None:
+    guild_id = os.getenv("SYNC_GUILD_ID", "").strip()
+    return discord.Object(id=int(guild_id)) if guild_id else None
+
+def empreinte(tree: discord.app_commands.CommandTree, guild: discord.abc.Snowflake = None) -> str:
+    commandes = sorted(
+        (c.to_dict() for c in tree.get_commands(guild=guild)),
+        key=lambda d: (d.get("type", 1), d["name"])
+    )
+    serialise = json.dumps(commandes, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(serialise.encode("utf-8")).hexdigest()
+
+async def synchroniser(bot: discord.Client, forcer: bool = False) -> dict:
+    """Synchronise si l'empreinte a changé (ou si `forcer`). Renvoie un résumé, aussi imprimé."""
+    tree = bot.tree
+    guild = guilde_de_dev()
+    if guild is not None:
+        tree.copy_global_to(guild=guild)
+    cible = str(guild.id) if guild else "global"
+    actuelle = empreinte(tree, guild)
+    precedente = await stockage.lire_entree_async(DATASET, cible)
+
+    resultat = {"cible": cible, "empreinte": actuelle[:12], "synchronisees": None, "duree_ms": 0.0}
+    if not forcer and precedente and precedente.get("empreinte") == actuelle:
+        resultat["ignoree"] = True
+        print(f"[SYNC] {cible} : ignorée, empreinte inchangée ({actuelle[:12]})")
+        return resultat
+
+    debut = time.perf_counter()
+    synchronisees = await tree.sync(guild=guild)
+    resultat.update(ignoree=False, synchronisees=len(synchronisees),
+                    duree_ms=round((time.perf_counter() - debut) * 1000, 1))
+    await stockage.ecrire_entree_async(DATASET, cible, {
+        "empreinte": actuelle, "commandes": len(synchronisees), "date": int(time.time())
+    })
+    print(f"[SYNC] {cible} : {len(synchronisees)} commandes synchronisées en {resultat['duree_ms']} ms"
+          + (" (forcée)" if forcer else ""))
+    return resultat
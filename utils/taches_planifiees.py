@@ -0,0 +1,151 @@
+# taches_planifiees.py
+# Tâches différées persistantes (ex: déverrouiller un salon dans 30 minutes).
+#
+#   - chaque tâche est enregistrée dans le dataset "taches_planifiees" AVANT d'être
+#     programmée : un redémarrage ne la perd pas ;
+#   - une seule boucle de minuterie dort jusqu'à la prochaine échéance (tas trié par
+#     échéance) et se réveille quand une tâche plus proche est ajoutée ;
+#   - au démarrage, les tâches échues pendant l'arrêt du bot sont exécutées tout de suite ;
+#   - un type de tâche = une coroutine `gestionnaire(bot, params)` déclarée avec
+#     @type_de_tache("nom"). En cas d'erreur, la tâche est retentée plus tard.
+import asyncio
+import heapq
+import time
+import uuid
+
+import discord
+
+from utils import stockage
+from utils.planificateur_rest import MODERATION, planifier, route_roles, route_salons
+
+DATASET = "taches_planifiees"
+TENTATIVES_MAX = 5
+DELAI_RETENTATIVE_S = 60
+
+_gestionnaires = {}
+
+def type_de_tache(nom: str):
+    def decorateur(fonction):
+        _gestionnaires[nom] = fonction
+        return fonction
+    return decorateur
+
+class PlanificateurTaches:
+    def __init__(self):
+        self._taches: dict[str, dict] = {}
+        self._tas: list[tuple[float, str]] = []
+        self._reveil = asyncio.Event()
+        self._boucle = None
+        self._en_cours: set[asyncio.Task] = set()
+        self.bot = None
+
+    # ----- API -----
+    async def planifier(self, type: str, echeance: float, params: dict, tache_id: str = None) -> str:
+        """Programme une tâche à l'instant `echeance` (timestamp). Un même id remplace la tâche existante."""
+        if type not in _gestionnaires:
+            raise ValueError(f"Type de tâche inconnu : {type}")
+        tache = {
+            "id": tache_id or uuid.uuid4().hex[:12],
+            "type": type,
+            "echeance": float(echeance),
+            "params": params,
+            "tentatives": 0,
+            "cree_a": int(time.time()),
+        }
+        await stockage.ecrire_entree_async(DATASET, tache["id"], tache)
+        self._programmer(tache)
+        return tache["id"]
+
+    async def planifier_dans(self, type: str, delai_s: float, params: dict, tache_id: str = None) -> str:
+        return await self.planifier(type, time.time() + delai_s, params, tache_id)
+
+    async def annuler(self, tache_id: str) -> bool:
+        if self._taches.pop(tache_id, None) is None:
+            return False
+        await stockage.supprimer_entree_async(DATASET, tache_id)
+        return True
+
+    def en_attente(self) -> list[dict]:
+        return sorted(self._taches.values(), key=lambda t: t["echeance"])
+
+    # ----- Boucle -----
+    def _programmer(self, tache: dict):
+        self._taches[tache["id"]] = tache
+        heapq.heappush(self._tas, (tache["echeance"], tache["id"]))
+        self._reveil.set()
+
+    def demarrer(self, bot: discord.Client):
+        self.bot = bot
+        if self._boucle is None or self._boucle.done():
+            self._boucle = asyncio.create_task(self._tourner())
+
+    def arreter(self):
+        if self._boucle is not None:
+            self._boucle.cancel()
+            self._boucle = None
+
+    async def _tourner(self):
+        # Les gestionnaires ont besoin du cache des guildes
+        await self.bot.wait_until_ready()
+        for tache in (await stockage.charger_async(DATASET)).values():
+            if tache["id"] not in self._taches:
+                self._programmer(tache)
+        while True:
+            self._reveil.clear()
+            maintenant = time.time()
+            while self._tas and self._tas[0][0] <= maintenant:
+                echeance, tache_id = heapq.heappop(self._tas)
+                tache = self._taches.get(tache_id)
+                # Entrée périmée (tâche annulée ou reprogrammée)
+                if tache is None or tache["echeance"] != echeance:
+                    continue
+                execution = asyncio.create_task(self._executer(tache))
+                self._en_cours.add(execution)
+                execution.add_done_callback(self._en_cours.discard)
+            delai = self._tas[0][0] - maintenant if self._tas else None
+            try:
+                await asyncio.wait_for(self._reveil.wait(), delai)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _executer(self, tache: dict):
+        try:
+            await _gestionnaires[tache["type"]](self.bot, tache["params"])
+        except Exception as e:
+            tache["tentatives"] += 1
+            print(f"[TACHES] {tache['type']} {tache['id']} : échec {tache['tentatives']}/{TENTATIVES_MAX} ({e})")
+            if tache["tentatives"] < TENTATIVES_MAX and self._taches.get(tache["id"]) is tache:
+                tache["echeance"] = time.time() + DELAI_RETENTATIVE_S * 2 ** (tache["tentatives"] - 1)
+                await stockage.ecrire_entree_async(DATASET, tache["id"], tache)
+                self._programmer(tache)
+                return
+        if self._taches.get(tache["id"]) is tache:
+            await self.annuler(tache["id"])
+
+taches = PlanificateurTaches()
+
+# ========== Types de tâches ==========
+@type_de_tache("deverrouiller_salon")
+async def _deverrouiller_salon(bot: discord.Client, params: dict):
+    """Rétablit la permission d'écrire de @everyone telle qu'avant /lock_salon."""
+    salon = bot.get_channel(params["channel_id"])
+    if salon is None:
+        return
+    everyone = salon.guild.default_role
+    overwrite = salon.overwrites_for(everyone)
+    overwrite.send_messages = params.get("send_messages_avant")
+    await planifier(
+        route_salons(salon.guild.id),
+        lambda: salon.set_permissions(everyone, overwrite=None if overwrite.is_empty() else overwrite, reason="Fin de /lock_salon"),
+        MODERATION
+    )
+
+@type_de_tache("retirer_role")
+async def _retirer_role(bot: discord.Client, params: dict):
+    """Retrait d'un rôle temporaire à échéance."""
+    guild = bot.get_guild(params["guild_id"])
+    membre = guild.get_member(params["user_id"]) if guild else None
+    role = guild.get_role(params["role_id"]) if guild else None
+    if membre is None or role is None or role not in membre.roles:
+        return
+    await planifier(route_roles(guild.id), lambda: membre.remove_roles(role, reason="Rôle temporaire expiré"), MODERATION)
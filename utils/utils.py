@@ -1,152 +1,312 @@
 # utils.py
 import discord
-import json
-import os
+import asyncio
+import copy
+import re
+import sys
+import threading
+import time
+from utils import stockage
+from utils.stockage import chemin_dataset
+from utils.index_whitelist import index_whitelist
+from utils.planificateur_rest import INTERACTIF, planifier, route_roles, route_salons
+from utils import erreurs
 
 # Tous les fichiers JSON dans /data pour persistance sur Render
-CONFIG_PATH               = "/data/config.json"
-REACTION_ROLE_PATH        = "/data/reaction_roles.json"
-SALONS_AUTORISES_PATH     = "/data/salons_autorises.json"
-WHITELIST_PATH            = "/data/whitelist.json"
-PERMISSIONS_PATH          = "/data/permissions.json"
+# (avec STOCKAGE_BACKEND=sqlite ils ne servent plus que de source à la migration)
+CONFIG_PATH               = chemin_dataset("config")
+REACTION_ROLE_PATH        = chemin_dataset("reaction_roles")
+SALONS_AUTORISES_PATH     = chemin_dataset("salons_autorises")
+WHITELIST_PATH            = chemin_dataset("whitelist")
+PERMISSIONS_PATH          = chemin_dataset("permissions")
+
+# ========== Cache mémoire de la configuration ==========
+# La config est lue à chaque commande, vérification, log… : on la garde en mémoire
+# et on ne relit le stockage que si sa signature a changé (mtime / taille du fichier
+# JSON, numéro de version SQLite).
+# La signature n'est revérifiée qu'au plus toutes les CONFIG_CACHE_VERIFICATION_S.
+# Sur la boucle d'événements, cette vérification (et la relecture si la config a changé)
+# part dans un thread et le cache est servi en attendant : avec MongoDB ce sont des
+# allers-retours réseau. Seul le tout premier chargement est synchrone ; le démarrage
+# le fait dans un thread (utils.demarrage).
+CONFIG_CACHE_VERIFICATION_S = 1.0
+# Les modifications rapprochées sont regroupées en une seule écriture après ce délai ;
+# sur la boucle, cette écriture (sérialisation + fsync) part elle aussi dans un thread.
+CONFIG_COALESCENCE_S = 0.5
+
+_config_cache = {"data": None, "signature": None, "verifie_a": 0.0, "sale": False, "generation": 0, "flush": None, "verification": None}
+# État du cache ; distinct du verrou du fichier pour que la boucle n'attende pas une
+# écriture en cours dans un thread
+_verrou_config = threading.RLock()
+# Une écriture de config à la fois, dans l'ordre des modifications
+_verrou_ecriture_config = threading.Lock()
+_config_stats = {"hits": 0, "misses": 0, "invalidations": 0, "ecritures": 0, "modifications": 0}
+
+def invalider_cache_config():
+    flush_config()
+    _config_cache["data"] = None
+    _config_cache["signature"] = None
+    _config_stats["invalidations"] += 1
+
+def statistiques_cache_config() -> dict:
+    total = _config_stats["hits"] + _config_stats["misses"]
+    return {**_config_stats, "ratio_hits": round(_config_stats["hits"] / total, 4) if total else 0.0}
 
 # ========== Chargement & Sauvegarde de la configuration ==========
 def charger_config():
-    if not os.path.exists(CONFIG_PATH):
-        return {}
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    maintenant = time.monotonic()
+    if _config_cache["data"] is not None:
+        # Des modifications en attente d'écriture font foi sur le disque
+        if _config_cache["sale"] or maintenant - _config_cache["verifie_a"] < CONFIG_CACHE_VERIFICATION_S:
+            _config_stats["hits"] += 1
+            return copy.deepcopy(_config_cache["data"])
+        boucle = _boucle_courante()
+        if boucle is not None:
+            if _config_cache["verification"] is None:
+                _config_cache["verification"] = boucle.run_in_executor(None, _verifier_config)
+                _config_cache["verification"].add_done_callback(_fin_verification_config)
+            _config_stats["hits"] += 1
+            return copy.deepcopy(_config_cache["data"])
+        if stockage.signature("config") == _config_cache["signature"]:
+            _config_cache["verifie_a"] = maintenant
+            _config_stats["hits"] += 1
+            return copy.deepcopy(_config_cache["data"])
+        # Fichier modifié sur le disque (édition manuelle, autre process…)
+        _config_stats["invalidations"] += 1
+
+    with _verrou_config:
+        _config_stats["misses"] += 1
+        signature = stockage.signature("config")
+        data = stockage.charger("config")
+        _config_cache.update(data=data, signature=signature, verifie_a=maintenant)
+        return copy.deepcopy(data)
+
+def _boucle_courante():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+def _verifier_config():
+    """(Thread) Relit la config si sa signature a changé, sans tenir le verrou pendant les E/S."""
+    attendue = _config_cache["signature"]
+    signature = stockage.signature("config")
+    data = stockage.charger("config") if signature != attendue else None
+    with _verrou_config:
+        # Écriture ou invalidation entre-temps : le cache est déjà plus récent que cette lecture
+        if _config_cache["sale"] or _config_cache["data"] is None or _config_cache["signature"] != attendue:
+            return
+        if data is not None:
+            _config_stats["invalidations"] += 1
+            _config_cache.update(data=data, signature=signature)
+        _config_cache["verifie_a"] = time.monotonic()
+
+def _fin_verification_config(futur):
+    _config_cache["verification"] = None
+    if not futur.cancelled() and futur.exception() is not None:
+        # Stockage injoignable : on garde le cache et on réessaie à la prochaine échéance
+        _config_cache["verifie_a"] = time.monotonic()
+        print(f"[CONFIG] Vérification impossible : {futur.exception()}")
+
+def flush_config():
+    """Écrit immédiatement les modifications de config en attente (arrêt, scripts)."""
+    with _verrou_config:
+        handle = _config_cache["flush"]
+        _config_cache["flush"] = None
+        if handle is not None:
+            handle.cancel()
+    _ecrire_config()
+
+def _ecrire_config():
+    with _verrou_ecriture_config:
+        with _verrou_config:
+            if not _config_cache["sale"]:
+                return
+            data = copy.deepcopy(_config_cache["data"])
+            generation = _config_cache["generation"]
+        stockage.sauvegarder("config", data)
+        signature = stockage.signature("config")
+        with _verrou_config:
+            _config_cache.update(signature=signature, verifie_a=time.monotonic())
+            # Modifiée pendant l'écriture : reste à écrire, une écriture est déjà planifiée
+            if _config_cache["generation"] == generation:
+                _config_cache["sale"] = False
+            _config_stats["ecritures"] += 1
+
+def _ecrire_config_en_arriere_plan():
+    # Sur la boucle : les modifications suivantes planifieront une nouvelle écriture
+    _config_cache["flush"] = None
+    futur = asyncio.get_running_loop().run_in_executor(None, _ecrire_config)
+    futur.add_done_callback(_fin_ecriture_config)
+
+def _fin_ecriture_config(futur):
+    if not futur.cancelled() and futur.exception() is not None:
+        # Les modifications restent en attente : la prochaine les écrira avec elles
+        print(f"[CONFIG] Écriture impossible : {futur.exception()}")
+
+def _planifier_flush_config(immediat: bool = False):
+    loop = _boucle_courante()
+    if loop is None:
+        # Hors boucle asyncio (script, executor) : écriture directe
+        return flush_config()
+    with _verrou_config:
+        if immediat:
+            if _config_cache["flush"] is not None:
+                _config_cache["flush"].cancel()
+            _ecrire_config_en_arriere_plan()
+        elif _config_cache["flush"] is None:
+            _config_cache["flush"] = loop.call_later(CONFIG_COALESCENCE_S, _ecrire_config_en_arriere_plan)
+
+def update_config(mutator, immediat: bool = False):
+    """
+    Applique `mutator(cfg)` à la config de façon transactionnelle et renvoie son résultat.
+    Le mutateur travaille sur une copie : s'il lève une exception, rien n'est modifié.
+    L'écriture disque est regroupée avec les modifications voisines, sauf si `immediat`
+    (lancée tout de suite, dans un thread si l'on est sur la boucle).
+    """
+    with _verrou_config:
+        brouillon = charger_config()
+        resultat = mutator(brouillon)
+        _config_cache.update(data=brouillon, sale=True, verifie_a=time.monotonic())
+        _config_cache["generation"] += 1
+        _config_stats["modifications"] += 1
+    _planifier_flush_config(immediat)
+    return resultat
 
 def sauvegarder_config(data):
-    os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    def remplacer(cfg):
+        cfg.clear()
+        cfg.update(copy.deepcopy(data))
+    update_config(remplacer)
 
 # ========== Vérification des droits d'administrateur ==========
 async def is_admin(user: discord.User | discord.Member) -> bool:
     return getattr(user, "guild_permissions", None) and user.guild_permissions.administrator
 
 # ========== Gestion des rôles ==========
-async def get_or_create_role(guild: discord.Guild, role_name: str) -> discord.Role:
+async def get_or_create_role(guild: discord.Guild, role_name: str, priorite: int = INTERACTIF) -> discord.Role:
     role = discord.utils.get(guild.roles, name=role_name)
     if role:
         return role
     try:
-        return await guild.create_role(name=role_name, reason="Création automatique via bot")
+        return await planifier(
+            route_roles(guild.id), lambda: guild.create_role(name=role_name, reason="Création automatique via bot"), priorite
+        )
     except Exception as e:
         raise RuntimeError(f"Erreur lors de la création du rôle '{role_name}' : {e}")
 
 # ========== Gestion des catégories ==========
-async def get_or_create_category(guild: discord.Guild, category_name: str) -> discord.CategoryChannel:
+async def get_or_create_category(guild: discord.Guild, category_name: str, priorite: int = INTERACTIF) -> discord.CategoryChannel:
     existing = discord.utils.get(guild.categories, name=category_name)
     if existing:
         return existing
     try:
-        return await guild.create_category(name=category_name)
+        return await planifier(route_salons(guild.id), lambda: guild.create_category(name=category_name), priorite)
     except Exception as e:
         raise RuntimeError(f"Erreur lors de la création de la catégorie '{category_name}' : {e}")
 
 # ========== Gestion des salons autorisés ==========
-def definir_salon_autorise(nom_commande: str, salon_id: int):
-    os.makedirs(os.path.dirname(SALONS_AUTORISES_PATH), exist_ok=True)
-    if not os.path.exists(SALONS_AUTORISES_PATH):
-        data = {}
-    else:
-        with open(SALONS_AUTORISES_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    data[nom_commande] = salon_id
-    with open(SALONS_AUTORISES_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
-
-def salon_est_autorise(nom_commande: str, channel_id: int, user: discord.User | discord.Member = None):
-    if os.path.exists(SALONS_AUTORISES_PATH):
-        with open(SALONS_AUTORISES_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        allowed = data.get(nom_commande)
-        if allowed is None or int(channel_id) == int(allowed):
-            return True
-        if user and getattr(user, "guild_permissions", None) and user.guild_permissions.administrator:
-            return "admin_override"
-        return False
-    return True
+async def definir_salon_autorise(nom_commande: str, salon_id: int):
+    await stockage.ecrire_entree_async("salons_autorises", nom_commande, salon_id)
+
+async def salon_est_autorise(nom_commande: str, channel_id: int, user: discord.User | discord.Member = None):
+    allowed = await stockage.lire_entree_async("salons_autorises", nom_commande)
+    if allowed is None or int(channel_id) == int(allowed):
+        return True
+    if user and getattr(user, "guild_permissions", None) and user.guild_permissions.administrator:
+        return "admin_override"
+    return False
 
 # ========== Gestion des redirections ==========
 def definir_redirection(redirection_type: str, salon_id: int):
-    cfg = charger_config()
-    cfg["redirections"] = cfg.get("redirections", {})
-    cfg["redirections"][redirection_type] = str(salon_id)
-    sauvegarder_config(cfg)
+    def appliquer(cfg):
+        cfg.setdefault("redirections", {})[redirection_type] = str(salon_id)
+    update_config(appliquer)
 
 def get_redirection(redirection_type: str) -> str | None:
     cfg = charger_config()
     return cfg.get("redirections", {}).get(redirection_type)
 
 # ========== Gestion des options diverses ==========
-def definir_option_config(option: str, valeur: str):
-    cfg = charger_config()
-    cfg[option] = valeur
-    sauvegarder_config(cfg)
+def definir_option_config(option: str, valeur):
+    update_config(lambda cfg: cfg.__setitem__(option, valeur))
+
+def definir_options_config(options: dict):
+    """Définit plusieurs options dans une seule transaction (une seule écriture)."""
+    update_config(lambda cfg: cfg.update(options))
 
 # ========== Gestion Reaction Roles persistants ==========
-def load_reaction_role_mapping() -> dict:
-    if not os.path.exists(REACTION_ROLE_PATH):
-        return {}
-    with open(REACTION_ROLE_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+async def load_reaction_role_mapping() -> dict:
+    return await stockage.charger_async("reaction_roles")
+
+async def save_reaction_role_mapping(data: dict):
+    await stockage.sauvegarder_async("reaction_roles", data)
+    reconstruire_index_reaction_roles(data)
+
+# ========== Index en mémoire des reaction roles ==========
+# (message_id, emoji) → role_id, pour que les réactions sur les autres messages
+# soient ignorées sans lire le stockage. Reconstruit à chaque sauvegarde du mapping.
+_index_reaction_roles: dict[int, dict[str, tuple[int, ...]]] | None = None
+_EMOJI_PERSO = re.compile(r"<a?:\w+:(\d+)>")
+
+def cle_emoji(emoji) -> str:
+    """Clé comparable d'un emoji : l'id pour un emoji perso, le caractère sinon."""
+    if getattr(emoji, "id", None):
+        return str(emoji.id)
+    texte = str(getattr(emoji, "name", None) or emoji).strip()
+    perso = _EMOJI_PERSO.fullmatch(texte)
+    if perso:
+        return perso.group(1)
+    # "❤️" et "❤" doivent correspondre (sélecteur de variante)
+    return texte.replace("\ufe0f", "")
 
-def save_reaction_role_mapping(data: dict):
-    os.makedirs(os.path.dirname(REACTION_ROLE_PATH), exist_ok=True)
-    with open(REACTION_ROLE_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+def reconstruire_index_reaction_roles(mapping: dict = None):
+    global _index_reaction_roles
+    mapping = stockage.charger("reaction_roles") if mapping is None else mapping
+    index = {}
+    for message_id, entrees in mapping.items():
+        # Un même emoji peut donner plusieurs rôles : tous sont gardés, dans l'ordre
+        par_emoji = index[int(message_id)] = {}
+        for e in entrees:
+            roles = par_emoji.setdefault(cle_emoji(e["emoji"]), ())
+            if int(e["role_id"]) not in roles:
+                par_emoji[cle_emoji(e["emoji"])] = roles + (int(e["role_id"]),)
+    _index_reaction_roles = index
+
+def roles_pour_reaction(message_id: int, emoji) -> tuple[int, ...]:
+    if _index_reaction_roles is None:
+        reconstruire_index_reaction_roles()
+    roles = _index_reaction_roles.get(int(message_id))
+    if not roles:
+        return ()
+    return roles.get(cle_emoji(emoji), ())
 
 # ========== Gestion de la whitelist ==========
-def charger_whitelist() -> list:
-    if not os.path.exists(WHITELIST_PATH):
-        return []
-    with open(WHITELIST_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+async def charger_whitelist() -> list:
+    return await stockage.charger_async("whitelist")
 
-def sauvegarder_whitelist(whitelist: list):
-    os.makedirs(os.path.dirname(WHITELIST_PATH), exist_ok=True)
-    with open(WHITELIST_PATH, "w", encoding="utf-8") as f:
-        json.dump(whitelist, f, indent=4)
+async def sauvegarder_whitelist(whitelist: list):
+    await stockage.sauvegarder_async("whitelist", whitelist)
+    index_whitelist.reconstruire(whitelist)
 
 # ========== Logs d’erreurs dans un salon Discord ==========
 async def log_erreur(bot: discord.Client, guild: discord.Guild, message: str):
-    try:
-        print(f"[ERREUR BOT] {message}")
-        cfg = charger_config()
-        log_channel_id = cfg.get("log_erreurs_channel")
-        if not log_channel_id:
-            print("[LOG] Aucun salon de logs défini.")
-            return
-        channel = guild.get_channel(int(log_channel_id))
-        if not channel:
-            print(f"[LOG] Salon ID {log_channel_id} introuvable.")
-            return
-        embed = discord.Embed(title="❌ Erreur détectée", description=message, color=discord.Color.red())
-        await channel.send(embed=embed)
-    except Exception as e:
-        print(f"[ERREUR LORS DU LOG] {e}")
+    """
+    Signale une erreur au pipeline (utils.erreurs) : regroupée avec ses répétitions,
+    postée en différé dans le salon de logs, archivée localement. Appelée dans un
+    bloc except, l'exception en cours sert d'empreinte et de trace.
+    """
+    erreurs.signaler(message, "log_erreur", guild, sys.exc_info()[1])
 
 # ========== Gestion des permissions ==========
-def charger_permissions() -> dict:
-    if not os.path.exists(PERMISSIONS_PATH):
-        return {}
-    with open(PERMISSIONS_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def sauvegarder_permissions(permissions: dict):
-    os.makedirs(os.path.dirname(PERMISSIONS_PATH), exist_ok=True)
-    with open(PERMISSIONS_PATH, "w", encoding="utf-8") as f:
-        json.dump(permissions, f, indent=4)
-
-def role_autorise(interaction: discord.Interaction, commande: str) -> bool:
-    if not os.path.exists(PERMISSIONS_PATH):
-        return False
-    with open(PERMISSIONS_PATH, "r", encoding="utf-8") as f:
-        perms = json.load(f)
-    autorises = perms.get(commande, [])
+async def charger_permissions() -> dict:
+    return await stockage.charger_async("permissions")
+
+async def sauvegarder_permissions(permissions: dict):
+    await stockage.sauvegarder_async("permissions", permissions)
+
+async def role_autorise(interaction: discord.Interaction, commande: str) -> bool:
+    autorises = await stockage.lire_entree_async("permissions", commande) or []
     return any(str(role.id) in autorises for role in interaction.user.roles)
 
 # ========== Vérification du statut de membre ==========